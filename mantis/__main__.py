@@ -1,4 +1,4 @@
-from mantis.app import main
+from mantis.command_line import run
 
 if __name__ == "__main__":
-    main()
+    run()
@@ -8,8 +8,9 @@ from rich.console import Console
 from rich.text import Text
 
 from mantis import VERSION
+from mantis.fanout import command_finished
 from mantis.helpers import CLI
-from mantis.managers import get_manager
+from mantis.tracing import trace, start_tracing
 
 EPILOG = """\
 [bold]Examples:[/bold]
@@ -30,6 +31,8 @@ EPILOG = """\
 
   mantis -e prod logs django
 
+  mantis -e 'client-*' --parallel 8 deploy [dim](many environments at once)[/dim]
+
   mantis status [dim](single connection mode)[/dim]
 
 
@@ -156,7 +159,12 @@ def command(
         @wraps(func)
         def wrapper(*args, **kwargs):
             state._current_command = cmd_name
-            return func(*args, **kwargs)
+
+            with trace(cmd_name, 'mantis'):
+                result = func(*args, **kwargs)
+
+            command_finished(cmd_name)
+            return result
 
         # Register main command
         kwargs = {}
@@ -174,8 +182,9 @@ def command(
 
 
 def register_shortcuts():
-    """Register all deferred shortcuts. Call after all commands are imported."""
-    for shortcut, cmd_name, wrapper in _DEFERRED_SHORTCUTS:
+    """Register deferred shortcuts. Call after commands are imported, again after importing more."""
+    while _DEFERRED_SHORTCUTS:
+        shortcut, cmd_name, wrapper = _DEFERRED_SHORTCUTS.pop(0)
         app.command(shortcut, rich_help_panel="Shortcuts", help=f"Alias for '{cmd_name}'")(wrapper)
 
 
@@ -192,11 +201,15 @@ def main(
     mode: str = typer.Option("remote", "--mode", "-m", help="Execution mode: remote, ssh, host"),
     dry_run: bool = typer.Option(False, "--dry-run", "-n", help="Show commands without executing"),
     no_tunnel: bool = typer.Option(False, "--no-tunnel", help="Do not tunnel the remote docker socket over a single SSH connection"),
+    trace_file: Optional[str] = typer.Option(None, "--trace", help="Write timing of all steps to a Chrome trace file (chrome://tracing, Perfetto)"),
+    parallel: int = typer.Option(4, "--parallel", min=1, help="Number of environments to run at once, if --env is a list or glob (client-*)"),
     version: bool = typer.Option(False, "--version", "-v", callback=version_callback, is_eager=True, help="Show version and exit"),
 ):
     """Mantis CLI - Docker deployment tool."""
     import sys
 
+    from mantis.managers import get_manager
+
     # Skip initialization when showing help or completions
     if ctx.resilient_parsing or '--help' in sys.argv or '-h' in sys.argv:
         return
@@ -208,13 +221,16 @@ def main(
         if skip_next:
             skip_next = False
             continue
-        if arg in ('-e', '--env', '-m', '--mode'):
+        if arg in ('-e', '--env', '-m', '--mode', '--trace', '--parallel'):
             skip_next = True
             continue
         if arg.startswith('-') or arg == '+':
             continue
         commands.append(arg)
 
+    if trace_file:
+        start_tracing(trace_file)
+
     state._mode = mode
     state._dry_run = dry_run
     state._manager = get_manager(environment, mode, dry_run=dry_run, commands=commands, use_tunnel=not no_tunnel)
@@ -16,22 +16,15 @@ Examples:
     mantis -e prod logs django
     mantis status                          (single connection mode)
     mantis manage migrate
+    mantis -e 'client-*' --parallel 8 deploy  (many environments at once)
 """
 import sys
-from typing import List, Tuple
-
-import click
-import typer
+from typing import List, Optional, Tuple
 
 from mantis import VERSION
-from mantis.app import app, state, register_shortcuts
-from mantis.managers import get_manager
-
-# Import commands to register them with the app
-from mantis import commands  # noqa: F401
 
-# Register shortcuts after all commands (so they appear at end of help)
-register_shortcuts()
+# Typer, rich, managers and command modules are imported once a command runs (see load_app),
+# so --version and forwarding to a daemon stay fast.
 
 # Command separator for chaining
 COMMAND_SEPARATOR = '+'
@@ -73,7 +66,7 @@ def split_args(args: List[str]) -> Tuple[List[str], List[List[str]]]:
         if arg.startswith('-'):
             global_opts.append(arg)
             # Handle options with values: -e prod, --env prod
-            if arg in ('-e', '--env', '-m', '--mode') and i + 1 < len(first_group):
+            if arg in ('-e', '--env', '-m', '--mode', '--trace', '--parallel') and i + 1 < len(first_group):
                 i += 1
                 global_opts.append(first_group[i])
             i += 1
@@ -100,6 +93,8 @@ def parse_global_options(global_opts: List[str]) -> dict:
         'mode': 'remote',
         'dry_run': False,
         'use_tunnel': True,
+        'trace': None,
+        'parallel': 4,
     }
 
     i = 0
@@ -117,14 +112,45 @@ def parse_global_options(global_opts: List[str]) -> dict:
         elif opt == '--no-tunnel':
             result['use_tunnel'] = False
             i += 1
+        elif opt == '--trace' and i + 1 < len(global_opts):
+            result['trace'] = global_opts[i + 1]
+            i += 2
+        elif opt == '--parallel' and i + 1 < len(global_opts):
+            value = global_opts[i + 1]
+
+            if not value.isdigit() or int(value) < 1:
+                from mantis.helpers import CLI
+                CLI.error(f'Invalid value for --parallel: {value!r} is not a positive number')
+
+            result['parallel'] = int(value)
+            i += 2
         else:
             i += 1
 
     return result
 
 
+def load_app(commands: Optional[List[str]] = None):
+    """
+    Returns the typer app with given commands registered (all of them if None), importing
+    only their modules.
+    """
+    from mantis import commands as command_modules
+    from mantis.app import app, register_shortcuts
+
+    command_modules.load(commands)
+
+    # Register shortcuts after all commands (so they appear at end of help)
+    register_shortcuts()
+
+    return app
+
+
 def invoke_command(click_app, cmd_name: str, cmd_args: List[str], parent_ctx):
     """Invoke a single command with its arguments."""
+    import click
+
+    from mantis.app import state
     from mantis.helpers import CLI
 
     cmd = click_app.get_command(parent_ctx, cmd_name)
@@ -137,72 +163,156 @@ def invoke_command(click_app, cmd_name: str, cmd_args: List[str], parent_ctx):
     try:
         with cmd.make_context(cmd_name, cmd_args, parent=parent_ctx) as ctx:
             cmd.invoke(ctx)
+    except click.exceptions.Exit as e:
+        # Normal exit (e.g., from --help), a failed command ends the chain
+        if e.exit_code:
+            sys.exit(e.exit_code)
+
+
+def invoke_chain(cmd_groups: List[List[str]]):
+    """Invoke commands of the chain one after another, with the manager already in state."""
+    import click
+    import typer
+
+    app = load_app([group[0] for group in cmd_groups])
+
+    # Get Click app from Typer
+    click_app = typer.main.get_command(app)
+
+    # Create parent context and invoke each command
+    try:
+        with click_app.make_context('mantis', [], resilient_parsing=True) as parent_ctx:
+            for cmd_group in cmd_groups:
+                cmd_name = cmd_group[0]
+                cmd_args = cmd_group[1:]
+                invoke_command(click_app, cmd_name, cmd_args, parent_ctx)
     except click.exceptions.Exit:
-        # Normal exit (e.g., from --help)
         pass
 
 
+def wants_data_output(cmd_groups: List[List[str]]) -> bool:
+    """Whether any command of the chain prints machine-readable output (--json) to stdout."""
+    return any('--json' in group[1:] for group in cmd_groups)
+
+
+def is_multi_environment(environment_id: Optional[str]) -> bool:
+    """Whether -e selects several environments: a comma separated list or a glob (client-*)."""
+    return bool(environment_id) and any(char in environment_id for char in ',*?[')
+
+
+def without_environment(global_opts: List[str]) -> List[str]:
+    """Global options without -e/--env and --parallel, to be passed on per environment."""
+    result = []
+    skip_next = False
+
+    for opt in global_opts:
+        if skip_next:
+            skip_next = False
+        elif opt in ('-e', '--env', '--parallel'):
+            skip_next = True
+        else:
+            result.append(opt)
+
+    return result
+
+
+def run_environments(global_opts: List[str], cmd_groups: List[List[str]]):
+    """Run the command chain in every environment selected by a list or glob, in parallel."""
+    from mantis.config import find_config, load_config
+    from mantis.fanout import FanOut
+    from mantis.managers import resolve_environments
+
+    opts = parse_global_options(global_opts)
+    all_commands = [group[0] for group in cmd_groups if group]
+
+    config_file = find_config(commands=all_commands)
+    config = load_config(config_file)
+    environments = resolve_environments(opts['env'], config, config_file, command=all_commands[0])
+
+    fan_out = FanOut(environments, without_environment(global_opts), cmd_groups, parallel=opts['parallel'])
+    results = fan_out.run()
+    fan_out.print_matrix(results)
+
+    if any(result.exit_code for result in results.values()):
+        sys.exit(1)
+
+
 def run():
     """Entry point with command chaining support using '+' separator."""
     args = sys.argv[1:]
 
     # No args - show help
     if not args:
-        app()
+        load_app()()
         return
 
     global_opts, cmd_groups = split_args(args)
 
-    # No commands found - delegate to Typer (handles --help, --version, errors)
-    if not cmd_groups:
-        sys.argv = [sys.argv[0]] + global_opts
-        app()
-        return
-
-    # Handle --version early
+    # Handle --version early, before importing anything else
     if '--version' in global_opts or '-v' in global_opts:
         print(f"Mantis v{VERSION}")
         return
 
+    # No commands found - delegate to Typer (handles --help, errors)
+    if not cmd_groups:
+        sys.argv = [sys.argv[0]] + global_opts
+        load_app()()
+        return
+
     # Handle --help: show help for first command
     if '--help' in global_opts or '-h' in global_opts:
         sys.argv = [sys.argv[0]] + cmd_groups[0][:1] + ['--help']
-        app()
+        load_app(cmd_groups[0][:1])()
         return
 
     # Check if any command has --help in its args
     for cmd_group in cmd_groups:
         if '--help' in cmd_group or '-h' in cmd_group:
             sys.argv = [sys.argv[0]] + cmd_group[:1] + ['--help']
-            app()
+            load_app(cmd_group[:1])()
             return
 
+    # Many environments - run the chain once per environment (each of them may use its daemon)
+    if is_multi_environment(parse_global_options(global_opts)['env']):
+        run_environments(global_opts, cmd_groups)
+        return
+
+    from mantis import daemon
+
+    # Daemon running for the environment - let it run the chain with its warm manager
+    exit_code = daemon.forward(global_opts, cmd_groups)
+
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    # Machine-readable output - the heading, config lookup and progress go to stderr
+    if wants_data_output(cmd_groups):
+        from mantis.helpers import reserve_stdout
+        reserve_stdout()
+
     # Single command without chaining - delegate to Typer for normal flow
     if len(cmd_groups) == 1:
         sys.argv = [sys.argv[0]] + global_opts + cmd_groups[0]
-        app()
+        load_app(cmd_groups[0][:1])()
         return
 
+    from mantis.app import state
+    from mantis.managers import get_manager
+    from mantis.tracing import start_tracing
+
     # Multiple commands - parse options and initialize state manually
     opts = parse_global_options(global_opts)
     # Collect all command names from all groups
     all_commands = [group[0] for group in cmd_groups if group]
+
+    if opts['trace']:
+        start_tracing(opts['trace'])
+
     state._mode = opts['mode']
     state._dry_run = opts['dry_run']
     state._manager = get_manager(opts['env'], opts['mode'], dry_run=opts['dry_run'], commands=all_commands, use_tunnel=opts['use_tunnel'])
 
-    # Get Click app from Typer
-    click_app = typer.main.get_command(app)
-
-    # Create parent context and invoke each command
-    try:
-        with click_app.make_context('mantis', [], resilient_parsing=True) as parent_ctx:
-            for cmd_group in cmd_groups:
-                cmd_name = cmd_group[0]
-                cmd_args = cmd_group[1:]
-                invoke_command(click_app, cmd_name, cmd_args, parent_ctx)
-    except click.exceptions.Exit:
-        pass
+    invoke_chain(cmd_groups)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,16 @@
-"""Mantis CLI command modules."""
-from mantis.commands import (
-    core,
-    images,
-    containers,
-    compose,
-    services,
-    secrets,
-    configuration,
-    connection,
-    volumes,
-    django,
-    postgres,
-    nginx,
-)
-
-__all__ = [
+"""
+Mantis CLI command modules.
+
+Modules are imported only once one of their commands runs (see load), which keeps
+startup of a single command from importing every extension. The manifest below maps
+every command and shortcut to its module. Panels, help and environment requirements
+stay with the @command decorators, which register the commands once their module is
+imported. Names have to match the decorators (see tests/test_startup.py).
+"""
+import importlib
+from typing import Dict, Iterable, Optional
+
+MODULES = [
     'core',
     'images',
     'containers',
@@ -28,3 +24,104 @@ __all__ = [
     'postgres',
     'nginx',
 ]
+
+
+# command -> module defining it
+COMMANDS: Dict[str, str] = {
+    'status': 'core',
+    'deploy': 'core',
+    'rolling-update': 'core',
+    'clean': 'core',
+    'upload': 'core',
+    'build': 'images',
+    'pull': 'images',
+    'push': 'images',
+    'get-image-name': 'images',
+    'logs': 'containers',
+    'networks': 'containers',
+    'healthcheck': 'containers',
+    'stop': 'containers',
+    'start': 'containers',
+    'kill': 'containers',
+    'remove': 'containers',
+    'rename': 'containers',
+    'bash': 'containers',
+    'sh': 'containers',
+    'exec': 'containers',
+    'exec-it': 'containers',
+    'get-container-name': 'containers',
+    'remove-suffixes': 'containers',
+    'up': 'compose',
+    'down': 'compose',
+    'run': 'compose',
+    'restart': 'services',
+    'scale': 'services',
+    'zero-downtime': 'services',
+    'restart-service': 'services',
+    'services': 'services',
+    'services-to-build': 'services',
+    'show-env': 'secrets',
+    'encrypt-env': 'secrets',
+    'decrypt-env': 'secrets',
+    'migrate-encryption': 'secrets',
+    'check-env': 'secrets',
+    'generate-key': 'secrets',
+    'read-key': 'secrets',
+    'show-config': 'configuration',
+    'check-config': 'configuration',
+    'contexts': 'connection',
+    'create-context': 'connection',
+    'ssh': 'connection',
+    'check-tunnel': 'connection',
+    'shell-session': 'connection',
+    'daemon-start': 'connection',
+    'daemon-stop': 'connection',
+    'daemon-status': 'connection',
+    'backup-volume': 'volumes',
+    'restore-volume': 'volumes',
+    'shell': 'django',
+    'manage': 'django',
+    'send-test-email': 'django',
+    'reset-migrations': 'django',
+    'psql': 'postgres',
+    'pg-dump': 'postgres',
+    'pg-dump-data': 'postgres',
+    'pg-restore': 'postgres',
+    'pg-restore-data': 'postgres',
+    'reload-webserver': 'nginx',
+}
+
+# shortcut -> command
+SHORTCUTS: Dict[str, str] = {
+    's': 'status',
+    'd': 'deploy',
+    'ru': 'rolling-update',
+    'c': 'clean',
+    'u': 'upload',
+    'b': 'build',
+    'pl': 'pull',
+    'p': 'push',
+    'l': 'logs',
+    'n': 'networks',
+    'hc': 'healthcheck',
+}
+
+
+def command_module(name: str) -> Optional[str]:
+    """Returns module of given command or shortcut, None for an unknown one."""
+    return COMMANDS.get(SHORTCUTS.get(name, name))
+
+
+def load(commands: Optional[Iterable[str]] = None) -> None:
+    """
+    Imports modules of given commands, registering them with the app. Imports all of
+    them without commands (help) or with an unknown one, so typer can report it.
+    """
+    modules = [command_module(name) for name in commands or []]
+
+    if not modules or None in modules:
+        modules = MODULES
+
+    for module in MODULES:
+        if module in modules:
+            importlib.import_module(f'mantis.commands.{module}')
@@ -1,4 +1,4 @@
-"""Connection commands: contexts, create-context, ssh, check-tunnel."""
+"""Connection commands: contexts, create-context, ssh, check-tunnel, shell-session, daemon-start, daemon-stop, daemon-status."""
 import typer
 
 from mantis.app import command, state
@@ -27,3 +27,31 @@ def check_tunnel():
     """Checks if the docker socket can be tunnelled over SSH"""
     if not state.check_tunnel():
         raise typer.Exit(code=1)
+
+
+@command(name="shell-session", panel="Connections")
+def shell_session():
+    """Runs commands interactively, connecting to the environment only once"""
+    from mantis.shell import MantisShell
+
+    MantisShell(state).run()
+
+
+@command(name="daemon-start", panel="Connections")
+def daemon_start():
+    """Starts a background mantis keeping the connection warm for next commands"""
+    if not state.start_daemon():
+        raise typer.Exit(code=1)
+
+
+@command(name="daemon-stop", panel="Connections")
+def daemon_stop():
+    """Stops the background mantis of the environment"""
+    state.stop_daemon()
+
+
+@command(name="daemon-status", panel="Connections")
+def daemon_status():
+    """Checks if the background mantis of the environment is running"""
+    if not state.daemon_status():
+        raise typer.Exit(code=1)
@@ -9,15 +9,22 @@ from mantis.app import command, state
 @command(shortcut="l", panel="Containers")
 def logs(
     container: Optional[str] = typer.Argument(None, help="Container or service name"),
+    tail: Optional[int] = typer.Option(None, "--tail", help="Number of lines from the end of the logs"),
+    since: Optional[str] = typer.Option(None, "--since", help="Logs since timestamp (2024-01-02T13:23:37) or relative (42m)"),
+    until: Optional[str] = typer.Option(None, "--until", help="Logs before timestamp (2024-01-02T13:23:37) or relative (42m)"),
+    grep: Optional[str] = typer.Option(None, "--grep", help="Print only lines matching regular expression"),
+    merge: bool = typer.Option(False, "--merge", help="Order lines of all containers by their timestamps"),
 ):
     """Prints logs of containers"""
-    state.logs(container)
+    state.logs(container, tail=tail, since=since, until=until, grep=grep, merge=merge)
 
 
 @command(shortcut="n", panel="Containers")
-def networks():
+def networks(
+    as_json: bool = typer.Option(False, "--json", help="Print networks with their containers as JSON"),
+):
     """Prints docker networks"""
-    state.networks()
+    state.networks(as_json=as_json)
 
 
 @command(shortcut="hc", panel="Containers")
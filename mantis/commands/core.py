@@ -7,26 +7,32 @@ from mantis.app import command, state
 
 
 @command(shortcut="s")
-def status():
+def status(
+    as_json: bool = typer.Option(False, "--json", help="Print images and containers with their stats as JSON"),
+):
     """Prints images and containers"""
-    state.status()
+    state.status(as_json=as_json)
 
 
 @command(shortcut="d")
 def deploy(
     dirty: bool = typer.Option(False, "--dirty", help="Skip clean step"),
-    strategy: str = typer.Option("blue-green", "--strategy", "-s", help="Deployment strategy: rolling (one-by-one) or blue-green (scale 2x)"),
+    strategy: str = typer.Option("blue-green", "--strategy", "-s", help="Deployment strategy: rolling (in batches) or blue-green (scale 2x)"),
+    max_surge: int = typer.Option(1, "--max-surge", "--batch-size", min=0, help="Rolling strategy: new containers started per batch"),
+    max_unavailable: int = typer.Option(0, "--max-unavailable", min=0, help="Rolling strategy: old containers removed before their replacements are healthy"),
 ):
     """Runs deployment process"""
-    state.deploy(dirty=dirty, strategy=strategy)
+    state.deploy(dirty=dirty, strategy=strategy, max_surge=max_surge, max_unavailable=max_unavailable)
 
 
 @command(name="rolling-update", shortcut="ru")
 def rolling_update(
     service: Optional[str] = typer.Argument(None, help="Service to update (default: all zero_downtime services)"),
+    max_surge: int = typer.Option(1, "--max-surge", "--batch-size", min=0, help="New containers started per batch"),
+    max_unavailable: int = typer.Option(0, "--max-unavailable", min=0, help="Old containers removed before their replacements are healthy"),
 ):
-    """Performs rolling update of containers one-by-one"""
-    state.rolling_update(service=service)
+    """Performs rolling update of containers in batches"""
+    state.rolling_update(service=service, max_surge=max_surge, max_unavailable=max_unavailable)
 
 
 @command(shortcut="c")
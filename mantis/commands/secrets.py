@@ -1,4 +1,4 @@
-"""Cryptography commands: show-env, encrypt-env, decrypt-env, check-env, generate-key, read-key."""
+"""Cryptography commands: show-env, encrypt-env, decrypt-env, migrate-encryption, check-env, generate-key, read-key."""
 import typer
 
 from mantis.app import command, state
@@ -46,9 +46,10 @@ def show_env(
 @command(name="encrypt-env", panel="Secrets")
 def encrypt_env(
     force: bool = typer.Option(False, "--force", help="Skip confirmation"),
+    full: bool = typer.Option(False, "--full", help="Encrypt all variables again, not only changed ones"),
 ):
     """Encrypts environment files"""
-    state.encrypt_env(params='force' if force else '')
+    state.encrypt_env(params=' '.join(param for param, enabled in [('force', force), ('full', full)] if enabled))
 
 
 @command(name="decrypt-env", panel="Secrets")
@@ -59,6 +60,12 @@ def decrypt_env(
     state.decrypt_env(params='force' if force else '')
 
 
+@command(name="migrate-encryption", panel="Secrets")
+def migrate_encryption():
+    """Rewrites encrypted env files of legacy format"""
+    state.migrate_encryption()
+
+
 @command(name="check-env", panel="Secrets")
 def check_env():
     """Compares encrypted and decrypted env files"""
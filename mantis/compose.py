@@ -0,0 +1,162 @@
+"""Compose files parsed once and shared by all helpers reading them."""
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from mantis.helpers import merge_json
+
+
+@dataclass
+class ComposeService:
+    """A service as declared in a single compose file."""
+    name: str
+    project: str
+    compose_file: str
+    config: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def build(self) -> Optional[Dict[str, Any]]:
+        return self.config.get('build') or None
+
+    @property
+    def image(self) -> str:
+        return self.config.get('image', '')
+
+    @property
+    def platform(self) -> str:
+        return self.config.get('platform', '')
+
+    @property
+    def replicas(self) -> Optional[int]:
+        return (self.config.get('deploy') or {}).get('replicas')
+
+    @property
+    def container_name(self) -> Optional[str]:
+        return self.config.get('container_name')
+
+    @property
+    def healthcheck(self) -> Optional[Dict[str, Any]]:
+        return self.config.get('healthcheck')
+
+
+@dataclass
+class ComposeFile:
+    """A parsed compose file together with the mtime it was read at."""
+    path: str
+    mtime: float
+    data: Dict[str, Any] = field(default_factory=dict)
+    services: Dict[str, ComposeService] = field(init=False)
+
+    def __post_init__(self):
+        self.services = {
+            name: ComposeService(name=name, project=self.project, compose_file=self.path, config=config or {})
+            for name, config in (self.data.get('services') or {}).items()
+        }
+
+    @property
+    def project(self) -> str:
+        return self.data.get('name', '')
+
+    @classmethod
+    def read(cls, path: str) -> 'ComposeFile':
+        import yaml
+
+        mtime = os.stat(path).st_mtime
+
+        with open(path, 'r') as file:
+            data = yaml.safe_load(file) or {}
+
+        return cls(path=path, mtime=mtime, data=data)
+
+
+class ComposeModel(object):
+    """
+    Compose files of an environment, each parsed once and keyed by its path and mtime.
+
+    Listing services, projects, builds or replicas used to open and parse every compose
+    file again, i.e. once per service in a deployment.
+    """
+
+    def __init__(self, files: List[ComposeFile]):
+        self.files = files
+        self._merged = None
+
+    @classmethod
+    def load(cls, paths: List[str], previous: Optional['ComposeModel'] = None) -> 'ComposeModel':
+        """
+        Parses given compose files, reusing files of previous model which did not change since
+        """
+        parsed = {file.path: file for file in previous.files} if previous else {}
+        files = []
+
+        for path in paths:
+            file = parsed.get(path)
+
+            if file is None or file.mtime != os.stat(path).st_mtime:
+                file = ComposeFile.read(path)
+
+            files.append(file)
+
+        return cls(files)
+
+    def is_current(self, paths: List[str]) -> bool:
+        """
+        Checks whether the model was built from given files as they are now
+        """
+        if [file.path for file in self.files] != list(paths):
+            return False
+
+        try:
+            return all(file.mtime == os.stat(file.path).st_mtime for file in self.files)
+        except OSError:
+            return False
+
+    def get_file(self, path: str) -> ComposeFile:
+        for file in self.files:
+            if file.path == path:
+                return file
+
+        return ComposeFile.read(path)
+
+    @property
+    def merged(self) -> Dict[str, Any]:
+        """
+        Returns all compose files merged into a single config
+        """
+        if self._merged is None:
+            config = {}
+
+            for file in self.files:
+                config = merge_json(config, file.data)
+
+            self._merged = config
+
+        return self._merged
+
+    def services(self, compose_file: Optional[str] = None) -> List[str]:
+        files = [self.get_file(compose_file)] if compose_file else self.files
+        return [service for file in files for service in file.services.keys()]
+
+    def service_entries(self, compose_file: Optional[str] = None) -> List[ComposeService]:
+        files = [self.get_file(compose_file)] if compose_file else self.files
+        return [service for file in files for service in file.services.values()]
+
+    def project_services(self) -> Dict[str, List[str]]:
+        projects = {}
+
+        for file in self.files:
+            projects.setdefault(file.project, []).extend(file.services.keys())
+
+        return projects
+
+    def replicas(self, service: str) -> int:
+        """
+        Returns number of deploy replicas of given service, declared by the last compose file
+        """
+        replicas = 1
+
+        for entry in self.service_entries():
+            if entry.name == service and entry.replicas is not None:
+                replicas = entry.replicas
+
+        return replicas
@@ -1,22 +1,21 @@
 import os
 import sys
 import json
+import hashlib
 from dataclasses import dataclass, field
 from json.decoder import JSONDecodeError
 from pathlib import Path
 from typing import Optional
 
 from rich.console import Console
-from rich.table import Table
 
-from mantis.helpers import CLI
-from mantis.schema import EnvironmentConfig
+from mantis.helpers import CLI, merge_defaults
 
 
-SECRETS_COMMANDS = {'show-env', 'encrypt-env', 'decrypt-env', 'check-env'}
+SECRETS_COMMANDS = {'show-env', 'encrypt-env', 'decrypt-env', 'migrate-encryption', 'check-env'}
 
-# Default environment folder from schema
-DEFAULT_ENV_FOLDER = EnvironmentConfig.model_fields['folder'].default
+# Default environment folder, the same as in schema (not imported here, as pydantic is slow to import)
+DEFAULT_ENV_FOLDER = '<MANTIS>/../environments'
 
 
 def get_config_dir(config_path: str) -> str:
@@ -118,7 +117,7 @@ def find_config(environment_id: Optional[str] = None, commands: Optional[list] =
 
     # Search for mantis.json files
     CLI.info('Environment variable $MANTIS_CONFIG not found. Looking for file mantis.json...')
-    paths = sorted([str(p) for p in Path('.').rglob('mantis.json')])
+    paths = discover_configs(environment_id, commands or [])
 
     # No mantis file found
     if not paths:
@@ -136,6 +135,34 @@ def find_config(environment_id: Optional[str] = None, commands: Optional[list] =
     return _select_from_multiple_configs(paths, environment_id, commands or [])
 
 
+def discover_configs(environment_id: Optional[str], commands: list) -> list:
+    """
+    Find mantis.json files below the working directory, at most $MANTIS_CONFIG_DEPTH folders deep.
+    The search ends at the first depth at which the environment matches exactly one config.
+    """
+    from mantis.discovery import MAX_DEPTH, discover
+
+    depth = os.environ.get('MANTIS_CONFIG_DEPTH') or str(MAX_DEPTH)
+
+    if not depth.isdigit():
+        CLI.error(f'Invalid value of $MANTIS_CONFIG_DEPTH: {depth!r} is not a number of folders')
+
+    max_depth = int(depth)
+
+    def uniquely_matched(paths):
+        return sum(1 for index, path in enumerate(paths) if _matches_environment(path, index, environment_id, commands)) == 1
+
+    key = json.dumps([os.getcwd(), max_depth, environment_id, sorted(commands)])
+    index_file = cache_dir() / 'config-index' / f'{hashlib.sha256(key.encode()).hexdigest()[:16]}.json'
+
+    return discover(max_depth, stop=uniquely_matched if environment_id else None, index_file=index_file)
+
+
+def _matches_environment(path: str, index: int, environment_id: str, commands: list) -> bool:
+    analysis = analyze_config(path, index)
+    return not analysis.is_single_connection and env_matches_all_commands(environment_id, commands, analysis)
+
+
 def _select_from_multiple_configs(paths: list, environment_id: Optional[str], commands: list) -> str:
     """Handle selection when multiple config files are found."""
     # Determine command types
@@ -143,6 +170,8 @@ def _select_from_multiple_configs(paths: list, environment_id: Optional[str], co
     has_other_command = any(cmd not in SECRETS_COMMANDS for cmd in commands)
     show_both_columns = has_secrets_command and has_other_command
 
+    from rich.table import Table
+
     # Build table
     console = Console()
     table = Table(show_header=True, header_style="bold")
@@ -292,9 +321,68 @@ def load_config(config_file: str) -> dict:
             CLI.error(f"Failed to load config from file {config_file}: {e}")
 
 
+TEMPLATE_PATH = Path(__file__).parent / 'mantis.tpl'
+
+
 def load_template_config() -> dict:
-    template_path = Path(__file__).parent / 'mantis.tpl'
-    return load_config(str(template_path))
+    return load_config(str(TEMPLATE_PATH))
+
+
+def cache_dir() -> Path:
+    """Folder of mantis caches, $MANTIS_CACHE_DIR or mantis folder of the user cache."""
+    if os.environ.get('MANTIS_CACHE_DIR'):
+        return Path(os.environ['MANTIS_CACHE_DIR'])
+
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'mantis'
+
+
+def config_cache_key(config: dict) -> str:
+    """Hash of the config content, the template and mantis version."""
+    from mantis import VERSION
+
+    digest = hashlib.sha256(VERSION.encode())
+    digest.update(TEMPLATE_PATH.read_bytes())
+    digest.update(json.dumps(config, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def config_cache_path(config_file: str) -> Path:
+    path_hash = hashlib.sha256(str(Path(config_file).resolve()).encode()).hexdigest()[:16]
+    return cache_dir() / 'config' / f'{path_hash}.json'
+
+
+def load_validated_config(config: dict, config_file: str) -> dict:
+    """
+    Validates config and deep merges it over the template defaults, so declaring one key
+    of a section keeps the rest of that section's defaults.
+
+    The result is cached per config file. While the config, the template and mantis
+    version are unchanged, neither pydantic nor the template are loaded again.
+    """
+    key = config_cache_key(config)
+    cache_path = config_cache_path(config_file)
+
+    try:
+        cached = json.loads(cache_path.read_text())
+
+        if cached['key'] == key:
+            return cached['config']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    check_config(config)
+    merged = merge_defaults(load_template_config(), config)
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        temporary_path.write_text(json.dumps({'key': key, 'config': merged}))
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        # read-only home, the config is validated again next time
+        pass
+
+    return merged
 
 
 def check_config(config):
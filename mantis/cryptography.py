@@ -1,14 +1,25 @@
-from base64 import b64encode, b64decode
+import binascii
+import codecs
+import re
+from base64 import b64decode, urlsafe_b64decode, urlsafe_b64encode
 
 try:
     from Crypto.Cipher import AES
-    from cryptography.fernet import Fernet
+    from cryptography.exceptions import InvalidTag, UnsupportedAlgorithm
+    from cryptography.fernet import Fernet, InvalidToken
 except ImportError:
     # not using cryptography
     raise ImportError('Install pycryptodome and cryptography!')
 
 from mantis.helpers import CLI, random_string
 
+# version byte of the deterministic ciphertext envelope: version + 16 bytes tag + ciphertext, base64url
+ENVELOPE_VERSION = 1
+TAG_SIZE = 16
+
+# legacy deterministic format: base64 of str({"ciphertext": ..., "tag": ...})
+LEGACY_FORMAT = re.compile(r"""\{'ciphertext': b(['"])(?P<ciphertext>.*?)\1, 'tag': b(['"])(?P<tag>.*?)\3\}""", re.DOTALL)
+
 
 class Crypto(object):
     @staticmethod
@@ -20,47 +31,147 @@ class Crypto(object):
         return Fernet.generate_key()
 
     @staticmethod
-    def encrypt(data, key, deterministically=False):
-        if deterministically:
-            return Crypto.encrypt_deterministically(data, key)
+    def session(key, deterministically=False):
+        return CryptoSession(key, deterministically)
 
-        fernet = Fernet(key.encode())
-        encoded = data.encode()
-        encrypted = fernet.encrypt(encoded)
-        return encrypted.decode()
+    @staticmethod
+    def encrypt(data, key, deterministically=False):
+        return CryptoSession(key, deterministically).encrypt(data)
 
     @staticmethod
     def encrypt_deterministically(data, key):
-        cipher = AES.new(key.encode(), AES.MODE_SIV)
-        ciphertext, tag = cipher.encrypt_and_digest(data.encode())
-        data = {"ciphertext": ciphertext, "tag": tag}
-        encoded_data = b64encode(str(data).encode())
-        return encoded_data.decode()
+        return CryptoSession(key, deterministically=True).encrypt(data)
+
+    @staticmethod
+    def pack(ciphertext, tag):
+        """
+        Returns versioned envelope of ciphertext and tag, base64url encoded without padding
+        """
+        envelope = bytes([ENVELOPE_VERSION]) + tag + ciphertext
+        return urlsafe_b64encode(envelope).rstrip(b'=').decode()
+
+    @staticmethod
+    def unpack(secret):
+        """
+        Returns ciphertext and tag of a deterministically encrypted value, in envelope or legacy format
+        """
+        if Crypto.is_legacy(secret):
+            return Crypto.unpack_legacy(secret)
+
+        envelope = urlsafe_b64decode(secret + '=' * (-len(secret) % 4))
+
+        if len(envelope) < TAG_SIZE + 1 or envelope[0] != ENVELOPE_VERSION:
+            raise ValueError('Unknown encryption format')
+
+        return envelope[TAG_SIZE + 1:], envelope[1:TAG_SIZE + 1]
+
+    @staticmethod
+    def is_legacy(secret):
+        # base64 of "{'" (legacy format) starts with "eyd", envelope of version 1 with "A"
+        return secret.startswith('ey')
+
+    @staticmethod
+    def unpack_legacy(secret):
+        """
+        Returns ciphertext and tag of legacy format, parsing repr of their bytes without evaluating it
+        """
+        match = LEGACY_FORMAT.fullmatch(b64decode(secret).decode('ascii'))
+
+        if not match:
+            raise ValueError('Unknown encryption format')
+
+        return tuple(codecs.escape_decode(match.group(name).encode('ascii'))[0] for name in ('ciphertext', 'tag'))
+
+    @staticmethod
+    def migrate(secret):
+        """
+        Returns deterministically encrypted value in legacy format rewritten to envelope, without decrypting it
+        """
+        return Crypto.pack(*Crypto.unpack_legacy(secret)) if Crypto.is_legacy(secret) else secret
 
     @staticmethod
     def decrypt_deterministically(secret, key):
-        import ast
+        return CryptoSession(key, deterministically=True).decrypt(secret)
+
+    @staticmethod
+    def decrypt(secret, key, deterministically=False):
+        return CryptoSession(key, deterministically).decrypt(secret)
+
+
+class CryptoSession(object):
+    """
+    Cipher of a single key, built once and used for many values (see Crypto.session).
+
+    AES-SIV of cryptography is reusable (and gives the same output as pycryptodome, which
+    needs a new cipher object per value), pycryptodome is used only with older cryptography.
+    """
+
+    def __init__(self, key, deterministically=False):
+        self.key = key.encode()
+        self.deterministically = deterministically
+        self.fernet = None if deterministically else Fernet(self.key)
+        self.siv = None
+
+        if deterministically:
+            try:
+                from cryptography.hazmat.primitives.ciphers.aead import AESSIV
+                self.siv = AESSIV(self.key)
+            except (ImportError, ValueError, UnsupportedAlgorithm):
+                # older cryptography or OpenSSL, or key of unsupported length
+                pass
+
+    def encrypt(self, data):
+        if not self.deterministically:
+            return self.fernet.encrypt(data.encode()).decode()
+
+        if self.siv:
+            # tag followed by ciphertext
+            output = self.siv.encrypt(data.encode(), None)
+            return Crypto.pack(output[TAG_SIZE:], output[:TAG_SIZE])
+
+        ciphertext, tag = AES.new(self.key, AES.MODE_SIV).encrypt_and_digest(data.encode())
+        return Crypto.pack(ciphertext, tag)
+
+    def decrypt(self, secret):
+        try:
+            return self.decrypt_value(secret)
+        except ValueError as e:
+            CLI.error(str(e))
+
+    def decrypt_value(self, secret):
+        """
+        Returns decrypted secret, raises ValueError if it is corrupted or encrypted with another key
+        """
+        if not self.deterministically:
+            try:
+                return self.fernet.decrypt(secret.encode()).decode()
+            except InvalidToken:
+                raise ValueError('Decryption failed. You are probably decrypting with incorrect key.')
 
         try:
-            data = ast.literal_eval(b64decode(secret).decode())
-        except UnicodeDecodeError:
-            CLI.error('Decryption failed. Check if data are not corrupted.')
+            ciphertext, tag = Crypto.unpack(secret)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            raise ValueError('Decryption failed. Check if data are not corrupted.')
 
         try:
-            cipher = AES.new(key.encode(), AES.MODE_SIV)
-            data = cipher.decrypt_and_verify(data['ciphertext'], data['tag'])
+            if self.siv:
+                data = self.siv.decrypt(tag + ciphertext, None)
+            else:
+                data = AES.new(self.key, AES.MODE_SIV).decrypt_and_verify(ciphertext, tag)
+        except InvalidTag:
+            raise ValueError('MAC check failed. You are probably decrypting with incorrect key.')
         except ValueError as e:
             if str(e) == 'MAC check failed':
-                CLI.error('MAC check failed. You are probably decrypting with incorrect key.')
-            CLI.error(str(e))
+                raise ValueError('MAC check failed. You are probably decrypting with incorrect key.')
+            raise
 
         return data.decode()
 
-    @staticmethod
-    def decrypt(secret, key, deterministically=False):
-        if deterministically:
-            return Crypto.decrypt_deterministically(secret, key)
+    def encrypt_many(self, values):
+        return [self.encrypt(data) for data in values]
 
-        fernet = Fernet(key.encode())
-        decrypted = fernet.decrypt(secret.encode())
-        return decrypted.decode()
+    def decrypt_many(self, secrets):
+        """
+        Returns decrypted secrets, raises ValueError if any of them can't be decrypted
+        """
+        return [self.decrypt_value(secret) for secret in secrets]
@@ -0,0 +1,545 @@
+"""
+Background mantis process keeping the manager, SSH tunnel and container listing of one
+environment warm between invocations (mantis -e production daemon-start).
+
+Thin invocations find the daemon by a unix socket derived from the working directory,
+$MANTIS_CONFIG, mode and environment. They pass it their commands, environment variables
+mantis and docker use and standard streams (as file descriptors) and exit with its exit code.
+Sockets live in a directory only the current user can access, peers of other users are refused. The daemon forks
+per command chain, so every chain runs in a fresh copy of the warm process: sys.exit,
+output and state of one chain never leak into the next one.
+
+This module is imported by every invocation, so it only imports the standard library
+at module level.
+"""
+import glob
+import hashlib
+import json
+import os
+import selectors
+import signal
+import socket
+import stat
+import struct
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from mantis import VERSION
+
+# global options a daemon can serve, anything else (--dry-run, --trace, ...) runs locally
+FORWARDED_OPTIONS = {'-e', '--env', '-m', '--mode'}
+
+# commands managing the daemon itself always run locally
+DAEMON_COMMANDS = {'daemon-start', 'daemon-stop', 'daemon-status'}
+
+# commands which do not change containers, so the warm container listing stays valid
+READ_ONLY_COMMANDS = {
+    'status', 's', 'logs', 'l', 'networks', 'n', 'healthcheck', 'hc', 'check-tunnel',
+    'contexts', 'show-env', 'check-env', 'show-config', 'check-config', 'read-key',
+    'get-container-name', 'get-image-name', 'services-to-build',
+}
+
+# seconds a container listing is reused by chains, containers may change outside the daemon
+INVENTORY_TTL = 5
+
+HEADER = struct.Struct('!Q')
+
+# environment variables of an invocation its chain runs with, the rest comes from the daemon
+FORWARDED_ENVIRONMENT = {
+    'PATH', 'HOME', 'USER', 'TERM', 'COLUMNS', 'LINES', 'NO_COLOR', 'FORCE_COLOR', 'COLORTERM',
+    'LANG', 'LC_ALL', 'LC_CTYPE', 'TZ', 'SSH_AUTH_SOCK', 'XDG_CACHE_HOME',
+}
+FORWARDED_ENVIRONMENT_PREFIXES = ('MANTIS_', 'DOCKER_', 'COMPOSE_')
+
+
+def socket_dir() -> Path:
+    # unix socket paths are limited to ~104 characters, so prefer a shallow base directory
+    base_dir = Path('/tmp') if Path('/tmp').is_dir() else Path(os.environ.get('TMPDIR', '/tmp'))
+    return base_dir / f'mantis-{os.getuid()}'
+
+
+def is_private(directory: Path) -> bool:
+    """
+    Returns whether the socket directory is a real directory only the current user can access,
+    so that no other user can listen on sockets in it and receive environment and terminal
+    """
+    try:
+        info = os.lstat(directory)
+    except OSError:
+        return False
+
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and stat.S_IMODE(info.st_mode) == 0o700
+
+
+def peer_uid(connection: socket.socket) -> Optional[int]:
+    """
+    Returns user id of the process at the other end of a unix socket, None where the platform can't tell
+    """
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid
+
+
+def is_trusted_peer(connection: socket.socket) -> bool:
+    uid = peer_uid(connection)
+    return uid is None or uid == os.getuid()
+
+
+def forwarded_environment(environ: Dict[str, str]) -> Dict[str, str]:
+    return {
+        name: value for name, value in environ.items()
+        if name in FORWARDED_ENVIRONMENT or name.startswith(FORWARDED_ENVIRONMENT_PREFIXES)
+    }
+
+
+def socket_prefix(mode: str) -> str:
+    """
+    Daemons serve invocations from the same folder, with the same config override and mode
+    """
+    key = json.dumps([VERSION, os.getcwd(), os.environ.get('MANTIS_CONFIG', ''), mode])
+    return f'daemon-{hashlib.sha256(key.encode()).hexdigest()[:16]}'
+
+
+def socket_path(environment_id: Optional[str], mode: str = 'remote') -> Path:
+    return socket_dir() / f'{socket_prefix(mode)}-{environment_id or ""}.sock'
+
+
+def find_socket(environment_id: Optional[str], mode: str = 'remote') -> Optional[Path]:
+    """
+    Returns socket of a daemon serving given environment, or its only daemon matching
+    the environment as a prefix (like -e resolves prefixes)
+    """
+    path = socket_path(environment_id, mode)
+
+    if path.exists():
+        return path
+
+    if not environment_id:
+        return None
+
+    prefix = f'{socket_prefix(mode)}-{glob.escape(environment_id)}'
+    matches = list(socket_dir().glob(f'{prefix}*.sock')) if socket_dir().is_dir() else []
+
+    return matches[0] if len(matches) == 1 else None
+
+
+def forwardable(global_opts: List[str], cmd_groups: List[List[str]]) -> Optional[Tuple[Optional[str], str]]:
+    """
+    Returns environment and mode of an invocation a daemon can serve, None otherwise
+    """
+    environment_id, mode = None, 'remote'
+    i = 0
+
+    while i < len(global_opts):
+        opt = global_opts[i]
+
+        if opt not in FORWARDED_OPTIONS or i + 1 >= len(global_opts):
+            return None
+
+        if opt in ('-e', '--env'):
+            environment_id = global_opts[i + 1]
+        else:
+            mode = global_opts[i + 1]
+
+        i += 2
+
+    if not cmd_groups or any(group[0] in DAEMON_COMMANDS for group in cmd_groups):
+        return None
+
+    return environment_id, mode
+
+
+def forward(global_opts: List[str], cmd_groups: List[List[str]]) -> Optional[int]:
+    """
+    Runs the command chain in a daemon serving its environment, returning its exit code.
+    Returns None if there is no such daemon (or it declined), so the chain runs locally.
+    """
+    if os.environ.get('MANTIS_NO_DAEMON'):
+        return None
+
+    target = forwardable(global_opts, cmd_groups)
+
+    if target is None:
+        return None
+
+    if not is_private(socket_dir()):
+        return None
+
+    path = find_socket(*target)
+
+    if path is None:
+        return None
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        connection.connect(str(path))
+    except (ConnectionRefusedError, FileNotFoundError):
+        # daemon died without removing its socket
+        path.unlink(missing_ok=True)
+        return None
+
+    if not is_trusted_peer(connection):
+        connection.close()
+        return None
+
+    payload = json.dumps({
+        'cmd_groups': cmd_groups,
+        'cwd': os.getcwd(),
+        'env': forwarded_environment(os.environ),
+    }).encode()
+
+    with connection:
+        socket.send_fds(connection, [HEADER.pack(len(payload))], [0, 1, 2])
+        connection.sendall(payload)
+
+        response = b''
+
+        while True:
+            try:
+                data = connection.recv(4096)
+            except KeyboardInterrupt:
+                # Ctrl+C interrupts this process only, pass it on to the command
+                connection.sendall(b'INT')
+                continue
+
+            if not data:
+                break
+
+            response += data
+
+    try:
+        return json.loads(response)['exit_code']
+    except ValueError:
+        # daemon went away in the middle of the chain
+        return 1
+
+
+def receive_request(connection: socket.socket) -> Tuple[Dict, List[int]]:
+    header, fds, _, _ = socket.recv_fds(connection, HEADER.size, 3)
+    size, = HEADER.unpack(header)
+    payload = b''
+
+    while len(payload) < size:
+        data = connection.recv(size - len(payload))
+
+        if not data:
+            raise ConnectionError('Request ended prematurely')
+
+        payload += data
+
+    return json.loads(payload), fds
+
+
+def redirect(stdin: int, stdout: int, stderr: int) -> None:
+    """
+    Makes given file descriptors the standard streams of this (forked) process
+    """
+    for fd, target in zip((stdin, stdout, stderr), (0, 1, 2)):
+        os.dup2(fd, target)
+
+    # sys streams may have been replaced (e.g. captured), point them to the new descriptors
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, 'w', buffering=1, closefd=False)
+    sys.stderr = open(2, 'w', buffering=1, closefd=False)
+
+
+def exit_code(status: int) -> int:
+    code = os.waitstatus_to_exitcode(status)
+    # killed by a signal, like a shell reports it
+    return 128 - code if code < 0 else code
+
+
+class MantisDaemon(object):
+    """
+    Serves command chains of invocations with a manager built once
+    """
+
+    def __init__(self, manager, path: Path, idle_timeout: int = 900):
+        self.manager = manager
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.config_mtime = os.path.getmtime(manager.config_file)
+        self.running = True
+        self.listed_at = 0.0
+        # pid of forked chain -> (connection of its invocation, its commands)
+        self.chains: Dict[int, Tuple[socket.socket, List[str]]] = {}
+
+    def warm_up(self) -> None:
+        self.manager.ensure_tunnel()
+        self.manager.get_container_inventory()
+        self.listed_at = time.monotonic()
+
+    def serve(self) -> None:
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.path.unlink(missing_ok=True)
+        pid_file(self.path).write_text(str(os.getpid()))
+        server.bind(str(self.path))
+        self.path.chmod(0o600)
+        server.listen(16)
+
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ)
+        signal.signal(signal.SIGTERM, self.stop)
+        last_activity = time.monotonic()
+
+        print(f'Listening on {self.path}', flush=True)
+
+        try:
+            while self.running:
+                for key, _ in selector.select(timeout=0.1):
+                    if key.fileobj is server:
+                        self.accept(server.accept()[0], selector)
+                    else:
+                        self.relay_interrupt(key.fileobj, key.data, selector)
+
+                self.reap(selector)
+
+                if self.chains:
+                    last_activity = time.monotonic()
+                elif time.monotonic() - last_activity > self.idle_timeout:
+                    print(f'No command for {self.idle_timeout} seconds, stopping', flush=True)
+                    break
+        finally:
+            selector.close()
+            server.close()
+            self.path.unlink(missing_ok=True)
+            pid_file(self.path).unlink(missing_ok=True)
+            self.manager.stop_tunnel()
+
+    def stop(self, *args) -> None:
+        self.running = False
+
+    def accept(self, connection: socket.socket, selector: selectors.BaseSelector) -> None:
+        if not is_trusted_peer(connection):
+            print('Refused connection of another user', flush=True)
+            connection.close()
+            return
+
+        try:
+            connection.settimeout(5)
+            request, fds = receive_request(connection)
+            connection.settimeout(None)
+        except (OSError, ValueError) as e:
+            print(f'Invalid request: {e}', flush=True)
+            connection.close()
+            return
+
+        commands = [group[0] for group in request['cmd_groups']]
+
+        if os.path.getmtime(self.manager.config_file) != self.config_mtime:
+            # the warm manager is outdated, let the invocation run locally
+            print('Config changed, stopping', flush=True)
+            connection.sendall(json.dumps({'exit_code': None}).encode())
+            connection.close()
+            self.running = False
+        else:
+            print(f'Running {" + ".join(commands)}', flush=True)
+            pid = os.fork()
+
+            if pid == 0:
+                self.run_chain(request, fds)
+
+            self.chains[pid] = (connection, commands)
+            selector.register(connection, selectors.EVENT_READ, pid)
+
+        for fd in fds:
+            os.close(fd)
+
+    def run_chain(self, request: Dict, fds: List[int]) -> None:
+        """
+        Runs in the forked process, with standard streams of the invocation. Never returns.
+        """
+        code = 0
+
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+            # the kept-alive Docker Engine API connection is the daemon's, requests of chains must not mix on it
+            self.manager.forget_engine()
+
+            # containers may have changed meanwhile (other shells, CI, plain docker), list them again
+            if time.monotonic() - self.listed_at > INVENTORY_TTL:
+                self.manager.invalidate_containers()
+
+            redirect(*fds)
+
+            from mantis.command_line import wants_data_output
+
+            if wants_data_output(request['cmd_groups']):
+                from mantis.helpers import reserve_stdout
+                reserve_stdout()
+
+            os.chdir(request['cwd'])
+
+            # variables the invocation does not set must not keep values of the daemon
+            for name in forwarded_environment(os.environ):
+                del os.environ[name]
+
+            os.environ.update(forwarded_environment(request['env']))
+
+            # the shared console detected the daemon's log file, not the invocation's terminal
+            from rich.console import Console
+            from mantis import helpers
+            helpers._console = Console()
+
+            from mantis.app import state
+            from mantis.command_line import invoke_chain
+
+            state._manager = self.manager
+            state._mode = self.manager.mode
+            state._dry_run = self.manager.dry_run
+
+            invoke_chain(request['cmd_groups'])
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except KeyboardInterrupt:
+            code = 130
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # skips atexit, which would close the daemon's tunnel
+            os._exit(code)
+
+    def relay_interrupt(self, connection: socket.socket, pid: int, selector: selectors.BaseSelector) -> None:
+        try:
+            data = connection.recv(64)
+        except OSError:
+            data = b''
+
+        if data:
+            os.kill(pid, signal.SIGINT)
+        else:
+            # invocation went away, so does its chain
+            selector.unregister(connection)
+            os.kill(pid, signal.SIGTERM)
+
+    def reap(self, selector: selectors.BaseSelector) -> None:
+        while self.chains:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+
+            if pid == 0:
+                return
+
+            connection, commands = self.chains.pop(pid)
+
+            try:
+                selector.unregister(connection)
+            except KeyError:
+                pass
+
+            try:
+                connection.sendall(json.dumps({'exit_code': exit_code(status)}).encode())
+            except OSError:
+                pass
+
+            connection.close()
+
+            if not READ_ONLY_COMMANDS.issuperset(commands):
+                self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Lists containers again after a chain which may have changed them
+        """
+        self.manager.invalidate_containers()
+
+        try:
+            self.manager.get_container_inventory()
+            self.listed_at = time.monotonic()
+        except (Exception, SystemExit) as e:
+            print(f'Listing containers failed: {e}', flush=True)
+            self.manager.invalidate_containers()
+
+
+def start(manager, path: Path, idle_timeout: int = 900, timeout: float = 60) -> Optional[int]:
+    """
+    Forks a daemon serving given manager, detached from the terminal. Returns its pid
+    once it listens on the socket, or None if it did not start in time.
+    """
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    if not is_private(path.parent):
+        raise PermissionError(f'{path.parent} must be a directory owned by the current user with mode 700')
+
+    log_file = path.with_suffix('.log')
+
+    pid = os.fork()
+
+    if pid == 0:
+        os.setsid()
+
+        with open(os.devnull) as devnull, open(log_file, 'a') as log:
+            redirect(devnull.fileno(), log.fileno(), log.fileno())
+
+        code = 0
+
+        try:
+            daemon = MantisDaemon(manager, path, idle_timeout)
+            daemon.warm_up()
+            daemon.serve()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        if path.exists():
+            return pid
+
+        if os.waitpid(pid, os.WNOHANG)[0]:
+            return None
+
+        time.sleep(0.05)
+
+    return None
+
+
+def stop(path: Path, timeout: float = 10) -> bool:
+    """
+    Stops daemon listening on given socket, returns whether there was one
+    """
+    pid = daemon_pid(path)
+
+    if pid is None:
+        path.unlink(missing_ok=True)
+        pid_file(path).unlink(missing_ok=True)
+        return False
+
+    os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+
+    while path.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    return True
+
+
+def pid_file(path: Path) -> Path:
+    return path.with_suffix('.pid')
+
+
+def daemon_pid(path: Path) -> Optional[int]:
+    """
+    Returns pid of the daemon listening on given socket, if it is still running
+    """
+    try:
+        pid = int(pid_file(path).read_text())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return None
+
+    return pid if path.exists() else None
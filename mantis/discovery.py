@@ -0,0 +1,187 @@
+"""
+Discovery of mantis.json files below the working directory, used when $MANTIS_CONFIG is not set.
+
+The walk goes breadth first, at most `max_depth` folders deep, and skips VCS, virtualenv and
+dependency folders as well as paths ignored by .gitignore files. Found paths are kept in an
+index file together with modification times of every visited folder, so a repeated discovery
+only checks that none of them changed instead of listing them again.
+"""
+import json
+import os
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+CONFIG_NAME = 'mantis.json'
+
+MAX_DEPTH = 6
+
+# folders never containing project configs, pruned without looking inside
+PRUNED_DIRS = {
+    '.git', '.hg', '.svn', '.bzr',
+    'node_modules', 'bower_components', '.venv', 'venv', '.tox', '.nox',
+    '__pycache__', '.mypy_cache', '.pytest_cache', '.ruff_cache', '.cache',
+    '.idea', '.vscode', 'site-packages',
+}
+
+
+class GitIgnore(object):
+    """
+    Rules of .gitignore files collected along the walk. Supports globs, negation, rules
+    anchored by a slash and rules matching folders only (trailing slash).
+    """
+
+    def __init__(self, rules: Tuple = ()):
+        # (base folder, pattern, negate, folders only, anchored)
+        self.rules = rules
+
+    def extend(self, base: str, path: str) -> 'GitIgnore':
+        """
+        Returns rules extended by the .gitignore file at path, located in the base folder
+        """
+        try:
+            with open(path) as file:
+                lines = file.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return self
+
+        rules = []
+
+        for line in lines:
+            line = line.strip()
+
+            if not line or line.startswith('#'):
+                continue
+
+            negate = line.startswith('!')
+            pattern = line[1:] if negate else line
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            anchored = '/' in pattern
+            pattern = pattern.lstrip('/')
+
+            if pattern:
+                rules.append((base, pattern, negate, dir_only, anchored))
+
+        return GitIgnore(self.rules + tuple(rules)) if rules else self
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """
+        Returns whether path relative to the root of the walk is ignored, the last matching rule wins
+        """
+        ignored = False
+        name = path.rsplit('/', 1)[-1]
+
+        for base, pattern, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+
+            if base:
+                if not path.startswith(f'{base}/'):
+                    continue
+
+                relative = path[len(base) + 1:]
+            else:
+                relative = path
+
+            if fnmatch(relative, pattern) if anchored else fnmatch(name, pattern):
+                ignored = not negate
+
+        return ignored
+
+
+def is_pruned(path: str, name: str, ignore: GitIgnore) -> bool:
+    return (
+        name in PRUNED_DIRS
+        or os.path.exists(os.path.join(path, 'pyvenv.cfg'))
+        or ignore.ignored(path, is_dir=True)
+    )
+
+
+def walk(max_depth: int = MAX_DEPTH, stop: Optional[Callable[[List[str]], bool]] = None) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Returns sorted paths of config files and modification times of visited folders, config and
+    .gitignore files. The walk ends after a level at which `stop` returns True for found paths.
+    """
+    found = []
+    visited = {}
+    level = [('', GitIgnore())]
+
+    for depth in range(max_depth + 1):
+        next_level = []
+
+        for folder, ignore in level:
+            path = folder or '.'
+
+            try:
+                visited[path] = os.stat(path).st_mtime_ns
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+
+            if any(entry.name == '.gitignore' for entry in entries):
+                gitignore = os.path.join(path, '.gitignore')
+                visited[gitignore] = os.stat(gitignore).st_mtime_ns
+                ignore = ignore.extend(folder, gitignore)
+
+            for entry in entries:
+                relative = f'{folder}/{entry.name}' if folder else entry.name
+
+                if entry.is_dir(follow_symlinks=False):
+                    if not is_pruned(relative, entry.name, ignore):
+                        next_level.append((relative, ignore))
+                elif entry.name == CONFIG_NAME and not ignore.ignored(relative, is_dir=False):
+                    found.append(relative)
+                    visited[relative] = entry.stat().st_mtime_ns
+
+        if not next_level or (stop and stop(sorted(found))):
+            break
+
+        level = next_level
+
+    return sorted(found), visited
+
+
+def read_index(index_file: Path) -> Optional[List[str]]:
+    """
+    Returns paths of the index, unless any of visited folders or files changed since
+    """
+    try:
+        index = json.loads(index_file.read_text())
+
+        for path, mtime in index['visited'].items():
+            if os.stat(path).st_mtime_ns != mtime:
+                return None
+
+        return index['paths']
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def write_index(index_file: Path, paths: List[str], visited: Dict[str, int]) -> None:
+    try:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        temporary_file = index_file.with_suffix(f'.{os.getpid()}.tmp')
+        temporary_file.write_text(json.dumps({'paths': paths, 'visited': visited}))
+        os.replace(temporary_file, index_file)
+    except OSError:
+        # read-only cache, the walk is repeated next time
+        pass
+
+
+def discover(max_depth: int = MAX_DEPTH, stop: Optional[Callable[[List[str]], bool]] = None, index_file: Optional[Path] = None) -> List[str]:
+    """
+    Returns sorted paths of config files below the working directory, from the index if still valid
+    """
+    if index_file:
+        paths = read_index(index_file)
+
+        if paths is not None:
+            return paths
+
+    paths, visited = walk(max_depth, stop)
+
+    if index_file:
+        write_index(index_file, paths, visited)
+
+    return paths
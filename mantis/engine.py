@@ -0,0 +1,316 @@
+"""
+Docker Engine API client talking HTTP/1.1 straight to a unix socket.
+
+Every docker CLI call forks a shell and the docker binary, which costs 50-100 ms before
+the request even leaves the machine. Read-only queries go through this client instead,
+reusing a keep-alive connection to the socket forwarded by the SSH tunnel.
+"""
+import http.client
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlencode
+
+from mantis.inventory import ContainerInfo, ContainerInventory, NUMBER_LABEL, PROJECT_LABEL, SERVICE_LABEL
+
+
+class EngineError(Exception):
+    """Docker daemon answered with an error or could not be reached."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix socket instead of TCP."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerEngine(object):
+    """
+    Read-only subset of the Docker Engine API: ps, inspect, health, logs, stats, networks
+    and images. Compose operations stay with the docker CLI.
+
+    Connections are kept alive and reused, one per thread, as http.client connections
+    cannot be shared between threads.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self) -> UnixHTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            connection = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            self._local.connection = connection
+
+        return connection
+
+    def close(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> bytes:
+        """
+        Sends a request and returns body of the response, reconnecting once when the daemon
+        closed the kept-alive connection meanwhile
+        """
+        url = path
+
+        if params:
+            url += '?' + urlencode({key: value for key, value in params.items() if value is not None})
+
+        for attempt in range(2):
+            connection = self.connection()
+
+            try:
+                connection.request(method, url, headers={'Host': 'docker'})
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                self.close()
+
+                if attempt:
+                    raise EngineError(f'Docker daemon closed the connection: {e}')
+            except OSError as e:
+                self.close()
+                raise EngineError(f'Docker daemon not reachable at {self.socket_path}: {e}')
+
+        if response.status >= 400:
+            try:
+                message = json.loads(body).get('message', '')
+            except ValueError:
+                message = body.decode(errors='replace')
+
+            raise EngineError(message or f'HTTP {response.status}', status=response.status)
+
+        return body
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return json.loads(self.request('GET', path, params) or b'null')
+
+    def version(self) -> Dict[str, Any]:
+        return self.get('/version')
+
+    def containers(self, all: bool = True, size: bool = False) -> List[Dict[str, Any]]:
+        return self.get('/containers/json', {'all': int(all), 'size': int(size)})
+
+    def inspect_container(self, container: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.get(f'/containers/{quote(container)}/json')
+        except EngineError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def health_status(self, container: str) -> Optional[str]:
+        details = self.inspect_container(container) or {}
+        return ((details.get('State') or {}).get('Health') or {}).get('Status')
+
+    def container_stats(self, container: str) -> Dict[str, Any]:
+        # not streamed, the daemon samples twice so that precpu_stats are filled in
+        return self.get(f'/containers/{quote(container)}/stats', {'stream': 0})
+
+    def logs(self, container: str, tail: Optional[int] = None, timestamps: bool = False,
+             since: Optional[str] = None, until: Optional[str] = None) -> str:
+        body = self.request('GET', f'/containers/{quote(container)}/logs', {
+            'stdout': 1,
+            'stderr': 1,
+            'tail': tail if tail is not None else 'all',
+            'timestamps': int(timestamps),
+            'since': since,
+            'until': until,
+        })
+
+        return demultiplex(body).decode(errors='replace')
+
+    def images(self) -> List[Dict[str, Any]]:
+        return self.get('/images/json')
+
+    def networks(self) -> List[Dict[str, Any]]:
+        return self.get('/networks')
+
+    def inspect_network(self, network: str) -> Dict[str, Any]:
+        return self.get(f'/networks/{quote(network)}')
+
+
+def demultiplex(body: bytes) -> bytes:
+    """
+    Strips stream headers the daemon puts in front of every frame of stdout/stderr output
+    of containers running without a TTY. Output of containers with a TTY is returned as is.
+    """
+    if len(body) < 8 or body[0] not in (0, 1, 2) or body[1:4] != b'\x00\x00\x00':
+        return body
+
+    output = bytearray()
+    position = 0
+
+    while position + 8 <= len(body):
+        size = struct.unpack('>I', body[position + 4:position + 8])[0]
+        output += body[position + 8:position + 8 + size]
+        position += 8 + size
+
+    return bytes(output)
+
+
+def inventory_from_engine(containers: List[Dict[str, Any]]) -> ContainerInventory:
+    """
+    Builds the same inventory "docker container ls" would provide (see INVENTORY_FORMAT)
+    """
+    inventory = []
+
+    for container in containers:
+        labels = container.get('Labels') or {}
+        number = labels.get(NUMBER_LABEL, '')
+
+        inventory.append(ContainerInfo(
+            name=container_name(container),
+            state=container.get('State', ''),
+            status=container.get('Status', ''),
+            project=labels.get(PROJECT_LABEL) or None,
+            service=labels.get(SERVICE_LABEL) or None,
+            number=int(number) if number.isdigit() else None,
+        ))
+
+    return ContainerInventory(inventory)
+
+
+def container_name(container: Dict[str, Any]) -> str:
+    names = container.get('Names') or ['']
+    return names[0].lstrip('/')
+
+
+def format_ports(ports: List[Dict[str, Any]]) -> str:
+    """
+    Formats published ports like "docker container ls" does
+    """
+    formatted = []
+
+    for port in sorted(ports or [], key=lambda p: (p.get('PrivatePort', 0), p.get('IP', ''))):
+        private = f"{port.get('PrivatePort')}/{port.get('Type', 'tcp')}"
+
+        if port.get('PublicPort'):
+            ip = port.get('IP', '')
+            ip = f'[{ip}]' if ':' in ip else ip
+            formatted.append(f"{ip}:{port['PublicPort']}->{private}")
+        elif private not in formatted:
+            formatted.append(private)
+
+    return ', '.join(formatted)
+
+
+def human_size(size: float, precision: int = 4) -> str:
+    """
+    Decimal size the way docker prints image and container sizes, e.g. "123MB"
+    """
+    return _format_size(size, 1000.0, ['B', 'kB', 'MB', 'GB', 'TB', 'PB'], precision)
+
+
+def bytes_size(size: float) -> str:
+    """
+    Binary size the way docker prints memory usage, e.g. "12.5MiB"
+    """
+    return _format_size(size, 1024.0, ['B', 'KiB', 'MiB', 'GiB', 'TiB', 'PiB'], 4)
+
+
+def _format_size(size: float, base: float, units: List[str], precision: int) -> str:
+    size = float(size or 0)
+    index = 0
+
+    while size >= base and index < len(units) - 1:
+        size /= base
+        index += 1
+
+    return f'{size:.{precision}g}{units[index]}'
+
+
+def human_duration(seconds: float) -> str:
+    """
+    Approximate duration the way docker prints it, e.g. "About an hour" or "3 weeks"
+    """
+    if seconds < 1:
+        return 'Less than a second'
+    if int(seconds) == 1:
+        return '1 second'
+    if seconds < 60:
+        return f'{int(seconds)} seconds'
+
+    minutes = int(seconds / 60)
+
+    if minutes == 1:
+        return 'About a minute'
+    if minutes < 60:
+        return f'{minutes} minutes'
+
+    hours = int(seconds / 3600 + 0.5)
+
+    if hours == 1:
+        return 'About an hour'
+    if hours < 48:
+        return f'{hours} hours'
+    if hours < 24 * 7 * 2:
+        return f'{hours // 24} days'
+    if hours < 24 * 30 * 2:
+        return f'{hours // 24 // 7} weeks'
+    if hours < 24 * 365 * 2:
+        return f'{hours // 24 // 30} months'
+
+    return f'{int(seconds / 3600 / 24 / 365)} years'
+
+
+def created_since(timestamp: float, now: Optional[float] = None) -> str:
+    now = time.time() if now is None else now
+    return f'{human_duration(now - timestamp)} ago'
+
+
+def cpu_percent(stats: Dict[str, Any]) -> str:
+    """
+    CPU usage from a stats sample, computed the way "docker stats" does
+    """
+    cpu = stats.get('cpu_stats') or {}
+    precpu = stats.get('precpu_stats') or {}
+
+    cpu_delta = (cpu.get('cpu_usage') or {}).get('total_usage', 0) - (precpu.get('cpu_usage') or {}).get('total_usage', 0)
+    system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+    online_cpus = cpu.get('online_cpus') or len((cpu.get('cpu_usage') or {}).get('percpu_usage') or []) or 1
+
+    percent = cpu_delta / system_delta * online_cpus * 100.0 if cpu_delta > 0 and system_delta > 0 else 0.0
+
+    return f'{percent:.2f}%'
+
+
+def memory_usage(stats: Dict[str, Any]) -> str:
+    """
+    Memory usage from a stats sample, without page cache (as "docker stats" shows it)
+    """
+    memory = stats.get('memory_stats') or {}
+    details = memory.get('stats') or {}
+
+    # cgroup v1 reports "total_inactive_file", cgroup v2 "inactive_file"
+    cache = details.get('total_inactive_file', details.get('inactive_file', 0))
+    usage = max(memory.get('usage', 0) - cache, 0)
+
+    return f"{bytes_size(usage)} / {bytes_size(memory.get('limit', 0))}"
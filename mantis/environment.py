@@ -1,5 +1,10 @@
+import hashlib
+import hmac
+import json
 import os
+import threading
 from pathlib import Path
+from typing import Optional
 
 from mantis.helpers import CLI
 
@@ -126,3 +131,60 @@ class Environment(object):
         with open(path, "w") as f:
             for line in lines:
                 f.write(f'{line}\n')
+
+
+class SyncManifest(object):
+    """
+    Keyed hashes (HMAC under the mantis key) of environment files and of their encrypted
+    counterparts, stored in .mantis-sync in the environment folder. While both hashes of a
+    file match, the pair is known to be in sync without decrypting it.
+    """
+    FILENAME = '.mantis-sync'
+
+    def __init__(self, folder: str, key: str):
+        self.folder = Path(folder)
+        self.path = self.folder / self.FILENAME
+        self.key = hmac.new(key.encode(), b'mantis-sync', hashlib.sha256).digest()
+        self.lock = threading.Lock()
+
+        try:
+            self.entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def name(self, env_file: str) -> str:
+        return os.path.relpath(env_file, self.folder)
+
+    def digest(self, path: str) -> Optional[str]:
+        try:
+            with open(path, 'rb') as f:
+                return hmac.new(self.key, f.read(), hashlib.sha256).hexdigest()
+        except OSError:
+            return None
+
+    def hashes(self, env_file: str) -> dict:
+        return {'plain': self.digest(env_file), 'encrypted': self.digest(f'{env_file}.encrypted')}
+
+    def in_sync(self, env_file: str) -> bool:
+        """
+        Returns whether neither the environment file nor its encrypted file changed since they were recorded in sync
+        """
+        entry = self.entries.get(self.name(env_file))
+        return isinstance(entry, dict) and bool(entry.get('plain') and entry.get('encrypted')) and entry == self.hashes(env_file)
+
+    def record(self, env_file: str) -> None:
+        """
+        Records current content of environment file and its encrypted file as being in sync
+        """
+        hashes = self.hashes(env_file)
+
+        with self.lock:
+            self.entries[self.name(env_file)] = hashes
+            temporary_path = self.path.with_name(f'{self.FILENAME}.{os.getpid()}.{threading.get_ident()}')
+
+            try:
+                temporary_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True) + '\n')
+                os.replace(temporary_path, self.path)
+            except OSError:
+                # read-only environment folder, files are compared by decrypting them
+                pass
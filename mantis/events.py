@@ -0,0 +1,112 @@
+"""Health status changes of containers read from the "docker events" stream."""
+import json
+import os
+import queue
+import signal
+import subprocess
+import threading
+from typing import Optional, Tuple
+
+HEALTH_STATUSES = {'healthy', 'unhealthy'}
+
+
+class HealthEventStream(object):
+    """
+    Runs "docker events --format '{{json .}}'" in the background and yields
+    (container, status) pairs of health_status events as they arrive.
+
+    A single subscription replaces a pair of "docker inspect" calls per container every
+    poll interval, which on a remote host is a round trip each.
+    """
+
+    def __init__(self, command: str):
+        self.command = command
+        self.process = None
+        self.thread = None
+        self.events = queue.Queue()
+        self.finished = False
+
+    def __enter__(self) -> 'HealthEventStream':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            self.command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            # own process group, so closing kills the whole shell + docker tree
+            start_new_session=True
+        )
+        self.thread = threading.Thread(target=self.read, daemon=True)
+        self.thread.start()
+
+    def read(self) -> None:
+        for line in self.process.stdout:
+            event = self.parse(line)
+
+            if event:
+                self.events.put(event)
+
+        # the stream ended (docker failed or got killed), wake up the consumer
+        self.events.put(None)
+
+    @staticmethod
+    def parse(line: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns container name and health status of a single JSON event, e.g.
+        {"Action": "health_status: healthy", "Actor": {"Attributes": {"name": "web-1"}}, ...}
+        """
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+
+        action = event.get('Action') or event.get('status') or ''
+
+        if not action.startswith('health_status'):
+            return None
+
+        status = action.split(':', 1)[-1].strip()
+        name = ((event.get('Actor') or {}).get('Attributes') or {}).get('name', '')
+
+        if not name or status not in HEALTH_STATUSES:
+            return None
+
+        return name, status
+
+    def get(self, timeout: float) -> Optional[Tuple[str, str]]:
+        """
+        Returns next health event, or None once the timeout expires or the stream ended
+        """
+        if self.finished:
+            return None
+
+        try:
+            event = self.events.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            return None
+
+        if event is None:
+            self.finished = True
+
+        return event
+
+    def close(self) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+
+        try:
+            os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            self.process.terminate()
+
+        self.process.wait()
+        self.thread.join(timeout=1)
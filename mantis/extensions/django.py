@@ -12,11 +12,12 @@ class Django():
     def django_container(self):
         container_name = self.get_container_name(self.django_service)
         container_name_with_suffix = f"{container_name}-1"
+        containers = self.get_containers()
 
-        if container_name_with_suffix in self.get_containers():
+        if container_name_with_suffix in containers:
             return container_name_with_suffix
 
-        if container_name in self.get_containers():
+        if container_name in containers:
             return container_name
 
         CLI.error(f"Container {container_name} not found")
@@ -0,0 +1,165 @@
+"""
+Running a command chain in many environments at once (-e 'client-*' --parallel 4).
+
+Every environment runs in its own mantis process, so each gets its own manager, tunnel
+and exit status, exactly as if `mantis -e <environment> ...` was run by hand. Output of
+the processes is interleaved line by line, prefixed with the environment.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# file a mantis process appends names of its finished commands to, set for each environment
+FINISHED_COMMANDS_FILE = 'MANTIS_FINISHED_COMMANDS_FILE'
+
+COLORS = ['cyan', 'magenta', 'green', 'yellow', 'blue', 'bright_cyan', 'bright_magenta', 'bright_green']
+
+
+def command_finished(command: str) -> None:
+    """
+    Records a finished command of the chain, if this process runs for a fan-out
+    """
+    path = os.environ.get(FINISHED_COMMANDS_FILE)
+
+    if path:
+        with open(path, 'a') as file:
+            file.write(f'{command}\n')
+
+
+def environment_trace_file(trace_file: str, environment: str) -> str:
+    """
+    Returns trace file of a single environment, e.g. deploy.client-a.json for deploy.json
+    """
+    path = Path(trace_file)
+    return str(path.with_name(f'{path.stem}.{environment}{path.suffix or ".json"}'))
+
+
+class EnvironmentRun(object):
+    """Result of the command chain in a single environment."""
+
+    def __init__(self, environment: str):
+        self.environment = environment
+        self.exit_code: Optional[int] = None
+        self.duration = 0.0
+        self.finished_commands: List[str] = []
+
+
+class FanOut(object):
+    """
+    Runs given global options and command groups once per environment, at most `parallel` at a time
+    """
+
+    def __init__(self, environments: List[str], global_opts: List[str], cmd_groups: List[List[str]], parallel: int = 4):
+        self.environments = environments
+        self.global_opts = global_opts
+        self.cmd_groups = cmd_groups
+        self.parallel = max(parallel, 1)
+
+        from rich.console import Console
+        self.console = Console(highlight=False)
+        self.lock = threading.Lock()
+        self.width = max(map(len, environments))
+
+    def build_command(self, environment: str) -> List[str]:
+        global_opts = list(self.global_opts)
+
+        # every environment writes its own trace, rather than all of them the same file
+        for index, opt in enumerate(global_opts[:-1]):
+            if opt == '--trace':
+                global_opts[index + 1] = environment_trace_file(global_opts[index + 1], environment)
+
+        args = [sys.executable, '-m', 'mantis.command_line', *global_opts, '-e', environment]
+
+        for index, group in enumerate(self.cmd_groups):
+            args += (['+'] if index else []) + group
+
+        return args
+
+    def print_line(self, environment: str, line: str) -> None:
+        from rich.text import Text
+
+        color = COLORS[self.environments.index(environment) % len(COLORS)]
+        prefix = Text(f'{environment.ljust(self.width)} | ', style=color)
+
+        with self.lock:
+            self.console.print(prefix + Text(line), soft_wrap=True)
+
+    def run_environment(self, environment: str) -> EnvironmentRun:
+        result = EnvironmentRun(environment)
+        finished_file = tempfile.NamedTemporaryFile(prefix='mantis-', suffix='.commands', delete=False)
+        finished_file.close()
+
+        # output of the process is prefixed, so it gets narrower tables
+        columns = max(self.console.width - self.width - 3, 40)
+        env = dict(os.environ, COLUMNS=str(columns), **{FINISHED_COMMANDS_FILE: finished_file.name})
+        start = time.monotonic()
+
+        try:
+            process = subprocess.Popen(
+                self.build_command(environment),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                env=env,
+            )
+
+            for line in process.stdout:
+                self.print_line(environment, line.rstrip('\n'))
+
+            result.exit_code = process.wait()
+
+            with open(finished_file.name) as file:
+                result.finished_commands = file.read().split()
+        finally:
+            result.duration = time.monotonic() - start
+            os.unlink(finished_file.name)
+
+        return result
+
+    def run(self) -> Dict[str, EnvironmentRun]:
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            results = list(executor.map(self.run_environment, self.environments))
+
+        return {result.environment: result for result in results}
+
+    def print_matrix(self, results: Dict[str, EnvironmentRun]) -> None:
+        from rich.table import Table
+        from rich.text import Text
+
+        commands = [group[0] for group in self.cmd_groups]
+
+        table = Table(title='Results', show_header=True, header_style="bold")
+        table.add_column("ENVIRONMENT", style="cyan")
+
+        for command in commands:
+            table.add_column(command.upper(), justify="center")
+
+        table.add_column("DURATION", justify="right", style="yellow")
+        table.add_column("EXIT CODE", justify="right")
+
+        for environment, result in results.items():
+            cells = []
+
+            for index, command in enumerate(commands):
+                if index < len(result.finished_commands):
+                    cells.append('[green]✔[/green]')
+                elif index == len(result.finished_commands) and result.exit_code:
+                    cells.append('[red]✘[/red]')
+                else:
+                    cells.append('[dim]-[/dim]')
+
+            exit_code = str(result.exit_code) if result.exit_code == 0 else f'[red]{result.exit_code}[/red]'
+            table.add_row(environment, *cells, f'{result.duration:.1f} s', exit_code)
+
+        self.console.print(table)
+
+        failed = [environment for environment, result in results.items() if result.exit_code]
+        summary = f'{len(results) - len(failed)} of {len(results)} environments succeeded'
+        self.console.print(Text(summary + (f', failed: {", ".join(failed)}' if failed else ''), style='red' if failed else 'green'))
@@ -1,6 +1,8 @@
+import os
 import select
 import sys
 from contextlib import contextmanager
+from typing import TextIO
 
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
@@ -9,6 +11,31 @@ from rich.text import Text
 # Shared console instance
 _console = Console()
 
+# original stdout once it is reserved for machine-readable output
+_data_output = None
+
+
+def reserve_stdout() -> None:
+    """
+    Sends everything written to stdout (heading, progress, docker commands and their output)
+    to stderr instead, keeping the original stdout for machine-readable output (--json) only
+    """
+    global _data_output
+
+    if _data_output is not None:
+        return
+
+    sys.stdout.flush()
+    _data_output = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+
+
+def data_output() -> TextIO:
+    """
+    Returns stream for machine-readable output, stdout unless reserved for it
+    """
+    return _data_output or sys.stdout
+
 
 class CLI(object):
     @staticmethod
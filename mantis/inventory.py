@@ -0,0 +1,149 @@
+"""Container inventory read from a single docker call."""
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+PROJECT_LABEL = 'com.docker.compose.project'
+SERVICE_LABEL = 'com.docker.compose.service'
+NUMBER_LABEL = 'com.docker.compose.container-number'
+
+# States listed by "docker container ls" without -a. Paused and restarting containers
+# still count as running for the daemon.
+RUNNING_STATES = {'running', 'paused', 'restarting'}
+
+# Tab separated, as neither names nor labels contain tabs. Labels are read one by one,
+# as {{.Labels}} joins all of them with commas, which compose label values may contain too.
+INVENTORY_FORMAT = '\t'.join([
+    '{{.Names}}',
+    '{{.State}}',
+    '{{.Status}}',
+    f'{{{{.Label "{PROJECT_LABEL}"}}}}',
+    f'{{{{.Label "{SERVICE_LABEL}"}}}}',
+    f'{{{{.Label "{NUMBER_LABEL}"}}}}',
+])
+
+
+@dataclass
+class ContainerInfo:
+    """A single container with the compose labels mantis cares about."""
+    name: str
+    state: str = ''
+    status: str = ''
+    project: Optional[str] = None
+    service: Optional[str] = None
+    number: Optional[int] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.state in RUNNING_STATES
+
+
+class ContainerInventory(object):
+    """
+    Containers of a docker host in the order docker listed them (newest first).
+
+    Replaces a "container ls" followed by a "container inspect" of every container,
+    which costs a round trip per container on a remote host.
+    """
+
+    def __init__(self, containers: Iterable[ContainerInfo] = ()):
+        self.containers = list(containers)
+
+    @classmethod
+    def parse(cls, output: Optional[str]) -> 'ContainerInventory':
+        """
+        Parses output of "docker container ls --format" using INVENTORY_FORMAT
+        """
+        containers = []
+
+        for line in (output or '').splitlines():
+            if not line.strip():
+                continue
+
+            parts = line.split('\t')
+            parts += [''] * (6 - len(parts))
+            name, state, status, project, service, number = parts[:6]
+
+            containers.append(ContainerInfo(
+                name=name.strip(),
+                state=state.strip(),
+                status=status.strip(),
+                # docker prints an empty string for a missing label
+                project=project.strip() or None,
+                service=service.strip() or None,
+                number=int(number) if number.strip().isdigit() else None,
+            ))
+
+        return cls(containers)
+
+    def __iter__(self) -> Iterator[ContainerInfo]:
+        return iter(self.containers)
+
+    def __len__(self) -> int:
+        return len(self.containers)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def get(self, name: str) -> Optional[ContainerInfo]:
+        for container in self.containers:
+            if container.name == name:
+                return container
+
+        return None
+
+    def filter(
+        self,
+        projects: Optional[Iterable[str]] = None,
+        prefix: str = '',
+        exclude: Optional[List[str]] = None,
+        only_running: bool = False,
+        service: Optional[str] = None,
+    ) -> 'ContainerInventory':
+        """
+        Returns containers of given compose projects (or service) matching given name prefix
+        """
+        projects = set(projects) if projects is not None else None
+        exclude = exclude or []
+
+        return ContainerInventory(
+            container for container in self.containers
+            if (projects is None or container.project in projects)
+            and (service is None or container.service == service)
+            and container.name.startswith(prefix)
+            and container.name not in exclude
+            and (container.is_running or not only_running)
+        )
+
+    def names(self, **filters) -> List[str]:
+        """
+        Returns names of containers matching given filters (see filter)
+        """
+        inventory = self.filter(**filters) if filters else self
+        return [container.name for container in inventory]
+
+    def newest(self) -> Optional[ContainerInfo]:
+        """
+        Returns the container compose started last, i.e. the one with the highest number
+        """
+        if not self.containers:
+            return None
+
+        return max(self.containers, key=lambda c: (c.number if c.number is not None else -1, c.name))
+
+    def discard(self, name: str) -> None:
+        """
+        Forgets a removed container
+        """
+        self.containers = [container for container in self.containers if container.name != name]
+
+    def rename(self, name: str, new_name: str) -> None:
+        container = self.get(name)
+
+        if container:
+            container.name = new_name
+
+    def set_state(self, name: str, state: str) -> None:
+        container = self.get(name)
+
+        if container:
+            container.state = state
@@ -0,0 +1,453 @@
+"""
+Multiplexing of log streams of many containers on a single asyncio event loop.
+
+Every container gets one log stream: either a streaming request to the Docker Engine API over
+the tunnelled docker socket (all of them through the one SSH tunnel), or a docker CLI process
+run without a shell. Lines of each container go to a bounded buffer, whose reader pauses while
+it is full, so a busy container can't starve quiet ones nor grow memory. A single writer drains
+all buffers and writes lines to stdout in batches, prefixed with the container name.
+Lines not matching a --grep pattern are dropped by the readers as they arrive.
+
+LogMerger writes lines read with --timestamps in the order of their timestamps instead, a
+streaming k-way merge of the containers' logs (each of them ordered already) through a heap.
+"""
+import asyncio
+import heapq
+import os
+import re
+import shlex
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import count
+from typing import AsyncIterator, Callable, Dict, List, Optional, Pattern, TextIO, Tuple
+from urllib.parse import quote, urlencode
+
+# source of log lines of a single container, called once the event loop runs
+LogSource = Callable[[], AsyncIterator[bytes]]
+
+CHUNK_SIZE = 64 * 1024
+
+ENVIRONMENT_ASSIGNMENT = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+
+# relative times of docker logs --since/--until, Go durations such as 42m or 1h30m
+DURATION = re.compile(r'^(?:\d+(?:\.\d+)?(?:h|m|s|ms|us|ns))+$')
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(h|ms|m|s|us|ns)')
+DURATION_UNITS = {'h': 3600, 'm': 60, 's': 1, 'ms': 1e-3, 'us': 1e-6, 'ns': 1e-9}
+
+# RFC 3339 timestamp docker logs --timestamps puts in front of every line
+TIMESTAMP = re.compile(rb'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d{1,9}))?(Z|[+-]\d\d:\d\d) ')
+
+
+class LogSourceError(Exception):
+    pass
+
+
+async def split_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Yields lines (with line endings) of a stream of chunks, however long the lines are
+    """
+    remainder = b''
+
+    async for chunk in chunks:
+        lines = (remainder + chunk).split(b'\n')
+        remainder = lines.pop()
+
+        for line in lines:
+            yield line + b'\n'
+
+    if remainder:
+        yield remainder + b'\n'
+
+
+def log_time(value: str, now: Optional[float] = None) -> str:
+    """
+    Returns UNIX timestamp the Engine API expects for a --since/--until value of docker logs:
+    a timestamp, a relative duration (42m, 1h30m) or an ISO 8601 date, local time unless it has a zone
+    """
+    value = value.strip()
+
+    if re.match(r'^\d+(\.\d+)?$', value):
+        return value
+
+    if DURATION.match(value):
+        seconds = sum(float(amount) * DURATION_UNITS[unit] for amount, unit in DURATION_PART.findall(value))
+        return f'{(time.time() if now is None else now) - seconds:.9f}'.rstrip('0').rstrip('.')
+
+    # datetime.fromisoformat of Python < 3.11 does not accept the Z suffix
+    date = datetime.fromisoformat(re.sub(r'Z$', '+00:00', value))
+    return f'{date.timestamp():.9f}'.rstrip('0').rstrip('.')
+
+
+def timestamp_key(line: bytes) -> Optional[str]:
+    """
+    Returns sortable UTC key of the timestamp docker put in front of the line, None if there is none.
+    Fractions are padded as docker trims their trailing zeros.
+    """
+    match = TIMESTAMP.match(line)
+
+    if not match:
+        return None
+
+    seconds, fraction, zone = (group.decode() if group else '' for group in match.groups())
+
+    if zone != 'Z':
+        seconds = datetime.fromisoformat(seconds + zone).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+    return f'{seconds}.{fraction:0<9}'
+
+
+def split_command(command: str) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Returns arguments and environment of a docker command built with build_docker_command,
+    i.e. optionally prefixed with DOCKER_HOST or DOCKER_CONTEXT assignments
+    """
+    args = shlex.split(command)
+    env = dict(os.environ)
+
+    while args and ENVIRONMENT_ASSIGNMENT.match(args[0]):
+        name, value = args.pop(0).split('=', 1)
+        env[name] = value
+
+    return args, env
+
+
+def command_source(command: str) -> LogSource:
+    """
+    Returns source of lines printed by a docker command, run without a shell
+    """
+    async def chunks() -> AsyncIterator[bytes]:
+        args, env = split_command(command)
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env=env,
+                # own process group, so Ctrl+C is handled here
+                start_new_session=True,
+            )
+        except OSError as e:
+            raise LogSourceError(f'{args[0] if args else command}: {e}')
+
+        try:
+            while True:
+                chunk = await process.stdout.read(CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                yield chunk
+
+            await process.wait()
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    return lambda: split_lines(chunks())
+
+
+async def read_http_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+    """
+    Yields body of an HTTP response, decoding chunked transfer encoding
+    """
+    if 'content-length' in headers:
+        remaining = int(headers['content-length'])
+
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, CHUNK_SIZE))
+
+            if not chunk:
+                return
+
+            remaining -= len(chunk)
+            yield chunk
+
+        return
+
+    if 'chunked' not in headers.get('transfer-encoding', ''):
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+
+            if not chunk:
+                return
+
+            yield chunk
+
+    while True:
+        size_line = await reader.readline()
+
+        if not size_line:
+            return
+
+        size = int(size_line.split(b';')[0].strip() or b'0', 16)
+
+        if size == 0:
+            return
+
+        yield await reader.readexactly(size)
+        await reader.readexactly(2)
+
+
+async def demultiplex_stream(chunks: AsyncIterator[bytes], multiplexed: Optional[bool]) -> AsyncIterator[bytes]:
+    """
+    Strips stream headers of stdout/stderr frames of containers running without a TTY.
+    Without a content type telling it (older daemons), frames are recognized by their first bytes.
+    """
+    buffer = b''
+
+    async for chunk in chunks:
+        buffer += chunk
+
+        if multiplexed is None:
+            if len(buffer) < 8:
+                continue
+
+            multiplexed = buffer[0] in (0, 1, 2) and buffer[1:4] == b'\x00\x00\x00'
+
+        if not multiplexed:
+            yield buffer
+            buffer = b''
+            continue
+
+        while len(buffer) >= 8:
+            size = int.from_bytes(buffer[4:8], 'big')
+
+            if len(buffer) < 8 + size:
+                break
+
+            yield buffer[8:8 + size]
+            buffer = buffer[8 + size:]
+
+    if buffer and not multiplexed:
+        yield buffer
+
+
+def engine_source(socket_path: str, container: str, **params) -> LogSource:
+    """
+    Returns source of log lines of a container streamed by the Docker Engine API, a single
+    request over the (tunnelled) docker socket. Params are the query of /containers/{id}/logs.
+    """
+    query = urlencode({'stdout': 1, 'stderr': 1, **{key: value for key, value in params.items() if value is not None}})
+    path = f'/containers/{quote(container)}/logs?{query}'
+
+    async def chunks() -> AsyncIterator[bytes]:
+        try:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        except OSError as e:
+            raise LogSourceError(f'Docker daemon not reachable at {socket_path}: {e}')
+
+        try:
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: docker\r\n\r\n'.encode())
+            await writer.drain()
+
+            status_line = await reader.readline()
+            headers = {}
+
+            while True:
+                line = await reader.readline()
+
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            status = int(status_line.split()[1]) if len(status_line.split()) > 1 else 0
+            body = read_http_body(reader, headers)
+
+            if status >= 400:
+                message = b''.join([chunk async for chunk in body]).decode(errors='replace')
+                raise LogSourceError(f'HTTP {status}: {message.strip()}')
+
+            content_type = headers.get('content-type', '')
+            multiplexed = True if 'multiplexed' in content_type else False if 'raw-stream' in content_type else None
+
+            async for chunk in demultiplex_stream(body, multiplexed):
+                yield chunk
+        finally:
+            writer.close()
+
+    return lambda: split_lines(chunks())
+
+
+def fallback(primary: LogSource, secondary: LogSource) -> LogSource:
+    """
+    Returns source using secondary source when the primary one fails before giving any line
+    """
+    async def lines() -> AsyncIterator[bytes]:
+        started = False
+
+        try:
+            async for line in primary():
+                started = True
+                yield line
+        except LogSourceError:
+            if started:
+                raise
+
+            async for line in secondary():
+                yield line
+
+    return lines
+
+
+class LogMultiplexer(object):
+    """
+    Reads log sources of many containers concurrently and writes their lines prefixed with
+    the container name, in batches. Given a pattern, only lines matching it are written.
+    """
+
+    def __init__(self, sources: Dict[str, LogSource], output: Optional[TextIO] = None,
+                 buffer_lines: int = 1000, batch_interval: float = 0.05, pattern: Optional[Pattern] = None):
+        self.sources = sources
+        self.output = output or sys.stdout
+        self.buffer_lines = buffer_lines
+        self.batch_interval = batch_interval
+        self.pattern = pattern
+        self.width = max(map(len, sources), default=0)
+
+    def format(self, container: str, line: bytes) -> str:
+        return f'{container:<{self.width}} | {line.decode(errors="replace")}'
+
+    async def read(self, container: str, source: LogSource, queue: asyncio.Queue, ready: asyncio.Event) -> None:
+        try:
+            async for line in source():
+                if self.pattern and not self.pattern.search(line.decode(errors='replace')):
+                    continue
+
+                # waits while the buffer is full, the writer catches up
+                await queue.put(line)
+                ready.set()
+        except asyncio.CancelledError:
+            # the writer is done already
+            raise
+        except asyncio.IncompleteReadError:
+            await queue.put(b'error: log stream ended prematurely\n')
+        except Exception as e:
+            await queue.put(f'error: {e}\n'.encode())
+
+        # end of the stream, whatever ended it, so the writer never waits for it
+        await queue.put(None)
+        ready.set()
+
+    async def write(self, queues: Dict[str, asyncio.Queue], ready: asyncio.Event) -> None:
+        active = set(queues)
+
+        while active:
+            await ready.wait()
+            ready.clear()
+
+            # let lines of other containers arrive, so they go out in a single write
+            await asyncio.sleep(self.batch_interval)
+
+            batch = []
+
+            for container in list(active):
+                queue = queues[container]
+
+                while not queue.empty():
+                    line = queue.get_nowait()
+
+                    if line is None:
+                        active.discard(container)
+                        break
+
+                    batch.append(self.format(container, line))
+
+            if batch:
+                self.output.write(''.join(batch))
+                self.output.flush()
+
+    async def main(self) -> None:
+        ready = asyncio.Event()
+        queues = {container: asyncio.Queue(maxsize=self.buffer_lines) for container in self.sources}
+        readers = [
+            asyncio.ensure_future(self.read(container, source, queues[container], ready))
+            for container, source in self.sources.items()
+        ]
+
+        try:
+            await self.write(queues, ready)
+        finally:
+            for reader in readers:
+                reader.cancel()
+
+            await asyncio.gather(*readers, return_exceptions=True)
+
+    def run(self) -> None:
+        if not self.sources:
+            return
+
+        try:
+            asyncio.run(self.main())
+        except KeyboardInterrupt:
+            pass
+
+
+class LogMerger(LogMultiplexer):
+    """
+    Writes lines of many containers in the order of their timestamps. Each container's lines
+    are ordered already, so the line with the lowest timestamp is next once every container
+    still streaming has a line waiting. A quiet container holds the others back for at most
+    `window` seconds, and at most `buffer_lines` lines wait for it.
+    """
+
+    def __init__(self, sources: Dict[str, LogSource], window: float = 0.5, **kwargs):
+        super().__init__(sources, **kwargs)
+        self.window = window
+
+    async def write(self, queues: Dict[str, asyncio.Queue], ready: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        active = set(queues)
+        waiting = {container: 0 for container in queues}
+        last_keys = {container: '' for container in queues}
+        order = count()
+        heap: List[Tuple[str, int, float, str, bytes]] = []
+
+        while active or heap:
+            if active:
+                try:
+                    await asyncio.wait_for(ready.wait(), self.window if heap else None)
+                except asyncio.TimeoutError:
+                    pass
+
+                ready.clear()
+                await asyncio.sleep(self.batch_interval)
+
+            now = loop.time()
+
+            for container in list(active):
+                queue = queues[container]
+
+                while not queue.empty():
+                    line = queue.get_nowait()
+
+                    if line is None:
+                        active.discard(container)
+                        break
+
+                    # lines without a timestamp (errors) stay after the previous line of the container
+                    last_keys[container] = timestamp_key(line) or last_keys[container]
+                    heapq.heappush(heap, (last_keys[container], next(order), now, container, line))
+                    waiting[container] += 1
+
+            batch = []
+
+            while heap:
+                key, _, received, container, line = heap[0]
+                complete = all(waiting[other] for other in active)
+
+                if not complete and now - received < self.window and len(heap) <= self.buffer_lines:
+                    break
+
+                heapq.heappop(heap)
+                waiting[container] -= 1
+                batch.append(self.format(container, line))
+
+            if batch:
+                self.output.write(''.join(batch))
+                self.output.flush()
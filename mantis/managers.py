@@ -1,30 +1,36 @@
-import asyncio
 import atexit
+import fnmatch
 import json
 import os
 import re
+import shlex
 import shutil
-import signal
 import subprocess
 import sys
 import tempfile
 import threading
 import time
-import yaml
-from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from time import sleep
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Callable, Optional, List, Dict, Any, Pattern, Tuple
 
 from rich.console import Console
-from rich.table import Table
 
-from mantis.cryptography import Crypto
-from mantis.environment import Environment
-from mantis.helpers import CLI, import_string, merge_defaults, merge_json
-from mantis.config import find_config, load_config, check_config, load_template_config, DEFAULT_ENV_FOLDER
+from mantis import daemon
+from mantis.compose import ComposeModel
+from mantis.engine import DockerEngine, EngineError, inventory_from_engine, container_name, format_ports, human_size, created_since, cpu_percent, memory_usage
+from mantis.environment import Environment, SyncManifest
+from mantis.events import HealthEventStream
+from mantis.helpers import CLI, data_output, import_string
+from mantis.inventory import ContainerInventory, INVENTORY_FORMAT, RUNNING_STATES
+from mantis.tracing import trace, step_name
+from mantis.config import find_config, load_config, check_config, load_validated_config, DEFAULT_ENV_FOLDER
+
+
+class HealthcheckNotDefined(Exception):
+    """Container defines neither a healthcheck command nor a start period."""
 
 
 class AbstractManager(object):
@@ -33,6 +39,22 @@ class AbstractManager(object):
     """
     environment_id = None
 
+    # containers listed during this run, see get_container_inventory
+    _container_inventory = None
+
+    # parsed compose files, see compose_model
+    _compose_model = None
+
+    # Docker Engine API client, see engine
+    _engine = None
+    _engine_failed = False
+
+    # hashes of environment files in sync with their encrypted files, see sync_manifest
+    _sync_manifest = None
+
+    # cipher of the mantis key, see crypto
+    _crypto = None
+
     def __init__(self, config_file: str = None, environment_id: str = None, mode: str = 'remote', dry_run: bool = False, use_tunnel: bool = True):
         self.environment_id = environment_id
         self.mode = mode
@@ -328,6 +350,59 @@ class AbstractManager(object):
         CLI.success(f'Tunnel is available (docker {version}).')
         return True
 
+    @property
+    def daemon_socket(self) -> Path:
+        return daemon.socket_path(self.environment_id, self.mode)
+
+    def start_daemon(self) -> bool:
+        """
+        Starts a background mantis process keeping this manager, its tunnel and container
+        listing warm. Invocations with the same folder, config, mode and environment are
+        forwarded to it.
+        """
+        pid = daemon.daemon_pid(self.daemon_socket)
+
+        if pid:
+            CLI.info(f'Daemon is already running (pid {pid}).')
+            return True
+
+        if self.dry_run:
+            CLI.warning(f'[DRY-RUN] Starting daemon on {self.daemon_socket}')
+            return True
+
+        idle_timeout = self.config.get('daemon', {}).get('idle_timeout', 900)
+
+        CLI.info('Starting daemon...')
+        try:
+            pid = daemon.start(self, self.daemon_socket, idle_timeout=idle_timeout)
+        except PermissionError as e:
+            CLI.error(f'Daemon not started: {e}')
+
+        if not pid:
+            CLI.danger(f'Daemon did not start, see {self.daemon_socket.with_suffix(".log")}')
+            return False
+
+        CLI.success(f'Daemon is running (pid {pid}), stopping after {idle_timeout} seconds without a command.')
+        return True
+
+    def stop_daemon(self) -> bool:
+        if daemon.stop(self.daemon_socket):
+            CLI.success('Daemon stopped.')
+            return True
+
+        CLI.info('Daemon is not running.')
+        return False
+
+    def daemon_status(self) -> bool:
+        pid = daemon.daemon_pid(self.daemon_socket)
+
+        if pid:
+            CLI.success(f'Daemon is running (pid {pid}) on {self.daemon_socket}')
+            return True
+
+        CLI.info('Daemon is not running.')
+        return False
+
     @property
     def docker_connection(self) -> str:
         # In single connection mode or when env.id contains 'local', no extra connection needed
@@ -351,19 +426,66 @@ class AbstractManager(object):
 
         return ''
 
+    @property
+    def engine(self) -> Optional[DockerEngine]:
+        """
+        Returns Docker Engine API client talking to the tunnelled docker socket, if enabled
+        by "tunnel.engine_api". Read-only queries use it instead of spawning the docker CLI.
+
+        Returns None whenever docker commands would not go through the tunnel (or in dry run),
+        in which case the caller falls back to the docker CLI.
+        """
+        if self._engine is not None or self._engine_failed:
+            return self._engine
+
+        if self.dry_run or not self.tunnel_config.get('engine_api'):
+            return None
+
+        docker_connection = self.docker_connection
+        prefix = 'DOCKER_HOST="unix://'
+
+        if not docker_connection.startswith(prefix):
+            self._engine_failed = True
+            return None
+
+        self._engine = DockerEngine(docker_connection[len(prefix):-1])
+        return self._engine
+
+    def forget_engine(self) -> None:
+        """
+        Drops the Docker Engine API client without closing its connection, which a forked
+        process shares with its parent. The next query connects again.
+        """
+        self._engine = None
+
+    def engine_call(self, method: str, *args, **kwargs) -> Tuple[bool, Any]:
+        """
+        Calls given DockerEngine method, returning whether it was called and its result.
+        The engine is not used again once the daemon fails to answer, the docker CLI is used instead.
+        """
+        engine = self.engine
+
+        if engine is None:
+            return False, None
+
+        try:
+            with trace(f"engine {method} {' '.join(map(str, args))}".strip(), 'engine'):
+                return True, getattr(engine, method)(*args, **kwargs)
+        except EngineError as e:
+            CLI.warning(f'Docker Engine API failed ({e}), falling back to docker CLI.')
+            engine.close()
+            self._engine = None
+            self._engine_failed = True
+            return False, None
+
     def init_config(self, config: Dict[str, Any]) -> None:
-        check_config(config)
         config_file_path = str(Path(self.config_file).parent)
 
         def normalize(p):
             return str(Path(p.replace('<MANTIS>', config_file_path)).resolve())
 
-        # Load config template file
-        defaults = load_template_config()
-
-        # Merge custom config over default values. Deep merge, so declaring one key of a
-        # section keeps the rest of that section's defaults.
-        self.config = merge_defaults(defaults, config)
+        # Validate config and merge it over default values of the template (cached while unchanged)
+        self.config = load_validated_config(config, self.config_file)
 
         # Detect single connection mode (connection string instead of connections dict)
         has_single_connection = self.config.get('connection') is not None
@@ -433,10 +555,37 @@ class AbstractManager(object):
         # Read compose files
         self.compose_config = self.read_compose_configs()
 
+    @property
+    def sync_manifest(self) -> Optional[SyncManifest]:
+        """
+        Returns manifest of environment files known to be in sync with their encrypted files
+        """
+        if self._sync_manifest is None and self.KEY and getattr(self.environment, 'path', None):
+            self._sync_manifest = SyncManifest(self.environment.path, self.KEY)
+
+        return self._sync_manifest
+
+    @property
+    def crypto(self):
+        """
+        Returns cipher session of the mantis key, built once for all values of all environment files
+        """
+        from mantis.cryptography import Crypto
+
+        if self._crypto is None or self._crypto.key != self.KEY.encode() or self._crypto.deterministically != self.encrypt_deterministically:
+            self._crypto = Crypto.session(self.KEY, self.encrypt_deterministically)
+
+        return self._crypto
+
+    def record_in_sync(self, env_file: str) -> None:
+        if self.sync_manifest:
+            self.sync_manifest.record(env_file)
+
     def are_env_files_in_sync(self, env_file: str) -> bool:
         """
         Checks if .env and .env.encrypted files are in sync.
         Returns True if they match, False otherwise.
+        Files unchanged since recorded in the sync manifest are not decrypted.
         """
         env_file_encrypted = f'{env_file}.encrypted'
 
@@ -446,6 +595,9 @@ class AbstractManager(object):
         if not Path(env_file_encrypted).exists():
             return False
 
+        if self.sync_manifest and self.sync_manifest.in_sync(env_file):
+            return True
+
         try:
             decrypted_environment = self.decrypt_env(env_file=env_file, return_value=True)
             loaded_environment = self.environment.load(env_file)
@@ -453,11 +605,20 @@ class AbstractManager(object):
             if decrypted_environment is None or loaded_environment is None:
                 return False
 
-            return loaded_environment == decrypted_environment
+            in_sync = loaded_environment == decrypted_environment
         except Exception:
             return False
 
+        if in_sync:
+            self.record_in_sync(env_file)
+
+        return in_sync
+
     def check_environment_encryption(self, env_file: str) -> None:
+        if self.sync_manifest and self.sync_manifest.in_sync(env_file):
+            CLI.success(f'Encrypted and decrypted environments DO match [{env_file}] (unchanged since last check)')
+            return
+
         decrypted_environment = self.decrypt_env(env_file=env_file, return_value=True)  # .env.encrypted
         loaded_environment = self.environment.load(env_file)  # .env
 
@@ -503,6 +664,7 @@ class AbstractManager(object):
 
         else:
             CLI.success(f'Encrypted and decrypted environments DO match [{env_file}]...')
+            self.record_in_sync(env_file)
 
     def cmd(self, command: str) -> None:
         command = command.strip()
@@ -513,13 +675,15 @@ class AbstractManager(object):
 
         error_message = "Error during running command '%s'" % command
 
-        try:
-            print(command)
-            result = subprocess.run(command, shell=True)
-            if result.returncode != 0:
-                CLI.error(error_message)
-        except OSError as e:
-            CLI.error(f"{error_message}: {e}")
+        with trace(step_name(command), 'cmd', command=command) as span:
+            try:
+                print(command)
+                result = subprocess.run(command, shell=True)
+                span['exit_code'] = result.returncode
+                if result.returncode != 0:
+                    CLI.error(error_message)
+            except OSError as e:
+                CLI.error(f"{error_message}: {e}")
 
     @property
     def quiet_flag(self) -> str:
@@ -543,7 +707,11 @@ class AbstractManager(object):
             if self.dry_run:
                 CLI.warning(f'[DRY-RUN] {cmd}')
                 return ''
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            with trace(step_name(cmd), 'docker', command=cmd) as span:
+                result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+                span['exit_code'] = result.returncode
+                span['output_bytes'] = len(result.stdout)
+
             return result.stdout
 
         self.cmd(cmd)
@@ -603,19 +771,66 @@ class AbstractManager(object):
 
         return results
 
+    def get_container_inventory(self, refresh: bool = False) -> ContainerInventory:
+        """
+        Lists all containers of the docker host together with their compose labels,
+        using a single docker call.
+
+        The listing is kept for the rest of the run (chained commands included), so that
+        deployment steps checking containers over and over do not query docker each time.
+        Helpers changing containers keep it up to date or drop it (see invalidate_containers).
+        """
+        if self._container_inventory is None or refresh:
+            called, containers = self.engine_call('containers', all=True)
+
+            if called:
+                self._container_inventory = inventory_from_engine(containers)
+            else:
+                output = self.docker(f"container ls -a --format '{INVENTORY_FORMAT}'", return_output=True)
+                self._container_inventory = ContainerInventory.parse(output)
+
+        return self._container_inventory
+
+    def invalidate_containers(self) -> None:
+        """
+        Forgets listed containers, so that the next listing queries docker again.
+        Called after commands whose effect on containers is not known up front (compose up, ...)
+        """
+        self._container_inventory = None
+
+    def stop_container(self, container: str) -> None:
+        self.docker(f'container stop {container}')
+
+        if self._container_inventory is not None:
+            self._container_inventory.set_state(container, 'exited')
+
+    def remove_container(self, container: str, force: bool = False) -> None:
+        force_flag = '-f ' if force else ''
+        self.docker(f'container rm {force_flag}{container}')
+
+        if self._container_inventory is not None:
+            self._container_inventory.discard(container)
+
+    def rename_container(self, container: str, new_name: str) -> None:
+        self.docker(f'container rename {container} {new_name}')
+
+        if self._container_inventory is not None:
+            self._container_inventory.rename(container, new_name)
+
+    def get_project_inventory(self) -> ContainerInventory:
+        """
+        Returns inventory of containers belonging to projects of compose files
+        """
+        return self.get_container_inventory().filter(projects=self.project_services().keys())
+
     def get_container_project(self, container: str) -> Optional[str]:
         """
         Prints project name of given container
         :param container: container name
         :return: project name
         """
-        try:
-            container_details = json.loads(self.docker(f'container inspect {container}', return_output=True))
-            return container_details[0]["Config"]["Labels"]["com.docker.compose.project"]
-        except (IndexError, KeyError):
-            pass
-
-        return None
+        container_info = self.get_container_inventory().get(container)
+        return container_info.project if container_info else None
 
     def get_containers(self, prefix: str = '', exclude: List[str] = None, only_running: bool = False) -> List[str]:
         """
@@ -624,24 +839,131 @@ class AbstractManager(object):
         :param exclude: exclude containers
         :return: list of container names
         """
-        if exclude is None:
-            exclude = []
-        containers = self.docker(f'container ls {"" if only_running else "-a"} --format \'{{{{.Names}}}}\'', return_output=True) \
-            .strip('\n').strip().split('\n')
+        return self.get_project_inventory().names(prefix=prefix, exclude=exclude, only_running=only_running)
 
-        # Remove empty strings
-        containers = list(filter(None, containers))
+    def get_images(self) -> List[Dict[str, str]]:
+        """
+        Returns images of the docker host, keyed like "docker image ls --format json" does
+        """
+        called, images = self.engine_call('images')
 
-        # get project containers only
-        containers = list(filter(lambda c: self.get_container_project(c) in self.project_services().keys(), containers))
+        if called:
+            rows = []
 
-        # find containers starting with custom prefix
-        containers = list(filter(lambda s: s.startswith(prefix), containers))
+            for image in images:
+                for repo_tag in image.get('RepoTags') or ['<none>:<none>']:
+                    repository, _, tag = repo_tag.rpartition(':')
+                    rows.append({
+                        'Repository': repository,
+                        'Tag': tag,
+                        'ID': image['Id'].split(':')[-1][:12],
+                        'CreatedSince': created_since(image.get('Created', 0)),
+                        'Size': human_size(image.get('Size', 0), precision=3),
+                    })
 
-        # exclude not matching containers
-        containers = list(filter(lambda s: s not in exclude, containers))
+            return rows
 
-        return containers
+        output = self.docker('image ls --format "{{.Repository}}\t{{.Tag}}\t{{.ID}}\t{{.CreatedSince}}\t{{.Size}}"', return_output=True)
+        keys = ['Repository', 'Tag', 'ID', 'CreatedSince', 'Size']
+
+        return [dict(zip(keys, line.split('\t'))) for line in (output or '').strip().split('\n') if len(line.split('\t')) >= 5]
+
+    def get_container_rows(self) -> List[Dict[str, str]]:
+        """
+        Returns all containers of the docker host, keyed like "docker container ls --format json" does
+        """
+        called, containers = self.engine_call('containers', all=True, size=True)
+
+        if called:
+            return [{
+                'Names': container_name(container),
+                'State': container.get('State', ''),
+                'Status': container.get('Status', ''),
+                'Image': container.get('Image', ''),
+                'Ports': format_ports(container.get('Ports')),
+                'Size': f"{human_size(container.get('SizeRw', 0))} (virtual {human_size(container.get('SizeRootFs', 0))})",
+            } for container in containers]
+
+        output = self.docker('container ls -a --format "{{.Names}}\t{{.State}}\t{{.Status}}\t{{.Image}}\t{{.Ports}}\t{{.Size}}"', return_output=True)
+        keys = ['Names', 'State', 'Status', 'Image', 'Ports', 'Size']
+
+        return [dict(zip(keys, line.split('\t'))) for line in (output or '').strip().split('\n') if len(line.split('\t')) >= 6]
+
+    def get_container_stats(self, containers: Optional[List[str]] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Returns CPU and memory usage of given (or all) running containers
+        """
+        if containers is not None and not containers:
+            return {}
+
+        if self.engine and containers:
+            # the daemon samples each container for a second, so ask for all of them at once
+            with ThreadPoolExecutor(max_workers=len(containers)) as executor:
+                results = list(executor.map(lambda container: self.engine_call('container_stats', container), containers))
+
+            if all(called for called, _ in results):
+                return {
+                    container: {'cpu': cpu_percent(stats), 'mem': memory_usage(stats)}
+                    for container, (_, stats) in zip(containers, results)
+                }
+
+        output = self.docker('stats --no-stream --format "{{.Name}}\t{{.CPUPerc}}\t{{.MemUsage}}"', return_output=True)
+        stats_map = {}
+
+        for line in (output or '').strip().split('\n'):
+            parts = line.split('\t')
+
+            if len(parts) >= 3:
+                stats_map[parts[0]] = {'cpu': parts[1], 'mem': parts[2]}
+
+        return stats_map
+
+    def get_networks(self) -> List[Dict[str, Any]]:
+        """
+        Returns docker networks together with names of containers connected to them.
+        Two queries in total, regardless of the number of networks.
+        """
+        called, networks = self.engine_call('networks')
+
+        if called:
+            # listing of networks does not include connected containers, listing of running containers does
+            called, containers = self.engine_call('containers', all=False)
+
+        if called:
+            connected = {}
+
+            for container in containers:
+                for endpoint in ((container.get('NetworkSettings') or {}).get('Networks') or {}).values():
+                    connected.setdefault(endpoint.get('NetworkID'), []).append(container_name(container))
+
+            return [{
+                'ID': network['Id'][:12],
+                'Name': network['Name'],
+                'Driver': network.get('Driver', ''),
+                'Scope': network.get('Scope', ''),
+                'Containers': sorted(connected.get(network['Id'], [])),
+            } for network in networks]
+
+        ids = (self.docker('network ls -q --no-trunc', return_output=True) or '').split()
+
+        if not ids:
+            return []
+
+        # all networks inspected at once
+        output = self.docker(f'network inspect {" ".join(ids)}', return_output=True)
+
+        try:
+            details = json.loads(output or '[]')
+        except ValueError:
+            CLI.error(f'Failed to inspect networks: {output}')
+
+        return [{
+            'ID': network['Id'][:12],
+            'Name': network['Name'],
+            'Driver': network.get('Driver', ''),
+            'Scope': network.get('Scope', ''),
+            'Containers': sorted(container['Name'] for container in (network.get('Containers') or {}).values()),
+        } for network in details]
 
 
 class BaseManager(AbstractManager):
@@ -670,6 +992,8 @@ class BaseManager(AbstractManager):
         """
         Creates new encryption key
         """
+        from mantis.cryptography import Crypto
+
         CLI.info(f'Deterministic encryption: ', end='')
         CLI.warning(self.encrypt_deterministically)
 
@@ -685,6 +1009,11 @@ class BaseManager(AbstractManager):
         if env_file is None:
             CLI.info(f'Environment file not specified. Walking all environment files...')
 
+            if 'force' in params and not return_value:
+                prepare = lambda env_file: self.prepare_encryption(env_file, full='full' in params)
+                self.sync_env_files(self.environment.files, prepare, lambda env_file: f'{env_file}.encrypted', 'Encrypted')
+                return None
+
             values = {}
 
             for env_file in self.environment.files:
@@ -696,53 +1025,23 @@ class BaseManager(AbstractManager):
 
         env_file_encrypted = f'{env_file}.encrypted'
 
-        # Skip if files are already in sync (unless return_value is True, which is used for internal checks)
-        if not return_value and self.are_env_files_in_sync(env_file):
-            CLI.success(f'Skipping {env_file} - already in sync with {env_file_encrypted}')
-            return None
-
-        CLI.info(f'Encrypting environment file {env_file}...')
-
         if not self.KEY:
             CLI.error('Missing mantis key! (%s)' % self.key_file)
 
-        decrypted_lines = self.environment.read(env_file)
-
-        if not decrypted_lines:
-            return None
-
-        encrypted_lines = []
-        encrypted_env = {}
-
-        for line in decrypted_lines:
-            if Environment.is_valid_line(line):
-                var, decrypted_value = Environment.parse_line(line)
-                encrypted_value = Crypto.encrypt(decrypted_value, self.KEY, self.encrypt_deterministically)
-                encrypted_lines.append(f'{var}={encrypted_value}')
-                encrypted_env[var] = encrypted_value
-            else:
-                encrypted_lines.append(line)
-
-            if not return_value and 'force' not in params:
-                print(encrypted_lines[-1])
-
         if return_value:
-            return encrypted_env
+            return self.encrypt_lines(self.environment.read(env_file) or [])[1]
 
-        if 'force' in params:
-            Environment.save(env_file_encrypted, encrypted_lines)
-            CLI.success(f'Saved to file {env_file_encrypted}')
-        else:
-            # save to file?
-            CLI.warning(f'Save to file {env_file_encrypted}?')
+        encrypted_lines = self.prepare_encryption(env_file, full='full' in params)
+
+        # Skip if files are already in sync
+        if encrypted_lines is None:
+            CLI.success(f'Skipping {env_file} - already in sync with {env_file_encrypted}')
+            return None
 
-            save_to_file = input("(Y)es or (N)o: ")
+        CLI.info(f'Encrypting environment file {env_file}...')
 
-            if save_to_file.lower() == 'y':
-                Environment.save(env_file_encrypted, encrypted_lines)
-                CLI.success(f'Saved to file {env_file_encrypted}')
-            else:
-                CLI.warning(f'Save it to {env_file_encrypted} manually.')
+        if self.save_env_file(env_file_encrypted, encrypted_lines, params):
+            self.record_in_sync(env_file)
 
     def decrypt_env(self, params: str = '', env_file: Optional[str] = None, return_value: bool = False) -> Optional[Dict[str, str]]:
         """
@@ -751,10 +1050,15 @@ class BaseManager(AbstractManager):
         if env_file is None:
             CLI.info(f'Environment file not specified. Walking all environment files...')
 
+            env_files = [encrypted_env_file.rstrip('.encrypted') for encrypted_env_file in self.environment.encrypted_files]
+
+            if 'force' in params and not return_value:
+                self.sync_env_files(env_files, self.prepare_decryption, lambda env_file: env_file, 'Decrypted')
+                return None
+
             values = {}
 
-            for encrypted_env_file in self.environment.encrypted_files:
-                env_file = encrypted_env_file.rstrip('.encrypted')
+            for env_file in env_files:
                 value = self.decrypt_env(params=params, env_file=env_file, return_value=return_value)
                 if return_value:
                     values.update(value)
@@ -763,57 +1067,254 @@ class BaseManager(AbstractManager):
 
         env_file_encrypted = f'{env_file}.encrypted'
 
-        # Skip if files are already in sync (unless return_value is True, which is used for internal checks)
-        if not return_value and self.are_env_files_in_sync(env_file):
+        if not self.KEY:
+            CLI.error('Missing mantis key!')
+
+        if return_value:
+            encrypted_lines = self.environment.read(env_file_encrypted)
+            return self.decrypt_lines(encrypted_lines)[1] if encrypted_lines is not None else None
+
+        decrypted_lines = self.prepare_decryption(env_file)
+
+        # Skip if files are already in sync
+        if decrypted_lines is None:
             CLI.success(f'Skipping {env_file_encrypted} - already in sync with {env_file}')
             return None
 
-        if not return_value:
-            CLI.info(f'Decrypting environment file {env_file_encrypted}...')
+        CLI.info(f'Decrypting environment file {env_file_encrypted}...')
 
-        if not self.KEY:
-            CLI.error('Missing mantis key!')
+        if self.save_env_file(env_file, decrypted_lines, params):
+            self.record_in_sync(env_file)
 
-        encrypted_lines = self.environment.read(env_file_encrypted)
+    def encrypt_lines(self, lines: List[str], existing: Optional[Dict[str, Tuple[str, str]]] = None) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Encrypts values of environment file lines, keeping comments and empty lines.
+        Variables with the same value in existing (variable: (encrypted, decrypted value))
+        keep their encrypted value. Returns encrypted lines and variables.
+        """
+        existing = existing or {}
+        variables = [Environment.parse_line(line) if Environment.is_valid_line(line) else None for line in lines]
 
-        if encrypted_lines is None:
-            return None
+        # encrypt added and changed values in one batch
+        changed = [variable[1] for variable in variables if variable and existing.get(variable[0], (None, None))[1] != variable[1]]
+        encrypted_values = iter(self.crypto.encrypt_many(changed))
 
-        if not encrypted_lines:
-            return {}
+        encrypted_lines = []
+        encrypted_env = {}
+
+        for line, variable in zip(lines, variables):
+            if variable:
+                var, decrypted_value = variable
+
+                if existing.get(var, (None, None))[1] == decrypted_value:
+                    encrypted_value = existing[var][0]
+                else:
+                    encrypted_value = next(encrypted_values)
+
+                encrypted_lines.append(f'{var}={encrypted_value}')
+                encrypted_env[var] = encrypted_value
+            else:
+                encrypted_lines.append(line)
+
+        return encrypted_lines, encrypted_env
+
+    def decrypt_lines(self, lines: List[str]) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Decrypts values of encrypted environment file lines, keeping comments and empty lines.
+        Returns decrypted lines and variables.
+        """
+        variables = [Environment.parse_line(line) if Environment.is_valid_line(line) else None for line in lines]
+
+        try:
+            decrypted_values = iter(self.crypto.decrypt_many([variable[1] for variable in variables if variable]))
+        except ValueError as e:
+            CLI.error(str(e))
 
         decrypted_lines = []
         decrypted_env = {}
 
-        for line in encrypted_lines:
-            if Environment.is_valid_line(line):
-                var, encrypted_value = Environment.parse_line(line)
-                decrypted_value = Crypto.decrypt(encrypted_value, self.KEY, self.encrypt_deterministically)
+        for line, variable in zip(lines, variables):
+            if variable:
+                var = variable[0]
+                decrypted_value = next(decrypted_values)
                 decrypted_lines.append(f'{var}={decrypted_value}')
                 decrypted_env[var] = decrypted_value
             else:
                 decrypted_lines.append(line)
 
-            if not return_value and 'force' not in params:
-                print(decrypted_lines[-1])
+        return decrypted_lines, decrypted_env
 
-        if return_value:
-            return decrypted_env
+    def read_encrypted_values(self, env_file_encrypted: str) -> Optional[Dict[str, Tuple[str, str]]]:
+        """
+        Returns encrypted and decrypted value of each variable of encrypted environment file,
+        None if the file does not exist or can't be decrypted
+        """
+        if not Path(env_file_encrypted).exists():
+            return None
+
+        try:
+            variables = [Environment.parse_line(line) for line in self.environment.read(env_file_encrypted) if Environment.is_valid_line(line)]
+            decrypted_values = self.crypto.decrypt_many([encrypted_value for var, encrypted_value in variables])
+        except ValueError:
+            return None
+
+        return {var: (encrypted_value, decrypted_value) for (var, encrypted_value), decrypted_value in zip(variables, decrypted_values)}
+
+    def prepare_encryption(self, env_file: str, full: bool = False) -> Optional[List[str]]:
+        """
+        Returns encrypted lines of environment file, None if its encrypted file is already in sync.
+        Unless full, variables unchanged since the existing encrypted file keep their encrypted
+        values, so only added and changed variables are encrypted (and show up in VCS diffs).
+        """
+        lines = self.environment.read(env_file) or []
+
+        if full:
+            return self.encrypt_lines(lines)[0]
+
+        env_file_encrypted = f'{env_file}.encrypted'
+
+        if Path(env_file_encrypted).exists() and self.sync_manifest and self.sync_manifest.in_sync(env_file):
+            return None
+
+        existing = self.read_encrypted_values(env_file_encrypted)
+        loaded_environment = dict(Environment.parse_line(line) for line in lines if Environment.is_valid_line(line))
+
+        if existing is not None and loaded_environment == {var: values[1] for var, values in existing.items()}:
+            self.record_in_sync(env_file)
+            return None
+
+        return self.encrypt_lines(lines, existing)[0]
+
+    def prepare_decryption(self, env_file: str) -> Optional[List[str]]:
+        """
+        Returns decrypted lines of encrypted environment file, None if environment file is already in sync.
+        The encrypted file is decrypted once, for both the comparison and the result.
+        """
+        if Path(env_file).exists() and self.sync_manifest and self.sync_manifest.in_sync(env_file):
+            return None
+
+        decrypted_lines, decrypted_env = self.decrypt_lines(self.environment.read(f'{env_file}.encrypted') or [])
 
+        if Path(env_file).exists() and self.environment.load(env_file) == decrypted_env:
+            self.record_in_sync(env_file)
+            return None
+
+        return decrypted_lines
+
+    def save_env_file(self, path: str, lines: List[str], params: str = '') -> bool:
+        """
+        Saves lines to environment file, after user confirmation unless force param is given.
+        Returns whether the file was saved.
+        """
         if 'force' in params:
-            Environment.save(env_file, decrypted_lines)
-            CLI.success(f'Saved to file {env_file}')
-        else:
-            # save to file?
-            CLI.warning(f'Save to file {env_file}?')
+            Environment.save(path, lines)
+            CLI.success(f'Saved to file {path}')
+            return True
+
+        for line in lines:
+            print(line)
+
+        # save to file?
+        CLI.warning(f'Save to file {path}?')
+
+        save_to_file = input("(Y)es or (N)o: ")
+
+        if save_to_file.lower() == 'y':
+            Environment.save(path, lines)
+            CLI.success(f'Saved to file {path}')
+            return True
 
-            save_to_file = input("(Y)es or (N)o: ")
+        CLI.warning(f'Save it to {path} manually.')
+        return False
 
-            if save_to_file.lower() == 'y':
-                Environment.save(env_file, decrypted_lines)
-                CLI.success(f'Saved to file {env_file}')
+    def sync_env_files(self, env_files: List[str], prepare: Callable[[str], Optional[List[str]]], target: Callable[[str], str], action: str) -> None:
+        """
+        Prepares lines of environment files in a worker pool and saves the changed ones to their
+        target files. Prints results in order of the files and a summary.
+        """
+        if not env_files:
+            return
+
+        if not self.KEY:
+            CLI.error('Missing mantis key! (%s)' % self.key_file)
+
+        # created once, before workers use them
+        self.sync_manifest
+        self.crypto
+
+        def sync(env_file):
+            lines = prepare(env_file)
+
+            # None means in sync, no lines (e.g. no variables in the encrypted file) are saved too
+            if lines is not None:
+                Environment.save(target(env_file), lines)
+                self.record_in_sync(env_file)
+
+            return lines
+
+        with ThreadPoolExecutor(max_workers=min(len(env_files), os.cpu_count() or 4)) as executor:
+            futures = {env_file: executor.submit(sync, env_file) for env_file in env_files}
+
+        saved, skipped, failed = [], [], []
+
+        for env_file, future in futures.items():
+            try:
+                lines = future.result()
+            except (Exception, SystemExit) as e:
+                failed.append(env_file)
+                CLI.danger(f'Failed {env_file}' + (f': {e}' if isinstance(e, Exception) else ''))
+                continue
+
+            if lines is not None:
+                saved.append(env_file)
+                CLI.success(f'Saved to file {target(env_file)}')
             else:
-                CLI.warning(f'Save it to {env_file} manually.')
+                skipped.append(env_file)
+                CLI.info(f'Skipping {env_file} - already in sync')
+
+        CLI.bold(f'{action} {len(saved)} of {len(env_files)} files, {len(skipped)} already in sync, {len(failed)} failed')
+
+        if failed:
+            CLI.error(f'Failed files: {", ".join(failed)}')
+
+    def migrate_encryption(self) -> None:
+        """
+        Rewrites deterministically encrypted values of legacy format to the versioned envelope
+        """
+        from mantis.cryptography import Crypto
+
+        encrypted_files = getattr(self.environment, 'encrypted_files', [])
+        migrated_files = 0
+        migrated_values = 0
+
+        for env_file_encrypted in encrypted_files:
+            env_file = env_file_encrypted.rstrip('.encrypted')
+            was_in_sync = bool(self.sync_manifest and self.sync_manifest.in_sync(env_file))
+            lines = self.environment.read(env_file_encrypted)
+            migrated_lines = []
+
+            for line in lines:
+                if Environment.is_valid_line(line):
+                    var, encrypted_value = Environment.parse_line(line)
+
+                    if Crypto.is_legacy(encrypted_value):
+                        line = f'{var}={Crypto.migrate(encrypted_value)}'
+                        migrated_values += 1
+
+                migrated_lines.append(line)
+
+            if migrated_lines == lines:
+                CLI.info(f'Skipping {env_file_encrypted} - no values of legacy format')
+                continue
+
+            Environment.save(env_file_encrypted, migrated_lines)
+            migrated_files += 1
+            CLI.success(f'Migrated {env_file_encrypted}')
+
+            if was_in_sync:
+                self.record_in_sync(env_file)
+
+        CLI.bold(f'Migrated {migrated_values} values in {migrated_files} of {len(encrypted_files)} files')
 
     def check_env(self) -> None:
         """
@@ -997,10 +1498,12 @@ class BaseManager(AbstractManager):
 
     def get_service_containers(self, service: str) -> List[str]:
         """
-        Prints container names of given service
+        Prints names of running containers of given service
         """
-        containers = self.docker_compose("ps --format '{{.Names}}' %s" % service, return_output=True)
-        return containers.strip().split('\n')
+        project = self.get_project_by_service(service)
+        projects = [project] if project is not None else self.project_services().keys()
+
+        return self.get_container_inventory().names(projects=projects, service=service, only_running=True)
 
     def get_number_of_containers(self, service: str) -> int:
         """
@@ -1048,14 +1551,177 @@ class BaseManager(AbstractManager):
         Checks current health of given container
         """
         if self.has_healthcheck(container):
-            command = f'inspect --format="{{{{json .State.Health.Status}}}}" {container}'
-            status = self.docker(command, return_output=True).strip(' \n"')
+            called, status = self.engine_call('health_status', container)
+
+            if not called:
+                command = f'inspect --format="{{{{json .State.Health.Status}}}}" {container}'
+                status = self.docker(command, return_output=True).strip(' \n"')
 
             if status == 'healthy':
                 return True, status
             else:
                 return False, status
 
+    @property
+    def healthcheck_mode(self) -> str:
+        """
+        "poll" inspects health of a container repeatedly, "events" waits for docker to report it
+        """
+        return self.config.get('healthcheck', {}).get('mode', 'poll')
+
+    def wait_for_health_events(
+        self,
+        containers: List[str],
+        timeout: float,
+        cancelled: Optional[threading.Event] = None,
+        on_result: Optional[Callable[[str, Optional[bool]], None]] = None,
+    ) -> Dict[str, Optional[bool]]:
+        """
+        Waits for health_status events of given containers, returning as soon as each of them
+        reported healthy (True) or unhealthy (False). Containers which did not report any
+        status within the timeout are None. When the event stream ends early, health of the
+        rest is polled until the timeout. Every status is passed to on_result as it arrives.
+        """
+        if self.dry_run:
+            command = self.build_docker_command(f"docker events --filter event=health_status --format '{{{{json .}}}}'")
+            CLI.warning(f'[DRY-RUN] {command}')
+
+            for container in containers:
+                if on_result:
+                    on_result(container, True)
+
+            return {container: True for container in containers}
+
+        filters = ' '.join(f'--filter container={container}' for container in containers)
+        command = self.build_docker_command(f"docker events --filter event=health_status {filters} --format '{{{{json .}}}}'")
+        results = {}
+        wait = cancelled.wait if cancelled else sleep
+
+        def record(container, is_healthy):
+            if container in containers and container not in results:
+                results[container] = is_healthy
+
+                if on_result:
+                    on_result(container, is_healthy)
+
+        def check_current_health():
+            for container in containers:
+                if container not in results:
+                    is_healthy, status = self.check_health(container) or (None, None)
+
+                    if status in ('healthy', 'unhealthy'):
+                        record(container, is_healthy)
+
+        def waiting():
+            return len(results) < len(containers) and time.monotonic() < deadline and not (cancelled and cancelled.is_set())
+
+        with HealthEventStream(command) as events:
+            # subscribed first, so that a status reported meanwhile is not missed
+            check_current_health()
+            deadline = time.monotonic() + timeout
+
+            while waiting():
+                # wake up now and then to notice a cancelled wait
+                event = events.get(timeout=min(deadline - time.monotonic(), 0.5 if cancelled else timeout))
+
+                if event is not None:
+                    container, status = event
+                    record(container, status == 'healthy')
+                elif events.finished:
+                    break
+
+        # events could not be followed or the subscription started late
+        check_current_health()
+
+        if waiting():
+            # the event stream ended early, poll the rest like the "poll" mode does
+            poll_interval = min(self.get_healthcheck_timing(container)[0] for container in containers) / 10
+
+            while waiting():
+                wait(min(poll_interval, max(deadline - time.monotonic(), 0)))
+                check_current_health()
+
+        return {container: results.get(container) for container in containers}
+
+    def get_healthcheck_timing(self, container: str) -> Tuple[float, int]:
+        """
+        Returns healthcheck interval (in seconds) and retries of given container
+        """
+        healthcheck_config = self.get_healthcheck_config(container) or {}
+        return healthcheck_config.get('Interval', 1000000000) / 1000000000, healthcheck_config.get('Retries', 10)
+
+    def wait_until_healthy(
+        self,
+        container: str,
+        report: Optional[Callable[[str, int, int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        reported: Optional[Callable[[], Optional[bool]]] = None,
+    ) -> Optional[bool]:
+        """
+        Waits for given container to become healthy, reporting every checked status
+        as (status, attempt, attempts). Prints nothing itself, so it can run in a thread.
+        In "events" mode, `reported` waits for the status of an events subscription shared
+        by many containers, instead of subscribing for this container alone.
+
+        Returns True once healthy and False when the container did not become healthy in time
+        (or the wait got cancelled). A container without healthcheck command gets its start
+        period instead, returning None. Raises HealthcheckNotDefined when there is neither.
+        """
+        with trace(f'healthcheck {container}', 'healthcheck', container=container) as span:
+            span['healthy'] = self._wait_until_healthy(container, report, cancelled, reported)
+            return span['healthy']
+
+    def _wait_until_healthy(
+        self,
+        container: str,
+        report: Optional[Callable[[str, int, int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        reported: Optional[Callable[[], Optional[bool]]] = None,
+    ) -> Optional[bool]:
+        report = report or (lambda status, attempt, attempts: None)
+        wait = cancelled.wait if cancelled else sleep
+
+        if not self.has_healthcheck(container):
+            start_period = self.get_healthcheck_start_period(container)
+
+            if start_period is None:
+                raise HealthcheckNotDefined(container)
+
+            report(f'sleeping for start period of {start_period} s', 0, 1)
+            wait(start_period)
+            report('start period passed', 1, 1)
+            return None
+
+        healthcheck_interval, healthcheck_retries = self.get_healthcheck_timing(container)
+
+        if self.healthcheck_mode == 'events':
+            if reported:
+                is_healthy = reported()
+            else:
+                is_healthy = self.wait_for_health_events([container], healthcheck_interval * healthcheck_retries, cancelled)[container]
+
+            report({True: 'healthy', False: 'unhealthy'}.get(is_healthy, 'not reported'), 1, 1)
+            return bool(is_healthy)
+
+        coeficient = 10
+        interval = healthcheck_interval / coeficient
+        retries = healthcheck_retries * coeficient
+
+        for retry in range(retries):
+            if cancelled and cancelled.is_set():
+                return False
+
+            is_healthy, status = self.check_health(container)
+            report(status, retry + 1, retries)
+
+            if is_healthy:
+                return True
+
+            if retries > 1:
+                wait(interval)
+
+        return False
+
     def healthcheck(self, container: str) -> Optional[bool]:
         """
         Execute health-check of given project container
@@ -1070,51 +1736,136 @@ class BaseManager(AbstractManager):
         console.print(f'[blue]Health-checking [yellow]{container}[/yellow]...[/blue]')
 
         if self.has_healthcheck(container):
-            healthcheck_config = self.get_healthcheck_config(container)
-            coeficient = 10
-            healthcheck_interval = healthcheck_config.get('Interval', 1000000000) / 1000000000
-            healthcheck_retries = healthcheck_config.get('Retries', 10)
-            interval = healthcheck_interval / coeficient
-            retries = healthcheck_retries * coeficient
-
-            console.print(f'[blue]Interval: [dim]{healthcheck_interval}[/dim] s -> [yellow]{interval} s[/yellow][/blue]')
-            console.print(f'[blue]Retries: [dim]{healthcheck_retries}[/dim] -> [yellow]{retries}[/yellow][/blue]')
+            healthcheck_interval, healthcheck_retries = self.get_healthcheck_timing(container)
 
-            start = time.time()
+            if self.healthcheck_mode == 'events':
+                timeout = healthcheck_interval * healthcheck_retries
+                console.print(f'[blue]Waiting for health status events (timeout [yellow]{timeout} s[/yellow])...[/blue]')
+            else:
+                coeficient = 10
+                console.print(f'[blue]Interval: [dim]{healthcheck_interval}[/dim] s -> [yellow]{healthcheck_interval / coeficient} s[/yellow][/blue]')
+                console.print(f'[blue]Retries: [dim]{healthcheck_retries}[/dim] -> [yellow]{healthcheck_retries * coeficient}[/yellow][/blue]')
 
-            for retry in range(retries):
-                is_healthy, status = self.check_health(container)
+            def report(status, attempt, attempts):
+                color = 'green' if status == 'healthy' else 'red'
+                console.print(f"#{attempt}/{attempts}: Status of '{container}' is [{color}]{status}[/{color}].")
 
-                if is_healthy:
-                    console.print(f"#{retry + 1}/{retries}: Status of '{container}' is [green]{status}[/green].")
-                    end = time.time()
-                    loading_time = end - start
-                    console.print(f'Container [yellow]{container}[/yellow] took [blue underline]{loading_time} s[/blue underline] to become healthy')
-                    return True
-                else:
-                    console.print(f"#{retry + 1}/{retries}: Status of '{container}' is [red]{status}[/red].")
+            start = time.time()
 
-                if retries > 1:
-                    sleep(interval)
+            if self.wait_until_healthy(container, report=report):
+                loading_time = time.time() - start
+                console.print(f'Container [yellow]{container}[/yellow] took [blue underline]{loading_time} s[/blue underline] to become healthy')
+                return True
 
             # All retries exhausted, container is unhealthy
-            console.print(f'[red bold]Container {container} failed to become healthy after {retries} retries[/red bold]')
+            console.print(f'[red bold]Container {container} failed to become healthy in {time.time() - start:.1f} s[/red bold]')
             return False
         else:
             CLI.warning(f"Container '{container}' doesn't have healthcheck command defined. Looking for start period value...")
-            start_period = self.get_healthcheck_start_period(container)
 
-            if start_period is None:
-                CLI.danger(f"Container '{container}' doesn't have neither healthcheck command or start period defined.")
-                CLI.warning(f'Stopping and removing container {container}')
-                self.docker(f'container stop {container}')
-                self.docker(f'container rm {container}')
+            try:
+                return self.wait_until_healthy(container, report=lambda status, attempt, attempts: CLI.info(status.capitalize()))
+            except HealthcheckNotDefined:
+                self.remove_container_without_healthcheck(container)
                 sys.exit(1)
 
-            # If container doesn't have healthcheck command, sleep for N seconds
-            CLI.info(f'Sleeping for {start_period} seconds...')
-            sleep(start_period)
-            return None
+    def remove_container_without_healthcheck(self, container: str) -> None:
+        CLI.danger(f"Container '{container}' doesn't have neither healthcheck command or start period defined.")
+        CLI.warning(f'Stopping and removing container {container}')
+        self.stop_container(container)
+        self.remove_container(container)
+
+    def healthcheck_containers(self, containers: List[str]) -> Dict[str, Optional[bool]]:
+        """
+        Health-checks given containers concurrently, showing a progress row per container.
+        Fails fast: once a container turns out unhealthy, checks of the others are cancelled.
+        Those are None (like containers without healthcheck) and listed apart from failures,
+        as their health is not known.
+        """
+        if not containers:
+            return {}
+
+        results = {}
+        undefined = []
+        interrupted = []
+        last_statuses = {}
+        cancelled = threading.Event()
+        lock = threading.Lock()
+
+        # in "events" mode, a single subscription waits for health statuses of all containers
+        watched = [container for container in containers if self.healthcheck_mode == 'events' and self.has_healthcheck(container)]
+        reported = {container: threading.Event() for container in watched}
+        statuses = {}
+
+        def watch() -> None:
+            def on_result(container, is_healthy):
+                statuses[container] = is_healthy
+                reported[container].set()
+
+            timeout = max(interval * retries for interval, retries in map(self.get_healthcheck_timing, watched))
+
+            try:
+                self.wait_for_health_events(watched, timeout, cancelled, on_result=on_result)
+            finally:
+                # not reported in time (or cancelled)
+                for event in reported.values():
+                    event.set()
+
+        def waiter(container: str) -> Callable[[], Optional[bool]]:
+            def wait() -> Optional[bool]:
+                reported[container].wait()
+                return statuses.get(container)
+
+            return wait
+
+        with CLI.progress() as progress:
+            tasks = {container: progress.add_task(f'{container}: waiting', total=None) for container in containers}
+
+            def check(container: str) -> None:
+                task = tasks[container]
+
+                def report(status, attempt, attempts):
+                    last_statuses[container] = status
+                    progress.update(task, description=f'{container}: {status}', completed=attempt, total=attempts)
+
+                try:
+                    results[container] = self.wait_until_healthy(
+                        container, report=report, cancelled=cancelled,
+                        reported=waiter(container) if container in reported else None,
+                    )
+                except HealthcheckNotDefined:
+                    undefined.append(container)
+                    results[container] = False
+                    report('no healthcheck nor start period', 1, 1)
+
+                if results[container] is False:
+                    with lock:
+                        first_failure = not cancelled.is_set()
+                        cancelled.set()
+
+                    # stopped waiting because of another container, not found unhealthy itself
+                    if not first_failure and container not in undefined and last_statuses.get(container) != 'unhealthy':
+                        results[container] = None
+                        interrupted.append(container)
+                        report('cancelled', 1, 1)
+
+            with ThreadPoolExecutor(max_workers=len(containers) + 1) as executor:
+                watching = executor.submit(watch) if watched else None
+                list(executor.map(check, containers))
+
+                if watching:
+                    watching.result()
+
+        if interrupted:
+            CLI.warning(f'Health-check cancelled once another container failed: {", ".join(sorted(interrupted))}')
+
+        for container in undefined:
+            self.remove_container_without_healthcheck(container)
+
+        if undefined:
+            sys.exit(1)
+
+        return {container: results.get(container, False) for container in containers}
 
     def build(self, services: Optional[List[str]] = None) -> None:
         """
@@ -1163,16 +1914,7 @@ class BaseManager(AbstractManager):
         """
         Returns project names by compose files
         """
-        projects = defaultdict(list)
-
-        for compose_file in self.compose_files:
-            with open(compose_file, 'r') as file:
-                compose_data = yaml.safe_load(file)
-                name = compose_data.get('name', '')
-                services = compose_data.get('services', {}).keys()
-                projects[name].extend(services)
-
-        return projects
+        return self.compose_model.project_services()
 
     def get_project_by_service(self, service: str) -> Optional[str]:
         project_services = self.project_services()
@@ -1187,18 +1929,7 @@ class BaseManager(AbstractManager):
         """
         Returns all defined services
         """
-        services = []
-
-        compose_files = [compose_file] if compose_file else self.compose_files
-
-        for compose_file in compose_files:
-            with open(compose_file, 'r') as file:
-                compose_data = yaml.safe_load(file)
-                compose_services = compose_data.get('services', {}).keys()
-
-                services += compose_services
-
-        return services
+        return self.compose_model.services(compose_file)
 
     def services_to_build(self, compose_file: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
         """
@@ -1206,27 +1937,20 @@ class BaseManager(AbstractManager):
         """
         data = {}
 
-        compose_files = [compose_file] if compose_file else self.compose_files
-
-        for compose_file in compose_files:
-            with open(compose_file, 'r') as file:
-                compose_data = yaml.safe_load(file)
-
-            services = compose_data.get('services', {})
-            for service_name, service_config in services.items():
-                build = service_config.get('build', None)
-
-                if build:
-                    data[service_name] = {
-                        'project_name': compose_data.get('name', ''),
-                        'dockerfile': build.get('dockerfile', 'Dockerfile'),
-                        'context': build.get('context', '.'),
-                        'cache_from': build.get('cache_from', []),
-                        'cache_to': build.get('cache_to', []),
-                        'args': build.get('args', {}),
-                        'image': service_config.get('image', ''),
-                        'platform': service_config.get('platform', '')
-                    }
+        for service in self.compose_model.service_entries(compose_file):
+            build = service.build
+
+            if build:
+                data[service.name] = {
+                    'project_name': service.project,
+                    'dockerfile': build.get('dockerfile', 'Dockerfile'),
+                    'context': build.get('context', '.'),
+                    'cache_from': build.get('cache_from', []),
+                    'cache_to': build.get('cache_to', []),
+                    'args': build.get('args', {}),
+                    'image': service.image,
+                    'platform': service.platform
+                }
 
         return data
 
@@ -1299,13 +2023,15 @@ class BaseManager(AbstractManager):
         CLI.step(3, 3, 'Prune Docker images')
         self.clean()
 
-    def deploy(self, dirty: bool = False, strategy: str = 'blue-green') -> None:
+    def deploy(self, dirty: bool = False, strategy: str = 'blue-green', max_surge: int = 1, max_unavailable: int = 0) -> None:
         """
         Runs deployment process: uploads files, pulls images, runs zero-downtime deployment, removes suffixes, reloads webserver, clean
 
         Args:
             dirty: Skip zero-downtime and cleaning steps
-            strategy: Deployment strategy - 'rolling' (one-by-one) or 'blue-green' (scale 2x)
+            strategy: Deployment strategy - 'rolling' (in batches) or 'blue-green' (scale 2x)
+            max_surge: Rolling strategy - number of new containers started per batch
+            max_unavailable: Rolling strategy - number of old containers removed before their replacements are healthy
         """
         CLI.info('Deploying...')
 
@@ -1319,8 +2045,8 @@ class BaseManager(AbstractManager):
 
         if is_running and not dirty:
             if strategy == 'rolling':
-                CLI.info('Using rolling update strategy (one-by-one)...')
-                success = self.rolling_update()
+                CLI.info(f'Using rolling update strategy (batches of {max_surge + max_unavailable})...')
+                success = self.rolling_update(max_surge=max_surge, max_unavailable=max_unavailable)
             else:  # blue-green
                 CLI.info('Using blue-green strategy (scale 2x)...')
                 success = self.zero_downtime()
@@ -1378,14 +2104,10 @@ class BaseManager(AbstractManager):
         scale = num_containers * 2
         self.scale(service, scale)
 
-        # healthcheck
+        # healthcheck all new containers at once, they start up in parallel anyway
         new_containers = self.get_containers(prefix=container_prefix, exclude=old_containers, only_running=True)
-        unhealthy_containers = []
-
-        for new_container in new_containers:
-            is_healthy = self.healthcheck(container=new_container)
-            if is_healthy is False:
-                unhealthy_containers.append(new_container)
+        health = self.healthcheck_containers(new_containers)
+        unhealthy_containers = [container for container, is_healthy in health.items() if is_healthy is False]
 
         # Handle unhealthy containers
         if unhealthy_containers:
@@ -1409,12 +2131,14 @@ class BaseManager(AbstractManager):
                 console.print(f'\n[yellow]Rolling back deployment for service {service}...[/yellow]')
 
                 # Stop and remove unhealthy new containers
+                project_containers = self.get_containers()
+
                 for new_container in new_containers:
-                    if new_container in self.get_containers():
+                    if new_container in project_containers:
                         CLI.info(f'Stopping new container [{new_container}]...')
-                        self.docker(f'container stop {new_container}')
+                        self.stop_container(new_container)
                         CLI.info(f'Removing new container [{new_container}]...')
-                        self.docker(f'container rm {new_container}')
+                        self.remove_container(new_container)
 
                 CLI.success(f'Rollback complete. Old containers preserved: {old_containers}')
                 return False  # Not successful zero-downtime. Rollback performed
@@ -1427,20 +2151,22 @@ class BaseManager(AbstractManager):
         # Stop and remove old container
         CLI.info(f'Stopping old containers of service {service}: {old_containers}')
 
+        project_containers = self.get_containers()
+
         for old_container in old_containers:
-            if old_container in self.get_containers():
+            if old_container in project_containers:
                 CLI.info(f'Stopping old container [{old_container}]...')
-                self.docker(f'container stop {old_container}')
+                self.stop_container(old_container)
 
                 CLI.info(f'Removing old container [{old_container}]...')
-                self.docker(f'container rm {old_container}')
+                self.remove_container(old_container)
             else:
                 CLI.info(f'{old_container} was not running')
 
         # rename new container
         for index, new_container in enumerate(new_containers):
             CLI.info(f'Renaming new container [{new_container}]...')
-            self.docker(f'container rename {new_container} {container_prefix}-{index + 1}')
+            self.rename_container(new_container, f'{container_prefix}-{index + 1}')
 
         self.remove_suffixes(prefix=container_prefix)
 
@@ -1449,24 +2175,31 @@ class BaseManager(AbstractManager):
 
         return True  # Successful zero-downtime. No rollback
 
-    def rolling_update(self, service: Optional[str] = None) -> bool:
+    def rolling_update(self, service: Optional[str] = None, max_surge: int = 1, max_unavailable: int = 0) -> bool:
         """
-        Performs rolling update of service containers one at a time.
+        Performs rolling update of service containers in batches.
 
-        Flow for each container:
-        1. Start 1 new container
-        2. Wait for healthy
-        3. Reload webserver
-        4. Remove 1 old container
+        Flow for each batch of (max_surge + max_unavailable) containers:
+        1. Remove up to max_unavailable old containers
+        2. Start new containers for the whole batch
+        3. Wait for them to become healthy (concurrently)
+        4. Reload webserver
+        5. Remove remaining old containers of the batch
 
-        Returns True if successful, False if rollback was performed.
+        With max_unavailable 0 (default) the service never drops below its capacity,
+        with max_surge 1 (default) containers are replaced one at a time.
+
+        Returns True if successful, False if rollback was performed or no new container started.
         """
+        if max_surge < 0 or max_unavailable < 0 or max_surge + max_unavailable == 0:
+            CLI.error('Max surge and max unavailable must not be negative, and at least one of them positive.')
+
         if not service:
             # Process all zero_downtime services
             zero_downtime_services = self.config['zero_downtime']
             for index, service in enumerate(zero_downtime_services):
                 CLI.step(index + 1, len(zero_downtime_services), f'Rolling update: {service}')
-                if not self.rolling_update(service):
+                if not self.rolling_update(service, max_surge=max_surge, max_unavailable=max_unavailable):
                     return False  # Rollback happened, stop processing
             return True
 
@@ -1479,48 +2212,72 @@ class BaseManager(AbstractManager):
             CLI.danger(f'No running containers for service {service}. Skipping rolling update...')
             return True
 
-        console.print(f'\n[blue]Starting rolling update for [yellow]{service}[/yellow] ({num_containers} containers)[/blue]\n')
+        batch_size = max_surge + max_unavailable
+        num_batches = (num_containers + batch_size - 1) // batch_size
+
+        console.print(f'\n[blue]Starting rolling update for [yellow]{service}[/yellow] ({num_containers} containers, '
+                      f'max surge {max_surge}, max unavailable {max_unavailable})[/blue]\n')
 
         # Track containers we've successfully replaced
         replaced_count = 0
+        started_containers = []
+
+        for batch_index, offset in enumerate(range(0, num_containers, batch_size)):
+            batch = old_containers[offset:offset + batch_size]
+            taken_down = batch[:max_unavailable]
+            console.print(f'[cyan]━━━ Batch {batch_index + 1}/{num_batches}: {", ".join(batch)} ━━━[/cyan]')
 
-        for i, old_container in enumerate(old_containers):
-            step = i + 1
-            console.print(f'[cyan]━━━ Container {step}/{num_containers} ━━━[/cyan]')
+            # Step 1: Remove old containers allowed to be unavailable
+            for old_container in taken_down:
+                CLI.info(f'Removing old container: {old_container}')
+                self.stop_container(old_container)
+                self.remove_container(old_container)
 
-            # Step 1: Scale up by 1 (start new container)
+            # Step 2: Scale up by the batch (start new containers)
             current_count = len(self.get_containers(prefix=container_prefix, only_running=True))
-            CLI.info(f'Starting new container (scaling {current_count} → {current_count + 1})...')
-            self.scale(service, current_count + 1)
+            CLI.info(f'Starting {len(batch)} new container(s) (scaling {current_count} → {current_count + len(batch)})...')
+            self.scale(service, current_count + len(batch))
+
+            # Get the new containers (the ones that weren't there before). Compose numbers
+            # containers of a service, so the newest ones have the highest numbers.
+            current_inventory = self.get_project_inventory().filter(prefix=container_prefix, only_running=True)
+            new_containers = [
+                container.name for container in sorted(
+                    current_inventory.filter(exclude=old_containers + started_containers),
+                    key=lambda c: (c.number if c.number is not None else -1, c.name),
+                    reverse=True
+                )
+            ][:len(batch)]
+
+            if not new_containers:
+                CLI.danger(f'No new container of service {service} started in batch {batch_index + 1}, stopping rolling update.')
 
-            # Get the new container (the one that wasn't there before)
-            all_current = self.get_containers(prefix=container_prefix, only_running=True)
-            new_container = None
-            for c in all_current:
-                if c not in old_containers and c != old_container:
-                    # Check if this is a newly created container
-                    if new_container is None or c > new_container:  # Higher suffix = newer
-                        new_container = c
+                if taken_down:
+                    CLI.warning(f'Already removed before the batch started: {taken_down}')
 
-            if not new_container:
-                # Fallback: get the container with highest suffix
-                new_container = sorted(all_current)[-1]
+                CLI.info(f'Successfully replaced {replaced_count}/{num_containers} containers before failure.')
+                return False
 
-            CLI.info(f'New container: {new_container}')
+            started_containers += new_containers
 
-            # Step 2: Wait for healthy
-            is_healthy = self.healthcheck(container=new_container)
+            CLI.info(f'New containers: {", ".join(new_containers)}')
 
-            if is_healthy is False:
+            # Step 3: Wait for healthy
+            health = self.healthcheck_containers(new_containers)
+            unhealthy_containers = [container for container, is_healthy in health.items() if is_healthy is False]
+
+            if unhealthy_containers:
                 # Show logs
-                console.print(f'\n[red bold]⚠ Container {new_container} failed health check[/red bold]\n')
-                console.print(f'[yellow]Logs for {new_container}:[/yellow]')
-                self.docker(f'logs {new_container} --tail 50')
-                console.print('')
+                console.print(f'\n[red bold]⚠ Containers {", ".join(unhealthy_containers)} failed health check[/red bold]\n')
+
+                for container in unhealthy_containers:
+                    console.print(f'[yellow]Logs for {container}:[/yellow]')
+                    self.docker(f'logs {container} --tail 50')
+                    console.print('')
 
                 # Ask for rollback
                 rollback = CLI.timed_confirm(
-                    "Rollback? (stop new container, keep remaining old ones)",
+                    "Rollback? (stop new containers of this batch, keep remaining old ones)",
                     timeout=10,
                     default=False
                 )
@@ -1528,29 +2285,39 @@ class BaseManager(AbstractManager):
                 if rollback:
                     console.print(f'\n[yellow]Rolling back...[/yellow]')
 
-                    # Stop and remove the failed new container
-                    if new_container in self.get_containers():
-                        self.docker(f'container stop {new_container}')
-                        self.docker(f'container rm {new_container}')
+                    # Stop and remove new containers of the failed batch
+                    project_containers = self.get_containers()
+
+                    for new_container in new_containers:
+                        if new_container in project_containers:
+                            self.stop_container(new_container)
+                            self.remove_container(new_container)
 
-                    remaining_old = old_containers[i:]  # Containers we haven't replaced yet
+                    remaining_old = old_containers[offset + len(taken_down):]  # Containers we haven't replaced yet
                     CLI.success(f'Rollback complete. Preserved: {remaining_old}')
+
+                    if taken_down:
+                        CLI.warning(f'Already removed before the batch became healthy: {taken_down}')
+
                     CLI.info(f'Successfully replaced {replaced_count}/{num_containers} containers before failure.')
                     return False
                 else:
-                    console.print(f'[yellow]Continuing with potentially unhealthy container...[/yellow]')
+                    console.print(f'[yellow]Continuing with potentially unhealthy containers...[/yellow]')
 
-            # Step 3: Reload webserver (new container now receiving traffic)
+            # Step 4: Reload webserver (new containers now receiving traffic)
             self.try_to_reload_webserver()
 
-            # Step 4: Stop and remove old container
-            CLI.info(f'Removing old container: {old_container}')
-            if old_container in self.get_containers():
-                self.docker(f'container stop {old_container}')
-                self.docker(f'container rm {old_container}')
+            # Step 5: Stop and remove remaining old containers of the batch
+            project_containers = self.get_containers()
+
+            for old_container in batch[len(taken_down):]:
+                CLI.info(f'Removing old container: {old_container}')
+                if old_container in project_containers:
+                    self.stop_container(old_container)
+                    self.remove_container(old_container)
 
-            replaced_count += 1
-            console.print(f'[green]✓ Replaced {old_container} → {new_container}[/green]\n')
+            replaced_count += len(batch)
+            console.print(f'[green]✓ Replaced {", ".join(batch)} → {", ".join(new_containers)}[/green]\n')
 
         # Rename containers to clean suffixes
         final_containers = self.get_containers(prefix=container_prefix, only_running=True)
@@ -1558,7 +2325,7 @@ class BaseManager(AbstractManager):
             new_name = f'{container_prefix}-{index + 1}'
             if container != new_name:
                 CLI.info(f'Renaming {container} → {new_name}')
-                self.docker(f'container rename {container} {new_name}')
+                self.rename_container(container, new_name)
 
         self.remove_suffixes(prefix=container_prefix)
         self.try_to_reload_webserver()
@@ -1593,7 +2360,7 @@ class BaseManager(AbstractManager):
 
             if container not in self.services():
                 CLI.info(f'Removing suffix of container {container}')
-                self.docker(f'container rename {container} {new_container}')
+                self.rename_container(container, new_container)
 
     def restart_service(self, service: str) -> None:
         """
@@ -1607,10 +2374,10 @@ class BaseManager(AbstractManager):
         for app_container in app_containers:
             if app_container in self.get_containers():
                 CLI.info(f'Stopping container [{app_container}]...')
-                self.docker(f'container stop {app_container}')
+                self.stop_container(app_container)
 
                 CLI.info(f'Removing container [{app_container}]...')
-                self.docker(f'container rm {app_container}')
+                self.remove_container(app_container)
             else:
                 CLI.info(f'{app_container} was not running')
 
@@ -1640,7 +2407,7 @@ class BaseManager(AbstractManager):
 
         for index, container in enumerate(containers):
             CLI.step(index + 1, steps, f'Stopping {container}')
-            self.docker(f'container stop {container}')
+            self.stop_container(container)
 
     def kill(self, containers: Optional[List[str]] = None) -> None:
         """
@@ -1657,6 +2424,8 @@ class BaseManager(AbstractManager):
             CLI.step(index + 1, steps, f'Killing {container}')
             self.docker(f'container kill {container}')
 
+        self.invalidate_containers()
+
     def start(self, containers: Optional[List[str]] = None) -> None:
         """
         Starts all or given project containers
@@ -1672,6 +2441,8 @@ class BaseManager(AbstractManager):
             CLI.step(index + 1, steps, f'Starting {container}')
             self.docker(f'container start {container}')
 
+        self.invalidate_containers()
+
     def run(self, params: List[str], rm: bool = False) -> None:
         """
         Calls compose run with params
@@ -1680,6 +2451,7 @@ class BaseManager(AbstractManager):
         rm_flag = '--rm' if rm else ''
         CLI.info(f'Running {params_str}...')
         self.docker_compose(f'run {rm_flag} {params_str}')
+        self.invalidate_containers()
 
     def up(self, params: Optional[List[str]] = None) -> None:
         """
@@ -1688,6 +2460,7 @@ class BaseManager(AbstractManager):
         params_str = ' '.join(params) if params else ''
         CLI.info(f'Starting up {params_str}...')
         self.docker_compose(f'up {params_str} -d')
+        self.invalidate_containers()
 
     def down(self, params: Optional[List[str]] = None) -> None:
         """
@@ -1696,6 +2469,7 @@ class BaseManager(AbstractManager):
         params_str = ' '.join(params) if params else ''
         CLI.info(f'Running down {params_str}...')
         self.docker_compose(f'down {params_str}')
+        self.invalidate_containers()
 
     def scale(self, service: str, scale: int) -> None:
         """
@@ -1713,18 +2487,17 @@ class BaseManager(AbstractManager):
             containers = self.get_containers()
 
         steps = len(containers)
-        force_flag = '-f ' if force else ''
 
         for index, container in enumerate(containers):
             CLI.step(index + 1, steps, f'Removing {container}')
-            self.docker(f'container rm {force_flag}{container}')
+            self.remove_container(container, force=force)
 
     def rename(self, container: str, new_name: str) -> None:
         """
         Renames container to a new name
         """
         CLI.info(f'Renaming container {container} to {new_name}')
-        self.docker(f'container rename {container} {new_name}')
+        self.rename_container(container, new_name)
 
     def clean(self, params: Optional[List[str]] = None) -> None:  # todo clean on all nodes
         """
@@ -1734,22 +2507,61 @@ class BaseManager(AbstractManager):
         params_str = ' '.join(params) if params else ''
         # self.docker(f'builder prune')
         self.docker(f'system prune {params_str} -a --force')
+        self.invalidate_containers()
         # self.docker(f'container prune')
         # self.docker(f'container prune --force')
 
-    def status(self) -> None:
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Returns images and containers of the docker host, with CPU and memory usage
+        ("CPUPerc" and "MemUsage", None unless running) merged into the containers.
+        The queries run concurrently.
+        """
+        # the Engine API samples named containers, the docker CLI samples all running ones at once
+        engine = self.engine
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            images = executor.submit(self.get_images)
+            containers = executor.submit(self.get_container_rows)
+            stats = None if engine else executor.submit(self.get_container_stats)
+
+            rows = containers.result()
+
+            if stats is None:
+                stats = executor.submit(self.get_container_stats, [row['Names'] for row in rows if row['State'] in RUNNING_STATES])
+
+            stats_map = stats.result()
+
+        for row in rows:
+            container_stats = stats_map.get(row['Names']) if row['State'] in RUNNING_STATES else None
+            row['CPUPerc'] = container_stats['cpu'] if container_stats else None
+            row['MemUsage'] = container_stats['mem'] if container_stats else None
+
+        return {'images': images.result(), 'containers': rows}
+
+    def status(self, as_json: bool = False) -> None:
         """
         Prints images and containers
         """
+        if as_json:
+            print(json.dumps(self.get_status(), indent=2), file=data_output(), flush=True)
+            return
+
+        from rich.table import Table
+
         console = Console()
 
         CLI.info('Getting status...')
+
+        with CLI.status('Querying images, containers and stats'):
+            status = self.get_status()
+
         steps = 2
 
         CLI.step(1, steps, 'List of Docker images')
-        images_output = self.docker('image ls --format "{{.Repository}}\t{{.Tag}}\t{{.ID}}\t{{.CreatedSince}}\t{{.Size}}"', return_output=True)
+        images = status['images']
 
-        if images_output.strip():
+        if images:
             images_table = Table(show_header=True, header_style="bold")
             images_table.add_column("REPOSITORY", style="cyan")
             images_table.add_column("TAG", style="yellow")
@@ -1757,27 +2569,15 @@ class BaseManager(AbstractManager):
             images_table.add_column("CREATED", style="magenta")
             images_table.add_column("SIZE", style="green")
 
-            for line in images_output.strip().split('\n'):
-                parts = line.split('\t')
-                if len(parts) >= 5:
-                    repo, tag, image_id, created, size = parts[0], parts[1], parts[2], parts[3], parts[4]
-                    images_table.add_row(repo, tag, image_id, created, size)
+            for image in images:
+                images_table.add_row(image['Repository'], image['Tag'], image['ID'], image['CreatedSince'], image['Size'])
 
             console.print(images_table)
 
         CLI.step(2, steps, 'Docker containers')
-        containers_output = self.docker('container ls -a --format "{{.Names}}\t{{.Status}}\t{{.Image}}\t{{.Ports}}\t{{.Size}}"', return_output=True)
-
-        if containers_output.strip():
-            # Get stats for running containers (CPU and memory usage)
-            stats_output = self.docker('stats --no-stream --format "{{.Name}}\t{{.CPUPerc}}\t{{.MemUsage}}"', return_output=True)
-            stats_map = {}
-            if stats_output.strip():
-                for line in stats_output.strip().split('\n'):
-                    stats_parts = line.split('\t')
-                    if len(stats_parts) >= 3:
-                        stats_map[stats_parts[0]] = {'cpu': stats_parts[1], 'mem': stats_parts[2]}
+        containers = status['containers']
 
+        if containers:
             containers_table = Table(show_header=True, header_style="bold")
             containers_table.add_column("NAME", style="blue")
             containers_table.add_column("STATUS")
@@ -1787,163 +2587,174 @@ class BaseManager(AbstractManager):
             containers_table.add_column("CPU", style="white")
             containers_table.add_column("MEMORY", style="yellow")
 
-            for line in containers_output.strip().split('\n'):
-                parts = line.split('\t')
-                if len(parts) >= 5:
-                    name, status, image, ports, size = parts[0], parts[1], parts[2], parts[3], parts[4]
-
-                    # Get CPU and memory stats (only available for running containers)
-                    container_stats = stats_map.get(name, {'cpu': '-', 'mem': '-'})
-                    cpu = container_stats['cpu']
-                    mem = container_stats['mem']
-
-                    # Colorize status based on state
-                    if 'Up' in status:
-                        status_colored = f'[green]{status}[/green]'
-                    elif 'Exited' in status:
-                        status_colored = f'[red]{status}[/red]'
-                    elif 'Created' in status:
-                        status_colored = f'[yellow]{status}[/yellow]'
-                    elif 'Paused' in status:
-                        status_colored = f'[yellow]{status}[/yellow]'
+            for container in containers:
+                name, status, image, ports, size = container['Names'], container['Status'], container['Image'], container['Ports'], container['Size']
+
+                # CPU and memory stats are only available for running containers
+                cpu = container['CPUPerc'] or '-'
+                mem = container['MemUsage'] or '-'
+
+                # Colorize status based on state
+                if 'Up' in status:
+                    status_colored = f'[green]{status}[/green]'
+                elif 'Exited' in status:
+                    status_colored = f'[red]{status}[/red]'
+                elif 'Created' in status:
+                    status_colored = f'[yellow]{status}[/yellow]'
+                elif 'Paused' in status:
+                    status_colored = f'[yellow]{status}[/yellow]'
+                else:
+                    status_colored = status
+
+                # Split ports into multiple lines with different colors for IPv4/IPv6
+                ports_list = ports.split(', ') if ports else ['']
+                colored_ports = []
+                for port in ports_list:
+                    if '::' in port or '[' in port:
+                        # IPv6 port
+                        colored_ports.append(f'[bright_white]{port}[/bright_white]')
                     else:
-                        status_colored = status
-
-                    # Split ports into multiple lines with different colors for IPv4/IPv6
-                    ports_list = ports.split(', ') if ports else ['']
-                    colored_ports = []
-                    for port in ports_list:
-                        if '::' in port or '[' in port:
-                            # IPv6 port
-                            colored_ports.append(f'[bright_white]{port}[/bright_white]')
-                        else:
-                            # IPv4 port
-                            colored_ports.append(f'[cyan]{port}[/cyan]')
-                    ports_formatted = '\n'.join(colored_ports)
-
-                    containers_table.add_row(name, status_colored, image, ports_formatted, size, cpu, mem)
+                        # IPv4 port
+                        colored_ports.append(f'[cyan]{port}[/cyan]')
+                ports_formatted = '\n'.join(colored_ports)
+
+                containers_table.add_row(name, status_colored, image, ports_formatted, size, cpu, mem)
 
             console.print(containers_table)
 
-    def networks(self) -> None:
+    def networks(self, as_json: bool = False) -> None:
         """
         Prints docker networks
         """
+        networks = self.get_networks()
+
+        if as_json:
+            print(json.dumps(networks, indent=2), file=data_output(), flush=True)
+            return
+
+        from rich.table import Table
+
         CLI.info('Getting networks...')
         CLI.warning('List of Docker networks')
 
-        networks = self.docker('network ls', return_output=True)
-        networks = networks.strip().split('\n')
+        table = Table(show_header=True, header_style="bold")
+        table.add_column("NETWORK ID", style="bright_blue")
+        table.add_column("NAME", style="cyan")
+        table.add_column("DRIVER", style="magenta")
+        table.add_column("SCOPE", style="yellow")
+        table.add_column("CONTAINERS")
 
-        for index, network in enumerate(networks):
-            network_data = list(filter(lambda x: x != '', network.split(' ')))
-            network_name = network_data[1]
+        for network in networks:
+            table.add_row(network['ID'], network['Name'], network['Driver'], network['Scope'], ', '.join(network['Containers']))
 
-            if index == 0:
-                print(f'{network}\tCONTAINERS')
-            else:
-                containers = self.docker(
-                    command=f'network inspect -f \'{{{{ range $key, $value := .Containers }}}}{{{{ .Name }}}} {{{{ end }}}}\' {network_name}',
-                    return_output=True
-                )
-                containers = ', '.join(containers.split())
-                print(f'{network}\t{containers}'.strip())
+        Console().print(table)
 
-    def logs(self, params: Optional[str] = None) -> None:
+    def logs(self, params: Optional[str] = None, tail: Optional[int] = None, since: Optional[str] = None,
+             until: Optional[str] = None, grep: Optional[str] = None, merge: bool = False) -> None:
         """
-        Prints logs of all or given project container
+        Prints logs of all project containers at once, or follows logs of given containers.
+        Since/until take what docker logs accepts, grep is a regular expression lines must match.
+        Merged logs are timestamped and ordered by their timestamps across containers.
         """
-        CLI.info('Reading logs...')
+        try:
+            pattern = re.compile(grep) if grep else None
+        except re.error as e:
+            CLI.error(f'Invalid --grep pattern: {e}')
 
-        if not params:
-            containers = self.get_containers()
-            steps = len(containers)
+        CLI.info('Reading logs...')
 
-            for index, container in enumerate(containers):
-                CLI.step(index + 1, steps, f'{container} logs')
-                self.docker(f'logs {container} --tail 10')
+        # a time window or a pattern looks for something in the logs, not just at their end
+        windowed = since or until or grep
 
+        if not params:
+            tail = tail if tail is not None else None if windowed else 10
+            self.stream_logs(self.get_containers(), tail=tail, since=since, until=until, pattern=pattern, merge=merge)
             return
 
         containers = self.resolve_containers(params.split())
+        tail = tail if tail is not None else None if since else 1000
 
         # following a single container does not need any output multiplexing
-        if len(containers) == 1:
-            self.docker(f'logs {containers[0]} --tail 1000 -f')
+        if len(containers) == 1 and not pattern and not merge:
+            self.docker(f'logs {containers[0]}{self.log_options(tail, since, until, follow=True)}')
             return
 
-        self.follow_logs(containers)
+        self.follow_logs(containers, tail=tail, since=since, until=until, pattern=pattern, merge=merge)
 
-    def follow_logs(self, containers: List[str], tail: int = 1000) -> None:
+    @staticmethod
+    def log_options(tail: Optional[int] = None, since: Optional[str] = None, until: Optional[str] = None,
+                    follow: bool = False, timestamps: bool = False) -> str:
         """
-        Follows logs of multiple containers at once, prefixing every line with a container name.
-        Following them one by one is not an option as the first one would never finish.
+        Returns options of docker logs
         """
-        commands = {
-            container: self.build_docker_command(f'docker logs {container} --tail {tail} -f')
-            for container in containers
-        }
+        options = f' --tail {tail}' if tail is not None else ''
+        options += f' --since {shlex.quote(since)}' if since else ''
+        options += f' --until {shlex.quote(until)}' if until else ''
+        options += ' --timestamps' if timestamps else ''
+        return options + (' -f' if follow else '')
 
-        if self.dry_run:
-            for command in commands.values():
-                CLI.warning(f'[DRY-RUN] {command}')
-            return
+    def log_sources(self, containers: List[str], tail: Optional[int] = None, follow: bool = False,
+                    since: Optional[str] = None, until: Optional[str] = None, timestamps: bool = False) -> Dict[str, Any]:
+        """
+        Returns log source of each container for LogMultiplexer: a streaming Docker Engine API
+        request over the tunnel if enabled (falling back to the docker CLI), a docker CLI process otherwise
+        """
+        from mantis.logs import command_source, engine_source, fallback, log_time
 
-        processes = {}
-
-        for container, command in commands.items():
-            print(command)
-            processes[container] = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                # own process group, so Ctrl+C is handled here and kills the whole shell + docker tree
-                start_new_session=True
-            )
+        engine = self.engine
+        options = self.log_options(tail, since, until, follow, timestamps)
+        sources = {}
 
-        width = max(map(len, processes.keys()))
+        if engine:
+            try:
+                params = {
+                    'tail': tail if tail is not None else 'all',
+                    'follow': int(follow),
+                    'timestamps': int(timestamps),
+                    'since': log_time(since) if since else None,
+                    'until': log_time(until) if until else None,
+                }
+            except ValueError:
+                # a time format only the docker CLI understands
+                engine = None
+
+        for container in containers:
+            command = self.build_docker_command(f'docker logs {container}{options}')
+            source = command_source(command)
+
+            if engine:
+                source = fallback(engine_source(engine.socket_path, container, **params), source)
+            else:
+                print(command)
 
-        def stream(container: str, process: subprocess.Popen) -> None:
-            for line in process.stdout:
-                print(f'{container:<{width}} | {line}', end='', flush=True)
+            sources[container] = source
 
-        threads = [
-            threading.Thread(target=stream, args=(container, process), daemon=True)
-            for container, process in processes.items()
-        ]
+        return sources
 
-        for thread in threads:
-            thread.start()
+    def stream_logs(self, containers: List[str], tail: Optional[int] = None, follow: bool = False,
+                    since: Optional[str] = None, until: Optional[str] = None, pattern: Optional[Pattern] = None,
+                    merge: bool = False) -> None:
+        """
+        Reads logs of given containers concurrently, prefixing every line with a container name.
+        Merged logs are read with timestamps and written in their order instead of as they arrive.
+        """
+        from mantis.logs import LogMerger, LogMultiplexer
 
-        try:
-            # wait for the processes rather than for the reader threads, so that Ctrl+C
-            # interrupts a plain sleep in the main thread and cleanup always runs
-            while any(process.poll() is None for process in processes.values()):
-                sleep(0.2)
-        except KeyboardInterrupt:
-            pass
-        finally:
-            for process in processes.values():
-                self.terminate_process_group(process)
+        if self.dry_run:
+            for container in containers:
+                CLI.warning(f"[DRY-RUN] {self.build_docker_command(f'docker logs {container}{self.log_options(tail, since, until, follow, merge)}')}")
+            return
 
-            for thread in threads:
-                thread.join(timeout=1)
+        sources = self.log_sources(containers, tail=tail, follow=follow, since=since, until=until, timestamps=merge)
+        (LogMerger if merge else LogMultiplexer)(sources, pattern=pattern).run()
 
-    @staticmethod
-    def terminate_process_group(process: subprocess.Popen) -> None:
+    def follow_logs(self, containers: List[str], tail: Optional[int] = 1000, since: Optional[str] = None,
+                    until: Optional[str] = None, pattern: Optional[Pattern] = None, merge: bool = False) -> None:
         """
-        Terminates given process together with its children, i.e. the shell running a docker command
+        Follows logs of multiple containers at once, prefixing every line with a container name.
+        Following them one by one is not an option as the first one would never finish.
         """
-        if process.poll() is not None:
-            return
-
-        try:
-            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-        except (ProcessLookupError, PermissionError):
-            process.terminate()
+        self.stream_logs(containers, tail=tail, follow=True, since=since, until=until, pattern=pattern, merge=merge)
 
     def bash(self, params: str) -> None:
         """
@@ -1994,6 +2805,11 @@ class BaseManager(AbstractManager):
         """
         Prints health-check config (if any) of given container
         """
+        called, container_details = self.engine_call('inspect_container', container)
+
+        if called:
+            return ((container_details or {}).get('Config') or {}).get('Healthcheck')
+
         try:
             container_details = json.loads(self.docker(f'container inspect {container}', return_output=True))
             return container_details[0]["Config"]["Healthcheck"]
@@ -2002,35 +2818,27 @@ class BaseManager(AbstractManager):
 
         return None
 
-    def read_compose_configs(self) -> Dict[str, Any]:
+    @property
+    def compose_model(self) -> ComposeModel:
         """
-        Returns merged compose configs
+        Returns compose files parsed once per run (and again only once any of them changes)
         """
-        config = {}
+        if self._compose_model is None or not self._compose_model.is_current(self.compose_files):
+            self._compose_model = ComposeModel.load(self.compose_files, previous=self._compose_model)
 
-        for compose_file in self.compose_files:
-            with open(compose_file, 'r') as file:
-                compose_data = yaml.safe_load(file)
-                config = merge_json(config, compose_data)
+        return self._compose_model
 
-        return config
+    def read_compose_configs(self) -> Dict[str, Any]:
+        """
+        Returns merged compose configs
+        """
+        return self.compose_model.merged
 
     def get_deploy_replicas(self, service: str) -> int:
         """
         Returns default number of deploy replicas of given services
         """
-        replicas = 1
-
-        for compose_file in self.compose_files:
-            with open(compose_file, 'r') as file:
-                compose_data = yaml.safe_load(file)
-
-            try:
-                replicas = compose_data['services'][service]['deploy']['replicas']
-            except KeyError:
-                pass
-
-        return replicas
+        return self.compose_model.replicas(service)
 
     def backup_volume(self, volume: str) -> None:
         # backups folder
@@ -2074,7 +2882,7 @@ def get_extension_classes(extensions: List[str]) -> List[type]:
     return extension_classes
 
 
-SECRETS_COMMANDS = {'show-env', 'encrypt-env', 'decrypt-env', 'check-env'}
+SECRETS_COMMANDS = {'show-env', 'encrypt-env', 'decrypt-env', 'migrate-encryption', 'check-env'}
 
 # Commands running against the local docker daemon, so they need no connection
 # (see use_connection=False in build and push). They accept any environment which is
@@ -2124,21 +2932,11 @@ def validate_environment_for_commands(environment_id: str, config: Dict[str, Any
                          f'Available connections: {", ".join(sorted(available))}')
 
 
-def resolve_environment(environment_id: Optional[str], config: Dict[str, Any], config_file: str, command: str = None) -> Optional[str]:
+def get_available_environments(config: Dict[str, Any], config_file: str, command: str = None) -> List[str]:
     """
-    Resolves environment prefix to full environment ID.
-
-    If the prefix matches exactly one environment, returns that environment ID.
-    If multiple environments match, raises an error with the ambiguous options.
-    If no environments match, raises an error with available options.
+    Returns environments given command can run in: environment folders for secrets commands,
+    connections (and environment folders for local commands) otherwise.
     """
-    if not environment_id:
-        return None
-
-    # Single connection mode - no environment resolution needed
-    if config.get('connection'):
-        return environment_id
-
     # Get folder-based environments
     env_folder = config.get('environment', {}).get('folder', DEFAULT_ENV_FOLDER)
     config_dir = str(Path(config_file).parent.resolve())
@@ -2151,19 +2949,37 @@ def resolve_environment(environment_id: Optional[str], config: Dict[str, Any], c
     # For local commands: use connections + folders + local
     # For other commands: use connections + local
     if command in SECRETS_COMMANDS:
-        available_envs = folder_envs
-    else:
-        # "local" is a special environment that doesn't require a connection
-        if 'local' in environment_id:
-            return environment_id
+        return folder_envs
 
-        connection_envs = list(config.get('connections', {}).keys())
+    connection_envs = list(config.get('connections', {}).keys())
 
-        if command in LOCAL_COMMANDS:
-            # no connection needed, a folder-based environment is enough
-            available_envs = list(dict.fromkeys(['local'] + connection_envs + folder_envs))
-        else:
-            available_envs = ['local'] + connection_envs
+    if command in LOCAL_COMMANDS:
+        # no connection needed, a folder-based environment is enough
+        return list(dict.fromkeys(['local'] + connection_envs + folder_envs))
+
+    return ['local'] + connection_envs
+
+
+def resolve_environment(environment_id: Optional[str], config: Dict[str, Any], config_file: str, command: str = None) -> Optional[str]:
+    """
+    Resolves environment prefix to full environment ID.
+
+    If the prefix matches exactly one environment, returns that environment ID.
+    If multiple environments match, raises an error with the ambiguous options.
+    If no environments match, raises an error with available options.
+    """
+    if not environment_id:
+        return None
+
+    # Single connection mode - no environment resolution needed
+    if config.get('connection'):
+        return environment_id
+
+    # "local" is a special environment that doesn't require a connection
+    if command not in SECRETS_COMMANDS and 'local' in environment_id:
+        return environment_id
+
+    available_envs = get_available_environments(config, config_file, command)
 
     # Check for exact match first
     if environment_id in available_envs:
@@ -2181,6 +2997,31 @@ def resolve_environment(environment_id: Optional[str], config: Dict[str, Any], c
         CLI.error(f'Environment "{environment_id}" not found. Available: {", ".join(sorted(available_envs))}')
 
 
+def resolve_environments(environment_ids: str, config: Dict[str, Any], config_file: str, command: str = None) -> List[str]:
+    """
+    Resolves a comma separated list of environments, prefixes and globs to full environment IDs,
+    keeping order of the list and of matches of each glob
+    """
+    if config.get('connection'):
+        CLI.error('Config error: Multiple environments were provided, but config uses single connection mode.')
+
+    available_envs = sorted(env for env in get_available_environments(config, config_file, command) if env != 'local')
+    environments = []
+
+    for pattern in filter(None, map(str.strip, environment_ids.split(','))):
+        if any(char in pattern for char in '*?['):
+            matches = fnmatch.filter(available_envs, pattern)
+
+            if not matches:
+                CLI.error(f'No environment matches "{pattern}". Available: {", ".join(available_envs)}')
+        else:
+            matches = [resolve_environment(pattern, config, config_file, command=command)]
+
+        environments += [env for env in matches if env not in environments]
+
+    return environments
+
+
 def get_manager(environment_id: Optional[str], mode: str, dry_run: bool = False, commands: list = None, use_tunnel: bool = True) -> BaseManager:
     # config file
     config_file = find_config(environment_id, commands=commands)
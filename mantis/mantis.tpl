@@ -30,6 +30,9 @@
     "file_prefix": ""
   },
   "zero_downtime": [],
+  "healthcheck": {
+    "mode": "poll"
+  },
   "project_path": "~",
   "connection": null,
   "connections": {
@@ -37,6 +40,10 @@
   "tunnel": {
     "enabled": null,
     "remote_socket": "/var/run/docker.sock",
-    "ssh_options": []
+    "ssh_options": [],
+    "engine_api": false
+  },
+  "daemon": {
+    "idle_timeout": 900
   }
 }
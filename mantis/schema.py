@@ -1,5 +1,5 @@
 """Pydantic models for mantis configuration validation."""
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Literal, Optional, Any
 
 from pydantic import BaseModel, Field, model_validator
 
@@ -48,10 +48,33 @@ class TunnelConfig(BaseModel):
 
     Leave "enabled" unset to detect availability per run, set it to true to skip that
     detection on a server known to support it, or to false to never tunnel at all.
+
+    With "engine_api", read-only queries (container listing, inspect, health, logs, stats,
+    networks, images) talk HTTP to the forwarded socket instead of spawning the docker CLI.
     """
     enabled: Optional[bool] = None
     remote_socket: str = "/var/run/docker.sock"
     ssh_options: List[str] = Field(default_factory=list)
+    engine_api: bool = False
+
+
+class HealthcheckConfig(BaseModel):
+    """
+    How to wait for new containers to become healthy.
+
+    "poll" inspects their health every tenth of the healthcheck interval, "events" subscribes
+    to docker health_status events once and returns as soon as each container reports.
+    """
+    mode: Literal["poll", "events"] = "poll"
+
+
+class DaemonConfig(BaseModel):
+    """
+    Background mantis process keeping manager, tunnel and container listing of an
+    environment warm (mantis -e <environment> daemon-start). It stops itself after
+    idle_timeout seconds without a command.
+    """
+    idle_timeout: int = 900
 
 
 class MantisConfig(BaseModel):
@@ -68,12 +91,14 @@ class MantisConfig(BaseModel):
 
     # Deployment
     zero_downtime: List[str] = Field(default_factory=list)
+    healthcheck: HealthcheckConfig = Field(default_factory=HealthcheckConfig)
     project_path: str = "~"
 
     # Connections (mutually exclusive)
     connection: Optional[str] = None
     connections: Dict[str, str] = Field(default_factory=dict)
     tunnel: TunnelConfig = Field(default_factory=TunnelConfig)
+    daemon: DaemonConfig = Field(default_factory=DaemonConfig)
 
     # Custom manager class
     manager_class: str = "mantis.managers.BaseManager"
@@ -0,0 +1,143 @@
+"""
+Interactive mantis session running many commands against one warm environment
+(mantis -e production shell-session).
+
+The manager, its tunnel and container listing are built once for the whole session.
+Every line takes the same grammar as the command line, "+" chains included, without
+global options. Tab completes command names, container and service names.
+"""
+import shlex
+from pathlib import Path
+from typing import List, Optional
+
+import typer
+
+from mantis.helpers import CLI
+
+EXIT_COMMANDS = {'exit', 'quit'}
+
+HISTORY_FILE = Path('~/.mantis_history').expanduser()
+
+
+class MantisShell(object):
+    def __init__(self, manager):
+        from mantis.command_line import load_app
+
+        self.manager = manager
+        click_app = typer.main.get_command(load_app())
+        self.commands = sorted(set(click_app.commands) - {'shell-session'})
+
+    @property
+    def prompt(self) -> str:
+        return f'mantis ({self.manager.environment_id or self.manager.host or "local"})> '
+
+    def names(self) -> List[str]:
+        """
+        Returns containers and services of the project, from the kept container listing
+        """
+        try:
+            containers = self.manager.get_project_inventory().names()
+            services = self.manager.services()
+        except (Exception, SystemExit):
+            return []
+
+        return sorted(set(containers) | set(services))
+
+    def candidates(self, line: str, text: str) -> List[str]:
+        """
+        Returns completions of the word being typed: commands at the start of a chain,
+        containers and services in their arguments
+        """
+        words = shlex.split(line[:len(line) - len(text)], posix=False) if line.strip() else []
+
+        # words of the current command of the chain
+        while '+' in words:
+            words = words[words.index('+') + 1:]
+
+        options = self.commands if not words else self.names()
+        return [option for option in options if option.startswith(text)]
+
+    def complete(self, text: str, state: int) -> Optional[str]:
+        import readline
+
+        try:
+            matches = self.candidates(readline.get_line_buffer()[:readline.get_endidx()], text)
+        except ValueError:
+            # unfinished quotes
+            return None
+
+        return matches[state] + ' ' if state < len(matches) else None
+
+    def execute(self, line: str) -> Optional[int]:
+        """
+        Runs a chain of commands, returning its exit code (None for an empty line)
+        """
+        from mantis.command_line import split_args, invoke_chain
+
+        try:
+            global_opts, cmd_groups = split_args(shlex.split(line))
+        except ValueError as e:
+            CLI.danger(f'Invalid command: {e}')
+            return 1
+
+        if global_opts:
+            CLI.warning(f'Global options ({" ".join(global_opts)}) are set for the whole session, ignoring them.')
+
+        if not cmd_groups:
+            return None
+
+        if any(group[0] == 'shell-session' for group in cmd_groups):
+            CLI.warning('Already in a mantis shell session.')
+            return 1
+
+        try:
+            invoke_chain(cmd_groups)
+        except SystemExit as e:
+            # CLI.error and failed commands exit, the session goes on
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except KeyboardInterrupt:
+            print()
+            return 130
+
+        return 0
+
+    def run(self) -> None:
+        try:
+            import readline
+        except ImportError:
+            # not available on Windows, the session works without completion
+            readline = None
+
+        if readline:
+            readline.set_completer(self.complete)
+            readline.set_completer_delims(' \t+')
+            readline.parse_and_bind('tab: complete')
+
+            if HISTORY_FILE.exists():
+                readline.read_history_file(HISTORY_FILE)
+
+        prompt = self.prompt
+
+        CLI.info('Type commands as on the command line (build + push + deploy), "exit" or Ctrl+D to quit.')
+
+        try:
+            while True:
+                try:
+                    line = input(prompt).strip()
+                except KeyboardInterrupt:
+                    print()
+                    continue
+                except EOFError:
+                    print()
+                    break
+
+                if line in EXIT_COMMANDS:
+                    break
+
+                exit_code = self.execute(line)
+
+                if exit_code:
+                    CLI.danger(f'Exit code {exit_code}')
+        finally:
+            if readline:
+                readline.write_history_file(HISTORY_FILE)
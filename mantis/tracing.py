@@ -0,0 +1,171 @@
+"""
+Timing of commands mantis runs, exported as a Chrome trace.
+
+The exported file opens in chrome://tracing or https://ui.perfetto.dev, showing every
+docker/compose call, shell command and health wait of a run on a timeline.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from mantis.helpers import CLI
+
+
+class Span(object):
+    """A single timed step with its arguments (command, exit code, bytes of output, ...)."""
+
+    def __init__(self, name: str, category: str, start: float, thread: int, args: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = 0.0
+        self.thread = thread
+        self.args = args
+
+
+class Tracer(object):
+    """
+    Collects spans of a run. Thread safe, as health checks and parallel commands
+    record spans from worker threads.
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.threads: Dict[int, int] = {}
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[Dict[str, Any]]:
+        """
+        Times the wrapped block. Yields arguments of the span, so the block can add
+        results known only once it finished (e.g. exit_code or output_bytes).
+        """
+        with self.lock:
+            thread = self.threads.setdefault(threading.get_ident(), len(self.threads) + 1)
+
+        span = Span(name, category, time.perf_counter() - self.origin, thread, args)
+
+        try:
+            yield span.args
+        except BaseException as e:
+            span.args.setdefault('error', type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - self.origin - span.start
+
+            with self.lock:
+                self.spans.append(span)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+
+        return {
+            'traceEvents': [{
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': round(span.start * 1000000),
+                'dur': round(span.duration * 1000000),
+                'pid': pid,
+                'tid': span.thread,
+                'args': span.args,
+            } for span in sorted(self.spans, key=lambda s: s.start)],
+            'displayTimeUnit': 'ms',
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.to_chrome_trace(), file, indent=1, default=str)
+
+    def slowest(self, count: int = 10, exclude_categories=('mantis',)) -> List[Span]:
+        """
+        Returns slowest steps, leaving out mantis commands wrapping them
+        """
+        spans = [span for span in self.spans if span.category not in exclude_categories]
+        return sorted(spans, key=lambda s: s.duration, reverse=True)[:count]
+
+    def print_summary(self, count: int = 10) -> None:
+        from rich.console import Console
+        from rich.table import Table
+
+        spans = self.slowest(count)
+
+        if not spans:
+            return
+
+        table = Table(title=f'Slowest steps (of {len(self.spans)})', show_header=True, header_style="bold")
+        table.add_column("STEP", style="cyan", overflow="fold")
+        table.add_column("CATEGORY", style="magenta")
+        table.add_column("START", justify="right")
+        table.add_column("DURATION", justify="right", style="yellow")
+        table.add_column("EXIT CODE", justify="right")
+        table.add_column("OUTPUT", justify="right", style="green")
+
+        for span in spans:
+            exit_code = span.args.get('exit_code', '')
+            output_bytes = span.args.get('output_bytes')
+
+            table.add_row(
+                span.name,
+                span.category,
+                f'{span.start:.2f} s',
+                f'{span.duration:.2f} s',
+                f'[red]{exit_code}[/red]' if exit_code not in ('', 0) else str(exit_code),
+                f'{output_bytes} B' if output_bytes is not None else '',
+            )
+
+        Console().print(table)
+
+
+def step_name(command: str, length: int = 100) -> str:
+    """
+    Shortens a shell command to a readable step name, leaving out DOCKER_HOST and similar prefixes
+    """
+    words = command.split()
+
+    while words and '=' in words[0] and not words[0].startswith('-'):
+        words.pop(0)
+
+    name = ' '.join(words)
+    return name if len(name) <= length else name[:length - 1] + '…'
+
+
+# tracer of this run, set by start_tracing (--trace option)
+tracer: Optional[Tracer] = None
+
+
+def start_tracing(path: str) -> Tracer:
+    """
+    Starts collecting spans, writing them to given file and printing the slowest ones at exit
+    """
+    global tracer
+
+    if tracer is None:
+        tracer = Tracer()
+
+        def finish():
+            tracer.write(path)
+            tracer.print_summary()
+            CLI.info(f'Trace written to {path}')
+
+        atexit.register(finish)
+
+    return tracer
+
+
+@contextmanager
+def trace(name: str, category: str, **args) -> Iterator[Dict[str, Any]]:
+    """
+    Times the wrapped block if tracing is on, otherwise just yields the arguments
+    """
+    if tracer is None:
+        yield args
+        return
+
+    with tracer.span(name, category, **args) as span_args:
+        yield span_args
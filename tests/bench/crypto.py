@@ -0,0 +1,117 @@
+"""
+Micro-benchmark of encryption of environment variables.
+
+Compares per-value cost of building a cipher for every value as mantis did before (a new
+pycryptodome AES-SIV cipher or Fernet per value), of the per-call API (Crypto.encrypt /
+Crypto.decrypt) and of a session built once per key (Crypto.session, encrypt_many /
+decrypt_many), for both deterministic (AES-SIV) and Fernet encryption:
+
+    python -m tests.bench.crypto
+    python -m tests.bench.crypto --variables 500 --repeat 5
+"""
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from Crypto.Cipher import AES
+from cryptography.fernet import Fernet
+
+from mantis.cryptography import Crypto
+
+
+def encrypt_before(data: str, key: str, deterministically: bool) -> str:
+    if deterministically:
+        ciphertext, tag = AES.new(key.encode(), AES.MODE_SIV).encrypt_and_digest(data.encode())
+        return Crypto.pack(ciphertext, tag)
+
+    return Fernet(key.encode()).encrypt(data.encode()).decode()
+
+
+def decrypt_before(secret: str, key: str, deterministically: bool) -> str:
+    if deterministically:
+        ciphertext, tag = Crypto.unpack(secret)
+        return AES.new(key.encode(), AES.MODE_SIV).decrypt_and_verify(ciphertext, tag).decode()
+
+    return Fernet(key.encode()).decrypt(secret.encode()).decode()
+
+
+def best_time(function: Callable, repeat: int) -> float:
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def measure(variables: int, repeat: int = 5) -> List[Dict]:
+    """
+    Returns microseconds per value of each mode and API
+    """
+    values = [f'value-of-variable-{index}-' + 'x' * (index % 40) for index in range(variables)]
+    results = []
+
+    for deterministically in (True, False):
+        key = Crypto.generate_key(deterministically)
+        key = key if deterministically else key.decode()
+        secrets = Crypto.session(key, deterministically).encrypt_many(values)
+
+        before = {
+            'encrypt': lambda: [encrypt_before(value, key, deterministically) for value in values],
+            'decrypt': lambda: [decrypt_before(secret, key, deterministically) for secret in secrets],
+        }
+        per_call = {
+            'encrypt': lambda: [Crypto.encrypt(value, key, deterministically) for value in values],
+            'decrypt': lambda: [Crypto.decrypt(secret, key, deterministically) for secret in secrets],
+        }
+        session = {
+            'encrypt': lambda: Crypto.session(key, deterministically).encrypt_many(values),
+            'decrypt': lambda: Crypto.session(key, deterministically).decrypt_many(secrets),
+        }
+
+        for operation in ('encrypt', 'decrypt'):
+            results.append({
+                'mode': 'AES-SIV' if deterministically else 'Fernet',
+                'operation': operation,
+                'before_us': best_time(before[operation], repeat) / variables * 1e6,
+                'per_call_us': best_time(per_call[operation], repeat) / variables * 1e6,
+                'session_us': best_time(session[operation], repeat) / variables * 1e6,
+            })
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variables', type=int, default=500, help='number of variables of the environment file')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each measurement, the best one is reported')
+    args = parser.parse_args()
+
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=f'encryption of {args.variables} variables, per value', show_header=True, header_style="bold")
+    table.add_column("MODE", style="cyan")
+    table.add_column("OPERATION")
+    table.add_column("BEFORE", justify="right")
+    table.add_column("PER CALL", justify="right")
+    table.add_column("SESSION", justify="right", style="yellow")
+    table.add_column("SPEEDUP", justify="right")
+
+    for result in measure(args.variables, args.repeat):
+        table.add_row(
+            result['mode'],
+            result['operation'],
+            f"{result['before_us']:.1f} µs",
+            f"{result['per_call_us']:.1f} µs",
+            f"{result['session_us']:.1f} µs",
+            f"{result['before_us'] / result['session_us']:.1f}x",
+        )
+
+    Console().print(table)
+
+
+if __name__ == '__main__':
+    main()
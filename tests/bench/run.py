@@ -0,0 +1,202 @@
+"""
+Benchmark of mantis's own overhead, using stub docker, docker-compose and ssh executables.
+
+Counts calls of each stub and measures wall time of common commands against hosts with
+a configurable number of containers and simulated round trip latency:
+
+    python -m tests.bench.run
+    python -m tests.bench.run --containers 10,100 --latency 0.05 --scenarios status,deploy
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from tests.bench.stubs import PROJECT, initial_state
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPOSITORY_DIR = BENCH_DIR.parent.parent
+
+ENVIRONMENT = 'bench'
+TOOLS = ['docker', 'docker-compose', 'ssh']
+
+SCENARIOS = {
+    'status': ['status'],
+    'deploy': ['deploy'],
+    'zero_downtime': ['zero-downtime', 'web'],
+    'rolling_update': ['rolling-update', 'web'],
+    'logs': ['logs'],
+    'networks': ['networks'],
+    'encrypt-env': ['encrypt-env', '--force'],
+}
+
+COMPOSE_FILE = f"""\
+name: {PROJECT}
+services:
+  web:
+    image: acme/web
+    healthcheck:
+      test: ["CMD", "true"]
+  db:
+    image: acme/db
+"""
+
+
+def create_project(folder: Path) -> None:
+    """
+    Creates mantis config, compose file, environment files and key of the benchmarked project
+    """
+    from mantis.cryptography import Crypto
+
+    (folder / 'mantis.json').write_text(json.dumps({
+        'extensions': {'Nginx': {'service': 'web'}},
+        'compose': {'command': 'docker-compose', 'folder': '<MANTIS>/compose'},
+        'environment': {'folder': '<MANTIS>/environments'},
+        'zero_downtime': ['web'],
+        'connections': {ENVIRONMENT: 'ssh://bench@bench.invalid'},
+        'tunnel': {'enabled': False},
+    }))
+    (folder / 'mantis.key').write_text(Crypto.generate_key(deterministically=True))
+
+    (folder / 'compose' / ENVIRONMENT).mkdir(parents=True)
+    (folder / 'compose' / ENVIRONMENT / 'docker-compose.yml').write_text(COMPOSE_FILE)
+
+    (folder / 'environments' / ENVIRONMENT).mkdir(parents=True)
+
+    for name in ['web', 'db']:
+        variables = '\n'.join(f'{name.upper()}_VARIABLE_{index}=value-{index}' for index in range(20))
+        (folder / 'environments' / ENVIRONMENT / f'{name}.env').write_text(variables + '\n')
+
+
+def create_stubs(folder: Path) -> Path:
+    """
+    Creates executables delegating to stubs.py, to be put first on PATH
+    """
+    bin_dir = folder / 'bin'
+    bin_dir.mkdir()
+
+    for tool in TOOLS:
+        stub = bin_dir / tool
+        stub.write_text(
+            f'#!{sys.executable}\n'
+            f'import sys\n'
+            f'sys.path.insert(0, {str(REPOSITORY_DIR)!r})\n'
+            f'from tests.bench.stubs import main\n'
+            f'main({tool!r})\n'
+        )
+        stub.chmod(0o755)
+
+    return bin_dir
+
+
+def run_scenario(command: List[str], containers: int, latency: float = 0.0) -> Dict:
+    """
+    Runs a mantis command against a fresh stub host with given number of containers,
+    returning wall time and number of calls of each stub
+    """
+    folder = Path(tempfile.mkdtemp(prefix='mantis-bench-'))
+
+    try:
+        create_project(folder)
+        bin_dir = create_stubs(folder)
+        state_dir = folder / 'state'
+        state_dir.mkdir()
+        (state_dir / 'state.json').write_text(json.dumps(initial_state(containers)))
+        (state_dir / 'calls.log').touch()
+
+        env = dict(
+            os.environ,
+            PATH=f'{bin_dir}{os.pathsep}{os.environ.get("PATH", "")}',
+            PYTHONPATH=str(REPOSITORY_DIR),
+            MANTIS_BENCH_STATE=str(state_dir),
+            MANTIS_BENCH_LATENCY=str(latency),
+            MANTIS_CACHE_DIR=str(folder / 'cache'),
+        )
+        env.pop('MANTIS_KEY', None)
+
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', 'from mantis.command_line import run; run()', '-e', ENVIRONMENT, *command],
+            cwd=folder, env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        )
+        wall_time = time.perf_counter() - start
+
+        calls = [line.split('\t') for line in (state_dir / 'calls.log').read_text().splitlines()]
+
+        return {
+            'command': ' '.join(command),
+            'containers': containers,
+            'latency': latency,
+            'exit_code': result.returncode,
+            'wall_time': wall_time,
+            'calls': dict(Counter(tool for tool, _ in calls)),
+            'subcommands': dict(Counter(f'{tool} {subcommand}'.strip() for tool, subcommand in calls)),
+            'output': result.stdout[-2000:] + result.stderr[-2000:] if result.returncode else '',
+            'stdout': result.stdout,
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def print_report(results: List[Dict]) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title='mantis benchmark', show_header=True, header_style="bold")
+    table.add_column("SCENARIO", style="cyan")
+    table.add_column("CONTAINERS", justify="right")
+    table.add_column("WALL TIME", justify="right", style="yellow")
+
+    for tool in TOOLS:
+        table.add_column(tool.upper(), justify="right")
+
+    table.add_column("EXIT", justify="right")
+
+    for result in results:
+        table.add_row(
+            result['scenario'],
+            str(result['containers']),
+            f"{result['wall_time']:.2f} s",
+            *[str(result['calls'].get(tool, 0)) for tool in TOOLS],
+            str(result['exit_code']) if not result['exit_code'] else f"[red]{result['exit_code']}[/red]",
+        )
+
+    Console().print(table)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--containers', default='10,100,1000', help='comma separated numbers of containers on the host')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated round trip of every call, in seconds')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated scenarios to run')
+    parser.add_argument('--json', dest='json_file', help='also write results to given JSON file')
+    args = parser.parse_args()
+
+    results = []
+
+    for scenario in args.scenarios.split(','):
+        for containers in map(int, args.containers.split(',')):
+            result = run_scenario(SCENARIOS[scenario], containers, args.latency)
+            result['scenario'] = scenario
+            results.append(result)
+
+            if result['exit_code']:
+                print(f'{scenario} with {containers} containers failed:\n{result["output"]}', file=sys.stderr)
+
+    print_report(results)
+
+    if args.json_file:
+        Path(args.json_file).write_text(json.dumps(results, indent=2))
+
+    sys.exit(1 if any(result['exit_code'] for result in results) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Stub docker, docker-compose and ssh executables used by the benchmark harness.
+
+Every call is appended to calls.log in $MANTIS_BENCH_STATE and delayed by
+$MANTIS_BENCH_LATENCY seconds, simulating a round trip to a remote host. Containers
+live in state.json in the same folder, so that scaling, renaming and removing them
+behaves like on a real host.
+"""
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+PROJECT = 'bench'
+SERVICES = ['web', 'db']
+NETWORKS = ['bridge', f'{PROJECT}_default']
+
+PROJECT_LABEL = 'com.docker.compose.project'
+SERVICE_LABEL = 'com.docker.compose.service'
+NUMBER_LABEL = 'com.docker.compose.container-number'
+
+
+def network_id(network: str) -> str:
+    return f'{zlib.crc32(network.encode()):064x}'
+
+
+def state_dir() -> Path:
+    return Path(os.environ['MANTIS_BENCH_STATE'])
+
+
+def initial_state(containers: int) -> dict:
+    """
+    Two web replicas and a database of the benchmarked project, the rest belongs to other
+    projects sharing the host
+    """
+    state = {'containers': [
+        {'name': f'{PROJECT}-web-1', 'project': PROJECT, 'service': 'web', 'number': 1, 'state': 'running'},
+        {'name': f'{PROJECT}-web-2', 'project': PROJECT, 'service': 'web', 'number': 2, 'state': 'running'},
+        {'name': f'{PROJECT}-db', 'project': PROJECT, 'service': 'db', 'number': 1, 'state': 'running'},
+    ]}
+
+    for index in range(max(containers - len(state['containers']), 0)):
+        state['containers'].append({
+            'name': f'other{index // 10}-app-{index % 10 + 1}',
+            'project': f'other{index // 10}',
+            'service': 'app',
+            'number': index % 10 + 1,
+            'state': 'running',
+        })
+
+    return state
+
+
+@contextmanager
+def locked_state():
+    """
+    Yields containers of the host, saving changes made to them. Calls may run in parallel.
+    """
+    with open(state_dir() / 'state.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        path = state_dir() / 'state.json'
+        state = json.loads(path.read_text())
+        yield state
+        path.write_text(json.dumps(state))
+
+
+def read_state() -> dict:
+    with locked_state() as state:
+        return state
+
+
+def record(tool: str, args: list) -> None:
+    subcommand = ' '.join(arg for arg in args[:2] if not arg.startswith('-'))
+
+    with open(state_dir() / 'calls.log', 'a') as log:
+        log.write(f'{tool}\t{subcommand}\n')
+
+    time.sleep(float(os.environ.get('MANTIS_BENCH_LATENCY', 0)))
+
+
+def fields(container: dict) -> dict:
+    running = container['state'] == 'running'
+
+    return {
+        'Names': container['name'],
+        'Name': container['name'],
+        'ID': f"{zlib.crc32(container['name'].encode()):012x}",
+        'State': container['state'],
+        'Status': 'Up 2 hours' if running else 'Exited (0) 1 hour ago',
+        'Image': f"acme/{container['service']}:latest",
+        'Ports': '0.0.0.0:80->80/tcp' if container['service'] == 'web' else '',
+        'Size': '12kB (virtual 180MB)',
+        'CPUPerc': '0.15%',
+        'MemUsage': '42MiB / 1.9GiB',
+        'Labels': {
+            PROJECT_LABEL: container['project'],
+            SERVICE_LABEL: container['service'],
+            NUMBER_LABEL: str(container['number']),
+        },
+    }
+
+
+def render(template: str, values: dict) -> str:
+    """
+    Renders the subset of Go templates mantis passes to --format
+    """
+    if template.strip() == '{{json .}}':
+        return json.dumps(values)
+
+    template = re.sub(r'\{\{\s*\.Label "([^"]+)"\s*\}\}', lambda m: values.get('Labels', {}).get(m.group(1), ''), template)
+    return re.sub(r'\{\{\s*\.(\w+)\s*\}\}', lambda m: str(values.get(m.group(1), '')), template)
+
+
+def option(args: list, *names: str, default=None):
+    for index, arg in enumerate(args):
+        if arg in names and index + 1 < len(args):
+            return args[index + 1]
+
+        for name in names:
+            if arg.startswith(f'{name}='):
+                return arg.split('=', 1)[1]
+
+    return default
+
+
+def positional(args: list) -> list:
+    """
+    Returns arguments which are not options (nor values of --format/-f)
+    """
+    result = []
+    skip = False
+
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in ('--format', '-f', '--tail', '--filter', '--since', '--until'):
+            skip = True
+        elif not arg.startswith('-'):
+            result.append(arg)
+
+    return result
+
+
+def find(state: dict, name: str) -> dict:
+    for container in state['containers']:
+        if container['name'] == name:
+            return container
+
+    print(f'Error: No such container: {name}', file=sys.stderr)
+    sys.exit(1)
+
+
+def inspect(state: dict, name: str) -> dict:
+    find(state, name)
+
+    return {
+        'Name': f'/{name}',
+        'Config': {'Healthcheck': {'Test': ['CMD', 'true'], 'Interval': 1000000000, 'Retries': 3, 'StartPeriod': 0}},
+        'State': {'Status': 'running', 'Health': {'Status': 'healthy'}},
+    }
+
+
+def docker(args: list) -> None:
+    if args and args[0] == 'container':
+        args = args[1:]
+
+    command, rest = (args[0], args[1:]) if args else ('', [])
+    template = option(rest, '--format', '-f')
+
+    if command == 'version':
+        print('27.0.0')
+
+    elif command in ('ls', 'ps'):
+        for container in read_state()['containers']:
+            if '-a' in rest or '--all' in rest or container['state'] == 'running':
+                print(render(template or '{{.Names}}', fields(container)))
+
+    elif command == 'image':
+        for index, service in enumerate(SERVICES):
+            print(render(template or '{{.Repository}}', {
+                'Repository': f'acme/{service}', 'Tag': 'latest', 'ID': f'{index:012x}',
+                'CreatedSince': '2 days ago', 'Size': '180MB',
+            }))
+
+    elif command == 'stats':
+        for container in read_state()['containers']:
+            if container['state'] == 'running':
+                print(render(template, fields(container)))
+
+    elif command == 'inspect':
+        state = read_state()
+        details = [inspect(state, name) for name in positional(rest)]
+
+        if template and 'Health.Status' in template:
+            print('"healthy"')
+        else:
+            print(json.dumps(details))
+
+    elif command == 'logs':
+        for line in range(10):
+            print(f'{positional(rest)[0]} log line {line}')
+
+    elif command == 'network':
+        if rest and rest[0] == 'ls':
+            for network in NETWORKS:
+                if '-q' in rest:
+                    print(network_id(network))
+                else:
+                    print(render(template, {'ID': network_id(network)[:12], 'Name': network, 'Driver': 'bridge', 'Scope': 'local'}))
+        else:
+            containers = [c for c in read_state()['containers'] if c['state'] == 'running']
+            networks = {network_id(network): network for network in NETWORKS}
+
+            print(json.dumps([{
+                'Id': network_id(networks.get(name, name)),
+                'Name': networks.get(name, name),
+                'Driver': 'bridge',
+                'Scope': 'local',
+                'Containers': {
+                    f"{zlib.crc32(c['name'].encode()):064x}": {'Name': c['name']}
+                    for c in containers if networks.get(name, name) == f"{c['project']}_default"
+                },
+            } for name in positional(rest)[1:]]))
+
+    elif command == 'events':
+        filters = [value for index, value in enumerate(rest) if index and rest[index - 1] == '--filter']
+
+        for name in [f.split('=', 1)[1] for f in filters if f.startswith('container=')]:
+            print(json.dumps({'Action': 'health_status: healthy', 'Actor': {'Attributes': {'name': name}}}))
+
+    elif command in ('stop', 'kill', 'start', 'rm', 'rename'):
+        with locked_state() as state:
+            names = positional(rest)
+
+            if command == 'rename':
+                find(state, names[0])['name'] = names[1]
+            elif command == 'rm':
+                state['containers'] = [c for c in state['containers'] if c['name'] not in names]
+            else:
+                for name in names:
+                    find(state, name)['state'] = 'running' if command == 'start' else 'exited'
+
+    # exec, system prune, ...: nothing to simulate
+
+
+def docker_compose(args: list) -> None:
+    # leading -f <file> options
+    while args and args[0] == '-f':
+        args = args[2:]
+
+    command, rest = (args[0], args[1:]) if args else ('', [])
+
+    if command == 'up':
+        scales = dict(value.split('=', 1) for value in [option(rest, '--scale')] if value)
+
+        with locked_state() as state:
+            for service in SERVICES:
+                containers = [c for c in state['containers'] if c['project'] == PROJECT and c['service'] == service]
+                running = [c for c in containers if c['state'] == 'running']
+                wanted = int(scales.get(service, max(len(running), 1)))
+                number = max([c['number'] for c in containers] or [0])
+
+                for c in containers:
+                    if c['state'] != 'running' and len(running) < wanted:
+                        c['state'] = 'running'
+                        running.append(c)
+
+                for index in range(wanted - len(running)):
+                    number += 1
+                    state['containers'].append({
+                        'name': f'{PROJECT}-{service}-{number}', 'project': PROJECT,
+                        'service': service, 'number': number, 'state': 'running',
+                    })
+
+    elif command == 'down':
+        with locked_state() as state:
+            state['containers'] = [c for c in state['containers'] if c['project'] != PROJECT]
+
+    # pull, push, build, run, ...: nothing to simulate
+
+
+def main(tool: str) -> None:
+    args = sys.argv[1:]
+    record(tool, args)
+
+    if tool == 'docker' and args[:1] == ['compose']:
+        tool, args = 'docker-compose', args[1:]
+
+    if tool == 'docker':
+        docker(args)
+    elif tool == 'docker-compose':
+        docker_compose(args)
+    # ssh: connection is simulated by the latency only
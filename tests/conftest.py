@@ -0,0 +1,69 @@
+"""Fixtures shared by tests talking to a fake Docker daemon."""
+import json
+import shutil
+import socketserver
+import struct
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+
+
+class FakeDaemon(socketserver.ThreadingUnixStreamServer):
+    """Answers Docker Engine API requests from a dict of paths, counting connections."""
+    daemon_threads = True
+
+    def __init__(self, socket_path, routes):
+        self.routes = routes
+        self.connections = 0
+        self.requests = []
+        super().__init__(socket_path, Handler)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        status, body = self.server.routes.get(self.path.split('?')[0], (404, {'message': 'page not found'}))
+
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def daemon():
+    # unix socket paths are limited to ~104 characters, pytest's tmp_path may be longer
+    folder = tempfile.mkdtemp(prefix='mantis-', dir='/tmp')
+    server = FakeDaemon(str(Path(folder) / 'docker.sock'), {})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+@pytest.fixture
+def frame():
+    """Returns function framing payload of a stream like multiplexed container logs"""
+    def frame(stream, payload):
+        return struct.pack('>BxxxI', stream, len(payload)) + payload
+
+    return frame
@@ -0,0 +1,46 @@
+"""Smoke tests of the benchmark harness, which runs mantis against stub docker and ssh executables."""
+import json
+
+from tests.bench.crypto import measure
+from tests.bench.run import run_scenario
+
+
+class TestBenchmark:
+    """The harness runs real mantis commands, so a regression in call counts shows up here."""
+
+    def test_status(self):
+        result = run_scenario(['status'], containers=10)
+
+        assert result['exit_code'] == 0, result['output']
+        assert result['calls'].get('ssh', 0) == 0
+        # containers are listed once, not inspected one by one
+        assert result['subcommands'].get('docker inspect', 0) == 0
+        assert result['calls']['docker'] <= 5
+
+    def test_status_json_is_the_only_stdout(self):
+        result = run_scenario(['status', '--json'], containers=3)
+
+        assert result['exit_code'] == 0, result['output']
+        status = json.loads(result['stdout'])
+        assert len(status['containers']) == 3
+
+    def test_networks_json_is_the_only_stdout(self):
+        result = run_scenario(['networks', '--json'], containers=3)
+
+        assert result['exit_code'] == 0, result['output']
+        assert all('Name' in network for network in json.loads(result['stdout']))
+
+    def test_calls_do_not_grow_with_containers(self):
+        small = run_scenario(['zero-downtime', 'web'], containers=10)
+        large = run_scenario(['zero-downtime', 'web'], containers=100)
+
+        assert small['exit_code'] == large['exit_code'] == 0, small['output'] + large['output']
+        assert small['calls'] == large['calls']
+
+    def test_crypto(self):
+        results = measure(variables=10, repeat=1)
+
+        assert {(result['mode'], result['operation']) for result in results} == {
+            ('AES-SIV', 'encrypt'), ('AES-SIV', 'decrypt'), ('Fernet', 'encrypt'), ('Fernet', 'decrypt'),
+        }
+        assert all(result['session_us'] > 0 for result in results)
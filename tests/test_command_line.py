@@ -6,6 +6,7 @@ from unittest.mock import patch, MagicMock
 from mantis.command_line import (
     split_args,
     parse_global_options,
+    without_environment,
     COMMAND_SEPARATOR,
 )
 
@@ -101,6 +102,22 @@ class TestSplitArgs:
         assert global_opts == ['-e', 'prod', '-m', 'ssh']
         assert cmd_groups == [['status']]
 
+    def test_trace_option(self):
+        """Test --trace option, whose value is not a command."""
+        args = ['-e', 'prod', '--trace', 'deploy.json', 'deploy', '+', 'status']
+        global_opts, cmd_groups = split_args(args)
+
+        assert global_opts == ['-e', 'prod', '--trace', 'deploy.json']
+        assert cmd_groups == [['deploy'], ['status']]
+
+    def test_parallel_option(self):
+        """Test --parallel option, whose value is not a command."""
+        args = ['-e', 'client-*', '--parallel', '8', 'deploy', '+', 'status']
+        global_opts, cmd_groups = split_args(args)
+
+        assert global_opts == ['-e', 'client-*', '--parallel', '8']
+        assert cmd_groups == [['deploy'], ['status']]
+
     def test_long_options(self):
         """Test long option names."""
         args = ['--env', 'prod', '--mode', 'host', '--dry-run', 'status']
@@ -206,6 +223,30 @@ class TestParseGlobalOptions:
         assert opts['mode'] == 'remote'
         assert opts['dry_run'] is False
 
+    def test_trace(self):
+        """Test --trace option."""
+        opts = parse_global_options(['-e', 'prod', '--trace', 'deploy.json'])
+
+        assert opts['env'] == 'prod'
+        assert opts['trace'] == 'deploy.json'
+
+    def test_parallel(self):
+        """Test --parallel option."""
+        assert parse_global_options(['-e', 'client-*'])['parallel'] == 4
+        assert parse_global_options(['-e', 'client-*', '--parallel', '8'])['parallel'] == 8
+
+    def test_invalid_parallel(self):
+        """Test --parallel which is not a positive number."""
+        for value in ['abc', '0', '-1']:
+            with pytest.raises(SystemExit):
+                parse_global_options(['-e', 'client-*', '--parallel', value])
+
+    def test_without_environment(self):
+        """Test options passed on to the process of each environment."""
+        global_opts = ['-e', 'client-*', '--parallel', '8', '--dry-run', '--trace', 'deploy.json']
+
+        assert without_environment(global_opts) == ['--dry-run', '--trace', 'deploy.json']
+
     def test_unknown_options_ignored(self):
         """Test that unknown options are ignored."""
         opts = parse_global_options(['--unknown', '-x', '-e', 'prod'])
@@ -0,0 +1,147 @@
+"""Tests for the compose model shared by helpers reading compose files."""
+import os
+import textwrap
+from unittest.mock import patch
+
+from mantis.compose import ComposeFile, ComposeModel
+from mantis.managers import BaseManager
+
+
+def _write(path, content):
+    path.write_text(textwrap.dedent(content))
+    return str(path)
+
+
+def _manager(tmp_path):
+    """A manager wired to two compose files, without running __init__."""
+    manager = BaseManager.__new__(BaseManager)
+    manager.compose_files = [
+        _write(tmp_path / 'app.yml', """
+            name: itfitness
+            services:
+              app:
+                image: acme/app
+                container_name: itfitness-web
+                deploy:
+                  replicas: 2
+                build:
+                  context: .
+              worker:
+                image: acme/app
+        """),
+        _write(tmp_path / 'proxy.yml', """
+            name: proxy
+            services:
+              nginx:
+                image: nginx
+                healthcheck:
+                  test: ["CMD", "true"]
+        """),
+    ]
+    return manager
+
+
+class TestComposeModel:
+    """Compose files are parsed once and shared by all helpers."""
+
+    def test_helpers_parse_each_file_once(self, tmp_path):
+        manager = _manager(tmp_path)
+
+        with patch('mantis.compose.ComposeFile.read', side_effect=ComposeFile.read) as read:
+            manager.services()
+            manager.project_services()
+            manager.services_to_build()
+            manager.get_deploy_replicas('app')
+
+            for service in manager.services():
+                manager.get_project_by_service(service)
+
+        assert read.call_count == 2
+
+    def test_changed_file_is_parsed_again(self, tmp_path):
+        manager = _manager(tmp_path)
+        manager.services()
+
+        proxy = manager.compose_files[1]
+        _write(tmp_path / 'proxy.yml', """
+            name: proxy
+            services:
+              traefik:
+                image: traefik
+        """)
+        mtime = os.stat(proxy).st_mtime + 10
+        os.utime(proxy, (mtime, mtime))
+
+        with patch('mantis.compose.ComposeFile.read', side_effect=ComposeFile.read) as read:
+            assert manager.services() == ['app', 'worker', 'traefik']
+
+        # the unchanged file is reused
+        read.assert_called_once_with(proxy)
+
+    def test_typed_service_entries(self, tmp_path):
+        model = ComposeModel.load(_manager(tmp_path).compose_files)
+        app, worker, nginx = model.service_entries()
+
+        assert (app.project, app.replicas, app.container_name, app.build) == ('itfitness', 2, 'itfitness-web', {'context': '.'})
+        assert (worker.replicas, worker.container_name, worker.build) == (None, None, None)
+        assert nginx.project == 'proxy'
+        assert nginx.healthcheck == {'test': ['CMD', 'true']}
+
+    def test_project_services(self, tmp_path):
+        assert _manager(tmp_path).project_services() == {'itfitness': ['app', 'worker'], 'proxy': ['nginx']}
+
+    def test_deploy_replicas(self, tmp_path):
+        manager = _manager(tmp_path)
+
+        assert manager.get_deploy_replicas('app') == 2
+        assert manager.get_deploy_replicas('nginx') == 1
+
+    def test_replicas_of_the_last_file_win(self, tmp_path):
+        model = ComposeModel.load([
+            _write(tmp_path / 'base.yml', """
+                services:
+                  app:
+                    deploy:
+                      replicas: 2
+            """),
+            _write(tmp_path / 'override.yml', """
+                services:
+                  app:
+                    deploy:
+                      replicas: 4
+            """),
+        ])
+
+        assert model.replicas('app') == 4
+
+    def test_merged_config(self, tmp_path):
+        manager = BaseManager.__new__(BaseManager)
+        manager.compose_files = [
+            _write(tmp_path / 'base.yml', """
+                name: itfitness
+                services:
+                  app:
+                    image: acme/app
+            """),
+            _write(tmp_path / 'override.yml', """
+                name: itfitness
+                services:
+                  worker:
+                    image: acme/app
+            """),
+        ]
+
+        merged = manager.read_compose_configs()
+
+        assert sorted(merged['services'].keys()) == ['app', 'worker']
+        assert manager.read_compose_configs() is merged
+
+    def test_service_without_config(self, tmp_path):
+        """A service declared without any keys is still a service."""
+        model = ComposeModel.load([_write(tmp_path / 'bare.yml', """
+            services:
+              app:
+        """)])
+
+        assert model.services() == ['app']
+        assert model.replicas('app') == 1
@@ -14,6 +14,8 @@ from mantis.config import (
     get_config_dir,
     SECRETS_COMMANDS,
     DEFAULT_ENV_FOLDER,
+    load_validated_config,
+    config_cache_path,
 )
 
 
@@ -292,7 +294,7 @@ class TestSecretsCommands:
 
     def test_contains_expected_commands(self):
         """Test that SECRETS_COMMANDS contains all expected commands."""
-        expected = {'show-env', 'encrypt-env', 'decrypt-env', 'check-env'}
+        expected = {'show-env', 'encrypt-env', 'decrypt-env', 'migrate-encryption', 'check-env'}
         assert SECRETS_COMMANDS == expected
 
     def test_is_set(self):
@@ -386,3 +388,54 @@ class TestAnalyzeConfig:
         assert analysis.is_single_connection is False
         assert 'local' in analysis.folder_envs
         assert 'test' in analysis.folder_envs
+
+
+class TestLoadValidatedConfig:
+    """Tests for the cached validation and merge of the config."""
+
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('MANTIS_CACHE_DIR', str(tmp_path / 'cache'))
+        self.config_file = str(tmp_path / 'mantis.json')
+
+    def test_merges_template_defaults(self):
+        """Test config is merged over template defaults."""
+        config = load_validated_config({'connections': {'stage': 'ssh://user@host'}}, self.config_file)
+
+        assert config['connections'] == {'stage': 'ssh://user@host'}
+        assert config['encryption']['folder'] == '<MANTIS>'
+
+    def test_unchanged_config_skips_validation(self):
+        """Test a cached config is neither validated nor merged again."""
+        config = {'connections': {'stage': 'ssh://user@host'}}
+        first = load_validated_config(config, self.config_file)
+
+        with patch('mantis.config.check_config') as check, patch('mantis.config.load_template_config') as template:
+            assert load_validated_config(config, self.config_file) == first
+
+        check.assert_not_called()
+        template.assert_not_called()
+
+    def test_changed_config_is_validated(self):
+        """Test an edited config is validated again."""
+        load_validated_config({'connections': {'stage': 'ssh://user@host'}}, self.config_file)
+
+        with pytest.raises(SystemExit):
+            load_validated_config({'connections': {'stage': 'ssh://user@host'}, 'unknown': 1}, self.config_file)
+
+    def test_invalid_config_is_not_cached(self):
+        """Test a config failing validation is not written to the cache."""
+        with pytest.raises(SystemExit):
+            load_validated_config({'unknown': 1}, self.config_file)
+
+        assert not config_cache_path(self.config_file).exists()
+
+    def test_corrupted_cache_is_ignored(self):
+        """Test a broken cache file is replaced by a validated config."""
+        cache_path = config_cache_path(self.config_file)
+        cache_path.parent.mkdir(parents=True)
+        cache_path.write_text('{broken')
+
+        config = load_validated_config({}, self.config_file)
+
+        assert config['encryption']['folder'] == '<MANTIS>'
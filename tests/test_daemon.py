@@ -0,0 +1,241 @@
+"""Tests for the background mantis keeping an environment warm between invocations."""
+import os
+import sys
+
+import pytest
+
+from mantis import daemon
+
+
+class FakeManager(object):
+    """Just enough of a manager to print a heading and run status and networks."""
+    environment_id = 'production'
+    single_connection_mode = False
+    connection = None
+    host = None
+    mode = 'remote'
+    dry_run = False
+
+    def __init__(self, config_file):
+        self.config_file = config_file
+        self.listings = 0
+        self.engine_forgotten = False
+        self.listing_invalidated = False
+
+    def ensure_tunnel(self):
+        return None
+
+    def stop_tunnel(self):
+        pass
+
+    def get_container_inventory(self):
+        self.listings += 1
+
+    def invalidate_containers(self):
+        self.listing_invalidated = True
+
+    def forget_engine(self):
+        self.engine_forgotten = True
+
+    def status(self, as_json=False):
+        if as_json:
+            from mantis.helpers import data_output
+            print('{"containers": []}', file=data_output(), flush=True)
+            return
+
+        # os.getpid tells apart the forked process from the daemon
+        print(f'status from {os.getpid()}, listed {self.listings} times')
+        print(f'engine forgotten: {self.engine_forgotten}, listing invalidated: {self.listing_invalidated}')
+
+    def networks(self, as_json=False):
+        sys.exit(3)
+
+
+@pytest.fixture
+def sockets(tmp_path, monkeypatch):
+    tmp_path.chmod(0o700)
+    monkeypatch.setattr(daemon, 'socket_dir', lambda: tmp_path)
+    monkeypatch.delenv('MANTIS_NO_DAEMON', raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def running_daemon(sockets, tmp_path):
+    config_file = tmp_path / 'mantis.json'
+    config_file.write_text('{}')
+    path = daemon.socket_path('production')
+
+    pid = daemon.start(FakeManager(str(config_file)), path, idle_timeout=30, timeout=10)
+    assert pid
+
+    yield path
+
+    daemon.stop(path)
+    os.waitpid(pid, 0)
+
+
+class TestForwardable:
+    """Only invocations the warm manager matches are forwarded."""
+
+    def test_environment_and_mode(self):
+        assert daemon.forwardable(['-e', 'production'], [['status']]) == ('production', 'remote')
+        assert daemon.forwardable(['--env', 'production', '-m', 'ssh'], [['status']]) == ('production', 'ssh')
+        assert daemon.forwardable([], [['status']]) == (None, 'remote')
+
+    def test_other_options_run_locally(self):
+        assert daemon.forwardable(['-e', 'production', '--dry-run'], [['status']]) is None
+        assert daemon.forwardable(['-e', 'production', '--trace', 'run.json'], [['status']]) is None
+
+    def test_daemon_commands_run_locally(self):
+        assert daemon.forwardable(['-e', 'production'], [['daemon-stop']]) is None
+        assert daemon.forwardable(['-e', 'production'], []) is None
+
+
+class TestFindSocket:
+    """Daemons are found by environment, or by its prefix like -e resolves it."""
+
+    def test_prefix(self, sockets):
+        daemon.socket_path('production').touch()
+
+        assert daemon.find_socket('production') == daemon.socket_path('production')
+        assert daemon.find_socket('prod') == daemon.socket_path('production')
+        assert daemon.find_socket('stage') is None
+
+    def test_ambiguous_prefix(self, sockets):
+        daemon.socket_path('production').touch()
+        daemon.socket_path('production-eu').touch()
+
+        assert daemon.find_socket('prod') is None
+
+    def test_mode(self, sockets):
+        daemon.socket_path('production').touch()
+
+        assert daemon.find_socket('production', mode='ssh') is None
+
+    def test_no_daemon(self, sockets):
+        assert daemon.forward(['-e', 'production'], [['status']]) is None
+
+    def test_glob_characters_are_literal(self, sockets):
+        daemon.socket_path('client-a').touch()
+
+        assert daemon.find_socket('client-?') is None
+        assert daemon.find_socket('client-**') is None
+
+
+class TestSocketDirectory:
+    """Secrets and the terminal only go to sockets in a directory of the current user."""
+
+    def test_private_directory(self, tmp_path):
+        directory = tmp_path / 'sockets'
+        directory.mkdir(mode=0o700)
+        directory.chmod(0o700)
+
+        assert daemon.is_private(directory)
+
+    def test_directory_accessible_by_others(self, tmp_path):
+        directory = tmp_path / 'sockets'
+        directory.mkdir()
+        directory.chmod(0o755)
+
+        assert not daemon.is_private(directory)
+
+    def test_symlink(self, tmp_path):
+        directory = tmp_path / 'sockets'
+        directory.mkdir(mode=0o700)
+        (tmp_path / 'link').symlink_to(directory)
+
+        assert not daemon.is_private(tmp_path / 'link')
+
+    def test_forward_refuses_shared_directory(self, running_daemon, sockets):
+        sockets.chmod(0o755)
+
+        try:
+            assert daemon.forward(['-e', 'production'], [['status']]) is None
+        finally:
+            sockets.chmod(0o700)
+
+    def test_start_refuses_shared_directory(self, sockets, tmp_path):
+        sockets.chmod(0o755)
+
+        with pytest.raises(PermissionError):
+            daemon.start(FakeManager(str(tmp_path / 'mantis.json')), daemon.socket_path('production'))
+
+    def test_only_needed_environment_is_forwarded(self):
+        environment = daemon.forwarded_environment({
+            'MANTIS_KEY': 'key', 'DOCKER_HOST': 'unix:///docker.sock', 'TERM': 'xterm',
+            'AWS_SECRET_ACCESS_KEY': 'secret', 'GITHUB_TOKEN': 'token',
+        })
+
+        assert environment == {'MANTIS_KEY': 'key', 'DOCKER_HOST': 'unix:///docker.sock', 'TERM': 'xterm'}
+
+    def test_peer_of_same_user(self, running_daemon):
+        import socket
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(str(running_daemon))
+            assert daemon.is_trusted_peer(connection)
+
+
+class TestDaemon:
+    """Chains run in a fork of the warm daemon, with output going to the invocation."""
+
+    def test_forward(self, running_daemon, capfd):
+        assert daemon.daemon_pid(running_daemon)
+
+        assert daemon.forward(['-e', 'production'], [['status']]) == 0
+        assert daemon.forward(['-e', 'prod'], [['status']]) == 0
+
+        output = capfd.readouterr().out.splitlines()
+        forwarded = [line for line in output if line.startswith('status from')]
+
+        assert len(forwarded) == 2
+        # the inventory was listed once, on warm up
+        assert all(line.endswith('listed 1 times') for line in forwarded)
+        assert str(os.getpid()) not in forwarded[0]
+
+    def test_chain_has_own_engine_connection(self, running_daemon, capfd):
+        assert daemon.forward(['-e', 'production'], [['status']]) == 0
+
+        output = capfd.readouterr().out
+        assert 'engine forgotten: True, listing invalidated: False' in output
+
+    def test_outdated_listing_is_not_reused(self, sockets, tmp_path, monkeypatch, capfd):
+        monkeypatch.setattr(daemon, 'INVENTORY_TTL', -1)
+        config_file = tmp_path / 'mantis.json'
+        config_file.write_text('{}')
+        path = daemon.socket_path('production')
+        pid = daemon.start(FakeManager(str(config_file)), path, idle_timeout=30, timeout=10)
+
+        try:
+            assert daemon.forward(['-e', 'production'], [['status']]) == 0
+        finally:
+            daemon.stop(path)
+            os.waitpid(pid, 0)
+
+        assert 'listing invalidated: True' in capfd.readouterr().out
+
+    def test_json_is_the_only_stdout(self, running_daemon, capfd):
+        assert daemon.forward(['-e', 'production'], [['status', '--json']]) == 0
+
+        captured = capfd.readouterr()
+        assert captured.out == '{"containers": []}\n'
+        assert 'Mantis v' in captured.err
+
+    def test_exit_code(self, running_daemon, capfd):
+        assert daemon.forward(['-e', 'production'], [['networks']]) == 3
+        assert daemon.forward(['-e', 'production'], [['networks'], ['status']]) == 3
+
+        assert 'status from' not in capfd.readouterr().out
+
+    def test_stop(self, running_daemon):
+        assert daemon.stop(running_daemon)
+
+        assert not running_daemon.exists()
+        assert daemon.forward(['-e', 'production'], [['status']]) is None
+
+    def test_config_changed(self, running_daemon, tmp_path):
+        config_file = tmp_path / 'mantis.json'
+        os.utime(config_file, (0, 0))
+
+        # the outdated daemon declines and stops
+        assert daemon.forward(['-e', 'production'], [['status']]) is None
@@ -0,0 +1,152 @@
+"""Tests for discovery of mantis.json files."""
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from mantis.config import discover_configs
+from mantis.discovery import GitIgnore, discover, walk
+
+
+def touch_config(tmp_path, relative, connections=None):
+    path = tmp_path / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'connections': connections or {}}))
+    return path
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    project = tmp_path / 'project'
+    project.mkdir()
+    monkeypatch.chdir(project)
+    monkeypatch.setenv('MANTIS_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.delenv('MANTIS_CONFIG_DEPTH', raising=False)
+    return project
+
+
+class TestGitIgnore:
+    def rules(self, tmp_path, content, base=''):
+        gitignore = tmp_path / '.gitignore'
+        gitignore.write_text(content)
+        return GitIgnore().extend(base, str(gitignore))
+
+    def test_name_pattern(self, tmp_path):
+        ignore = self.rules(tmp_path, '# comment\n\nbuild*\n')
+
+        assert ignore.ignored('build', is_dir=True)
+        assert ignore.ignored('src/build-output', is_dir=True)
+        assert not ignore.ignored('src', is_dir=True)
+
+    def test_anchored_pattern(self, tmp_path):
+        ignore = self.rules(tmp_path, '/tmp\ndocs/generated\n')
+
+        assert ignore.ignored('tmp', is_dir=True)
+        assert not ignore.ignored('src/tmp', is_dir=True)
+        assert ignore.ignored('docs/generated', is_dir=True)
+
+    def test_dir_only_pattern(self, tmp_path):
+        ignore = self.rules(tmp_path, 'output/\n')
+
+        assert ignore.ignored('output', is_dir=True)
+        assert not ignore.ignored('output', is_dir=False)
+
+    def test_negation(self, tmp_path):
+        ignore = self.rules(tmp_path, 'deploy*\n!deploy-configs\n')
+
+        assert ignore.ignored('deploy-old', is_dir=True)
+        assert not ignore.ignored('deploy-configs', is_dir=True)
+
+    def test_rules_of_nested_folder(self, tmp_path):
+        ignore = self.rules(tmp_path, 'local\n', base='services')
+
+        assert ignore.ignored('services/local', is_dir=True)
+        assert not ignore.ignored('local', is_dir=True)
+
+
+class TestWalk:
+    def test_finds_configs_like_rglob(self, project):
+        touch_config(project, 'mantis.json')
+        touch_config(project, 'configs/a/mantis.json')
+        touch_config(project, 'configs/b/mantis.json')
+
+        paths, _ = walk()
+
+        assert paths == sorted(str(p) for p in Path('.').rglob('mantis.json'))
+
+    def test_prunes_dependency_and_vcs_folders(self, project):
+        touch_config(project, 'configs/mantis.json')
+        touch_config(project, 'node_modules/package/mantis.json')
+        touch_config(project, '.git/mantis.json')
+        touch_config(project, 'env/lib/mantis.json')
+        (project / 'env' / 'pyvenv.cfg').touch()
+
+        paths, visited = walk()
+
+        assert paths == ['configs/mantis.json']
+        assert 'node_modules' not in visited
+        assert 'env' not in visited
+
+    def test_honours_gitignore(self, project):
+        (project / '.gitignore').write_text('generated/\n')
+        touch_config(project, 'generated/mantis.json')
+        touch_config(project, 'configs/mantis.json')
+
+        assert walk()[0] == ['configs/mantis.json']
+
+    def test_max_depth(self, project):
+        touch_config(project, 'a/mantis.json')
+        touch_config(project, 'a/b/c/mantis.json')
+
+        assert walk(max_depth=2)[0] == ['a/mantis.json']
+        assert walk(max_depth=3)[0] == ['a/b/c/mantis.json', 'a/mantis.json']
+
+    def test_stops_at_level_where_stop_returns_true(self, project):
+        touch_config(project, 'a/mantis.json')
+        touch_config(project, 'a/b/mantis.json')
+
+        assert walk(stop=lambda paths: bool(paths))[0] == ['a/mantis.json']
+
+
+class TestDiscover:
+    def test_index_is_reused_while_folders_are_unchanged(self, project, monkeypatch):
+        touch_config(project, 'configs/mantis.json')
+        index_file = project.parent / 'index.json'
+
+        assert discover(index_file=index_file) == ['configs/mantis.json']
+
+        monkeypatch.setattr('mantis.discovery.walk', lambda *args: pytest.fail('index not used'))
+        assert discover(index_file=index_file) == ['configs/mantis.json']
+
+    def test_new_config_invalidates_index(self, project):
+        touch_config(project, 'configs/mantis.json')
+        index_file = project.parent / 'index.json'
+        discover(index_file=index_file)
+
+        touch_config(project, 'other/mantis.json')
+        os.utime(project, ns=(0, 0))
+
+        assert discover(index_file=index_file) == ['configs/mantis.json', 'other/mantis.json']
+
+
+class TestDiscoverConfigs:
+    def test_stops_once_environment_is_uniquely_matched(self, project):
+        touch_config(project, 'configs/mantis.json', {'production': 'ssh://host'})
+        touch_config(project, 'configs/legacy/mantis.json', {'production': 'ssh://legacy'})
+
+        assert discover_configs('production', ['deploy']) == ['configs/mantis.json']
+        assert discover_configs(None, ['deploy']) == ['configs/legacy/mantis.json', 'configs/mantis.json']
+
+    def test_depth_from_environment_variable(self, project, monkeypatch):
+        touch_config(project, 'a/b/mantis.json')
+        monkeypatch.setenv('MANTIS_CONFIG_DEPTH', '1')
+
+        assert discover_configs(None, []) == []
+
+    @pytest.mark.parametrize('depth', ['deep', '-1', '2.5'])
+    def test_invalid_depth(self, project, monkeypatch, depth):
+        monkeypatch.setenv('MANTIS_CONFIG_DEPTH', depth)
+
+        with pytest.raises(SystemExit):
+            discover_configs(None, [])
@@ -0,0 +1,334 @@
+"""Tests for encryption and decryption of environment files."""
+from base64 import b64encode
+
+import pytest
+from Crypto.Cipher import AES
+
+from mantis.cryptography import Crypto, CryptoSession
+from mantis.environment import Environment, SyncManifest
+from mantis.managers import BaseManager
+
+KEY = Crypto.generate_key(deterministically=True)
+
+
+def make_manager(folder, files):
+    env_folder = folder / 'stage'
+    env_folder.mkdir(parents=True)
+
+    for name, content in files.items():
+        (env_folder / name).write_text(content)
+
+    manager = BaseManager.__new__(BaseManager)
+    manager.KEY = KEY
+    manager.key_file = str(folder / 'mantis.key')
+    manager.encrypt_deterministically = True
+    manager.environment = Environment(environment_id='stage', folder=str(folder))
+    return manager
+
+
+def encrypt(manager):
+    """Encrypts all files, listing the environment again as a new mantis process would"""
+    manager.encrypt_env(params='force')
+    manager.environment = Environment(environment_id='stage', folder=manager.environment.folder)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return make_manager(tmp_path, {
+        f'service{index}.env': f'# service {index}\nNAME=service{index}\nSECRET=secret-{index}\n'
+        for index in range(8)
+    })
+
+
+def encrypt_legacy(data, key=KEY):
+    """Encrypts value in the legacy deterministic format, base64 of str(dict)"""
+    ciphertext, tag = AES.new(key.encode(), AES.MODE_SIV).encrypt_and_digest(data.encode())
+    return b64encode(str({"ciphertext": ciphertext, "tag": tag}).encode()).decode()
+
+
+class TestEnvelope:
+    @pytest.mark.parametrize('data', ['', 'value', "quotes ' and \" and \\ backslash", 'unicode ľščť'])
+    def test_round_trip(self, data):
+        secret = Crypto.encrypt(data, KEY, deterministically=True)
+
+        assert secret.startswith('A')
+        assert '=' not in secret
+        assert Crypto.decrypt(secret, KEY, deterministically=True) == data
+
+    def test_reads_legacy_format(self):
+        legacy = encrypt_legacy('secret-value')
+
+        assert Crypto.is_legacy(legacy)
+        assert Crypto.decrypt(legacy, KEY, deterministically=True) == 'secret-value'
+
+    def test_migrate_gives_same_value_as_encryption(self):
+        legacy = encrypt_legacy('secret-value')
+
+        assert Crypto.migrate(legacy) == Crypto.encrypt('secret-value', KEY, deterministically=True)
+        assert len(Crypto.migrate(legacy)) < len(legacy) / 2
+
+    def test_legacy_format_is_not_evaluated(self):
+        payload = b64encode(b"{'ciphertext': __import__('os').getcwd(), 'tag': b''}").decode()
+
+        with pytest.raises(SystemExit):
+            Crypto.decrypt(payload, KEY, deterministically=True)
+
+    def test_unknown_version(self):
+        with pytest.raises(SystemExit):
+            Crypto.decrypt(Crypto.pack(b'data', b'0' * 16).replace('A', 'B', 1), KEY, deterministically=True)
+
+
+class TestCryptoSession:
+    @pytest.mark.parametrize('deterministically', [True, False])
+    def test_batch_round_trip(self, deterministically):
+        key = Crypto.generate_key(deterministically)
+        session = Crypto.session(key if deterministically else key.decode(), deterministically)
+        values = [f'value-{index}' for index in range(20)]
+
+        secrets = session.encrypt_many(values)
+
+        assert session.decrypt_many(secrets) == values
+        assert [Crypto.decrypt(secret, session.key.decode(), deterministically) for secret in secrets] == values
+
+    def test_pycryptodome_fallback_gives_same_output(self):
+        session = Crypto.session(KEY, deterministically=True)
+        fallback = Crypto.session(KEY, deterministically=True)
+        fallback.siv = None
+
+        assert fallback.encrypt('value') == session.encrypt('value')
+        assert fallback.decrypt(session.encrypt('value')) == 'value'
+
+    def test_manager_builds_session_once(self, manager, monkeypatch):
+        sessions = []
+        session = Crypto.session
+        monkeypatch.setattr(Crypto, 'session', staticmethod(lambda *args: sessions.append(args) or session(*args)))
+
+        manager.encrypt_env(params='force')
+        manager.decrypt_env(return_value=True)
+
+        assert len(sessions) == 1
+
+
+class TestMigrateEncryption:
+    def test_rewrites_legacy_values(self, tmp_path, capsys):
+        manager = make_manager(tmp_path, {
+            'web.env': 'A=1\nB=2\n',
+            'web.env.encrypted': f'# web\nA={encrypt_legacy("1")}\nB={Crypto.encrypt("2", KEY, True)}\n',
+            'db.env': 'C=3\n',
+            'db.env.encrypted': f'C={Crypto.encrypt("3", KEY, True)}\n',
+        })
+
+        manager.migrate_encryption()
+
+        lines = Environment.read(manager.environment, str(tmp_path / 'stage' / 'web.env.encrypted'))
+        assert lines == ['# web', f'A={Crypto.encrypt("1", KEY, True)}', f'B={Crypto.encrypt("2", KEY, True)}']
+        assert 'Migrated 1 values in 1 of 2 files' in capsys.readouterr().out
+
+
+class TestEncryptEnv:
+    def test_force_encrypts_all_files(self, manager, capsys):
+        manager.encrypt_env(params='force')
+
+        for env_file in manager.environment.files:
+            lines = Environment.read(manager.environment, f'{env_file}.encrypted')
+            assert lines[0].startswith('# service')
+            assert manager.decrypt_lines(lines)[1] == manager.environment.load(env_file)
+
+        assert 'Encrypted 8 of 8 files, 0 already in sync, 0 failed' in capsys.readouterr().out
+
+    def test_force_skips_files_in_sync(self, manager, capsys):
+        manager.encrypt_env(params='force')
+        changed = manager.environment.files[0]
+
+        with open(changed, 'a') as file:
+            file.write('ADDED=1\n')
+
+        capsys.readouterr()
+        manager.encrypt_env(params='force')
+
+        assert 'Encrypted 1 of 8 files, 7 already in sync, 0 failed' in capsys.readouterr().out
+        assert manager.decrypt_env(env_file=changed, return_value=True)['ADDED'] == '1'
+
+    def test_force_reports_failed_files(self, manager, capsys):
+        encrypt(manager)
+        broken = manager.environment.files[0]
+
+        with open(f'{broken}.encrypted', 'w') as file:
+            file.write('SECRET=not-encrypted\n')
+
+        for env_file in manager.environment.files:
+            with open(env_file, 'w') as file:
+                file.write('SECRET=changed\n')
+
+        with pytest.raises(SystemExit):
+            manager.decrypt_env(params='force')
+
+        output = capsys.readouterr().out
+        assert 'Decrypted 7 of 8 files, 0 already in sync, 1 failed' in output
+        assert broken in output.replace('\n', '')
+
+
+class TestDecryptEnv:
+    def test_decrypts_each_file_once(self, manager, monkeypatch):
+        encrypt(manager)
+
+        for env_file in manager.environment.files:
+            with open(env_file, 'w') as file:
+                file.write('SECRET=changed\n')
+
+        calls = []
+        decrypt_value = CryptoSession.decrypt_value
+        monkeypatch.setattr(CryptoSession, 'decrypt_value', lambda session, secret: calls.append(secret) or decrypt_value(session, secret))
+
+        manager.decrypt_env(params='force')
+
+        # two variables in each of 8 files
+        assert len(calls) == 16
+        assert manager.environment.load(manager.environment.files[0])['NAME'].startswith('service')
+
+    def test_empty_encrypted_file_is_not_in_sync(self, tmp_path, capsys):
+        manager = make_manager(tmp_path, {'web.env': 'A=1\n', 'web.env.encrypted': '# no variables yet\n'})
+        env_file = manager.environment.files[0]
+
+        manager.decrypt_env(params='force')
+
+        assert 'Decrypted 1 of 1 files, 0 already in sync, 0 failed' in capsys.readouterr().out
+        assert manager.environment.load(env_file) == {}
+        assert manager.sync_manifest.in_sync(env_file)
+
+    def test_empty_environment_file_is_encrypted(self, tmp_path, capsys):
+        manager = make_manager(tmp_path, {'web.env': '', 'web.env.encrypted': f'A={Crypto.encrypt("1", KEY, True)}\n'})
+        env_file = manager.environment.files[0]
+
+        manager.encrypt_env(params='force')
+
+        assert 'Encrypted 1 of 1 files, 0 already in sync, 0 failed' in capsys.readouterr().out
+        assert manager.decrypt_env(env_file=env_file, return_value=True) == {}
+
+    def test_return_value(self, manager):
+        encrypt(manager)
+
+        values = manager.decrypt_env(return_value=True)
+
+        assert values['NAME'].startswith('service')
+
+
+class TestIncrementalEncryption:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        # non-deterministic encryption, every encryption of a value differs
+        manager = make_manager(tmp_path, {'web.env': 'A=1\nB=2\nC=3\n'})
+        manager.KEY = Crypto.generate_key().decode()
+        manager.encrypt_deterministically = False
+        return manager
+
+    def encrypted(self, manager):
+        return Environment.read(manager.environment, f'{manager.environment.files[0]}.encrypted')
+
+    def test_only_changed_variables_are_encrypted(self, manager):
+        manager.encrypt_env(params='force')
+        before = self.encrypted(manager)
+
+        with open(manager.environment.files[0], 'w') as file:
+            file.write('A=1\nB=changed\nC=3\nD=4\n')
+
+        manager.encrypt_env(params='force')
+        after = self.encrypted(manager)
+
+        assert after[0] == before[0]
+        assert after[1] != before[1]
+        assert after[2] == before[2]
+        assert manager.decrypt_env(env_file=manager.environment.files[0], return_value=True) == {'A': '1', 'B': 'changed', 'C': '3', 'D': '4'}
+
+    def test_full_encrypts_all_variables(self, manager):
+        manager.encrypt_env(params='force')
+        before = self.encrypted(manager)
+
+        manager.encrypt_env(params='force full')
+        after = self.encrypted(manager)
+
+        assert all(old != new for old, new in zip(before, after))
+
+    def test_undecryptable_file_is_encrypted_again(self, manager):
+        with open(f'{manager.environment.files[0]}.encrypted', 'w') as file:
+            file.write('A=garbage\n')
+
+        manager.encrypt_env(params='force')
+
+        assert manager.decrypt_env(env_file=manager.environment.files[0], return_value=True) == {'A': '1', 'B': '2', 'C': '3'}
+
+    @pytest.mark.parametrize('deterministically', [True, False])
+    def test_file_of_another_key_is_encrypted_again(self, tmp_path, deterministically, capsys):
+        manager = make_manager(tmp_path, {'web.env': 'A=1\nB=2\n'})
+        manager.encrypt_deterministically = deterministically
+        manager.KEY = Crypto.generate_key(deterministically) if deterministically else Crypto.generate_key().decode()
+        manager.encrypt_env(params='force')
+
+        # a new mantis process with the key changed
+        changed = make_manager(tmp_path / 'changed', {})
+        changed.environment = manager.environment
+        changed.encrypt_deterministically = deterministically
+        changed.KEY = Crypto.generate_key(deterministically) if deterministically else Crypto.generate_key().decode()
+        env_file = manager.environment.files[0]
+
+        assert changed.read_encrypted_values(f'{env_file}.encrypted') is None
+        assert changed.prepare_encryption(env_file) is not None
+
+        changed.encrypt_env(params='force')
+
+        assert 'Encrypted 1 of 1 files, 0 already in sync, 0 failed' in capsys.readouterr().out
+        assert changed.decrypt_env(env_file=env_file, return_value=True) == {'A': '1', 'B': '2'}
+
+
+class TestSyncManifest:
+    def test_in_sync_until_either_file_changes(self, tmp_path):
+        env_file = tmp_path / 'web.env'
+        env_file.write_text('A=1\n')
+        (tmp_path / 'web.env.encrypted').write_text('A=encrypted\n')
+
+        manifest = SyncManifest(str(tmp_path), KEY)
+        assert not manifest.in_sync(str(env_file))
+
+        manifest.record(str(env_file))
+        assert SyncManifest(str(tmp_path), KEY).in_sync(str(env_file))
+
+        env_file.write_text('A=2\n')
+        assert not manifest.in_sync(str(env_file))
+
+    def test_hashes_are_keyed(self, tmp_path):
+        env_file = tmp_path / 'web.env'
+        env_file.write_text('A=1\n')
+        (tmp_path / 'web.env.encrypted').write_text('A=encrypted\n')
+        SyncManifest(str(tmp_path), KEY).record(str(env_file))
+
+        other_key = Crypto.generate_key(deterministically=True)
+        assert not SyncManifest(str(tmp_path), other_key).in_sync(str(env_file))
+
+    def test_corrupted_manifest_is_ignored(self, tmp_path):
+        (tmp_path / SyncManifest.FILENAME).write_text('{broken')
+
+        assert SyncManifest(str(tmp_path), KEY).entries == {}
+
+    def test_unchanged_files_are_not_decrypted(self, manager, monkeypatch, capsys):
+        encrypt(manager)
+        manager._sync_manifest = None
+
+        monkeypatch.setattr(CryptoSession, 'decrypt_value', lambda session, secret: pytest.fail('decrypted'))
+
+        manager.encrypt_env(params='force')
+        manager.decrypt_env(params='force')
+        manager.check_env()
+
+        assert 'Encrypted 0 of 8 files, 8 already in sync, 0 failed' in capsys.readouterr().out
+
+    def test_stale_manifest_falls_back_to_decryption(self, manager, capsys):
+        encrypt(manager)
+        changed = manager.environment.files[0]
+
+        with open(f'{changed}.encrypted', 'a') as file:
+            file.write('# comment\n')
+
+        manager.encrypt_env(params='force')
+
+        assert 'Encrypted 0 of 8 files, 8 already in sync, 0 failed' in capsys.readouterr().out
+        assert manager.sync_manifest.in_sync(changed)
@@ -0,0 +1,203 @@
+"""Tests for the Docker Engine API client used for read-only queries."""
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from mantis.engine import (
+    DockerEngine, EngineError, demultiplex, inventory_from_engine, format_ports,
+    human_size, bytes_size, human_duration, cpu_percent, memory_usage,
+)
+from mantis.managers import BaseManager
+
+CONTAINERS = [
+    {
+        'Names': ['/itfitness-app-2'],
+        'State': 'running',
+        'Status': 'Up 2 hours',
+        'Labels': {
+            'com.docker.compose.project': 'itfitness',
+            'com.docker.compose.service': 'app',
+            'com.docker.compose.container-number': '2',
+        },
+    },
+    {'Names': ['/portainer'], 'State': 'exited', 'Status': 'Exited (0) 1 hour ago', 'Labels': {}},
+]
+
+
+class TestDockerEngine:
+    """Tests for requests sent to the daemon."""
+
+    def test_requests_share_a_kept_alive_connection(self, daemon):
+        daemon.routes['/containers/json'] = (200, CONTAINERS)
+        daemon.routes['/version'] = (200, {'Version': '27.0.1'})
+        engine = DockerEngine(daemon.server_address)
+
+        engine.containers()
+        engine.containers()
+        assert engine.version()['Version'] == '27.0.1'
+
+        assert daemon.connections == 1
+        assert daemon.requests[0] == '/containers/json?all=1&size=0'
+
+    def test_missing_container(self, daemon):
+        assert DockerEngine(daemon.server_address).inspect_container('unknown') is None
+
+    def test_error_message(self, daemon):
+        daemon.routes['/images/json'] = (500, {'message': 'daemon is busy'})
+
+        with pytest.raises(EngineError, match='daemon is busy') as e:
+            DockerEngine(daemon.server_address).images()
+
+        assert e.value.status == 500
+
+    def test_unreachable_socket(self, tmp_path):
+        with pytest.raises(EngineError, match='not reachable'):
+            DockerEngine(str(tmp_path / 'missing.sock')).version()
+
+    def test_health_status(self, daemon):
+        daemon.routes['/containers/itfitness-app-2/json'] = (200, {'State': {'Health': {'Status': 'healthy'}}})
+        daemon.routes['/containers/portainer/json'] = (200, {'State': {}})
+        engine = DockerEngine(daemon.server_address)
+
+        assert engine.health_status('itfitness-app-2') == 'healthy'
+        assert engine.health_status('portainer') is None
+
+    def test_logs(self, daemon, frame):
+        daemon.routes['/containers/itfitness-app-2/logs'] = (200, frame(1, b'ready\n') + frame(2, b'warning\n'))
+
+        assert DockerEngine(daemon.server_address).logs('itfitness-app-2', tail=10) == 'ready\nwarning\n'
+        assert 'tail=10' in daemon.requests[0]
+
+
+class TestFormatting:
+    """The engine renders values the same way the docker CLI prints them."""
+
+    def test_demultiplex_leaves_tty_output_alone(self):
+        assert demultiplex(b'plain output\n') == b'plain output\n'
+
+    def test_inventory(self):
+        inventory = inventory_from_engine(CONTAINERS)
+        app = inventory.get('itfitness-app-2')
+
+        assert (app.project, app.service, app.number, app.is_running) == ('itfitness', 'app', 2, True)
+        assert inventory.get('portainer').project is None
+
+    def test_ports(self):
+        ports = [
+            {'IP': '::', 'PrivatePort': 80, 'PublicPort': 8080, 'Type': 'tcp'},
+            {'IP': '0.0.0.0', 'PrivatePort': 80, 'PublicPort': 8080, 'Type': 'tcp'},
+            {'PrivatePort': 5432, 'Type': 'tcp'},
+        ]
+
+        assert format_ports(ports) == '0.0.0.0:8080->80/tcp, [::]:8080->80/tcp, 5432/tcp'
+
+    def test_sizes(self):
+        assert human_size(0) == '0B'
+        assert human_size(123456789, precision=3) == '123MB'
+        assert bytes_size(13107200) == '12.5MiB'
+
+    def test_durations(self):
+        assert human_duration(0.5) == 'Less than a second'
+        assert human_duration(90) == 'About a minute'
+        assert human_duration(3 * 3600) == '3 hours'
+        assert human_duration(21 * 24 * 3600) == '3 weeks'
+
+    def test_stats(self):
+        stats = {
+            'cpu_stats': {'cpu_usage': {'total_usage': 300}, 'system_cpu_usage': 2000, 'online_cpus': 2},
+            'precpu_stats': {'cpu_usage': {'total_usage': 100}, 'system_cpu_usage': 1000},
+            'memory_stats': {'usage': 15 * 1024 ** 2, 'limit': 2 * 1024 ** 3, 'stats': {'inactive_file': 5 * 1024 ** 2}},
+        }
+
+        assert cpu_percent(stats) == '40.00%'
+        assert memory_usage(stats) == '10MiB / 2GiB'
+
+
+class TunnelledManager(BaseManager):
+    """Talks to docker through a tunnel which is already open."""
+    docker_connection = ''
+
+
+class TestManagerEngine:
+    """Read-only manager queries go through the engine when enabled."""
+
+    @staticmethod
+    def _manager(socket_path, engine_api=True):
+        manager = TunnelledManager.__new__(TunnelledManager)
+        manager.config = {'tunnel': {'engine_api': engine_api}}
+        manager.dry_run = False
+        manager.docker = MagicMock(return_value='')
+        manager.project_services = lambda: {'itfitness': ['app']}
+        manager.docker_connection = f'DOCKER_HOST="unix://{socket_path}"'
+        return manager
+
+    def test_containers_listed_through_the_engine(self, daemon):
+        daemon.routes['/containers/json'] = (200, CONTAINERS)
+        manager = self._manager(daemon.server_address)
+
+        assert manager.get_containers() == ['itfitness-app-2']
+        manager.docker.assert_not_called()
+
+    def test_disabled_by_default(self, daemon):
+        manager = self._manager(daemon.server_address, engine_api=False)
+
+        manager.get_containers()
+
+        manager.docker.assert_called_once()
+        assert daemon.requests == []
+
+    def test_falls_back_to_cli_when_daemon_fails(self, tmp_path):
+        manager = self._manager(str(tmp_path / 'missing.sock'))
+
+        manager.get_containers()
+        manager.get_container_inventory(refresh=True)
+
+        # the engine is given up after the first failure
+        assert manager.docker.call_count == 2
+        assert manager.engine is None
+
+    def test_forked_process_opens_its_own_connection(self, daemon):
+        daemon.routes['/containers/json'] = (200, CONTAINERS)
+        manager = self._manager(daemon.server_address)
+        manager.get_container_inventory()
+
+        pid = os.fork()
+
+        if pid == 0:
+            manager.forget_engine()
+            manager.get_container_inventory(refresh=True)
+            os._exit(0)
+
+        assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+        assert daemon.connections == 2
+        assert len(daemon.requests) == 2
+
+    def test_networks_listed_with_two_requests(self, daemon):
+        daemon.routes['/networks'] = (200, [
+            {'Id': 'a' * 64, 'Name': 'itfitness_default', 'Driver': 'bridge', 'Scope': 'local'},
+            {'Id': 'b' * 64, 'Name': 'host', 'Driver': 'host', 'Scope': 'local'},
+        ])
+        daemon.routes['/containers/json'] = (200, [
+            dict(CONTAINERS[0], NetworkSettings={'Networks': {'itfitness_default': {'NetworkID': 'a' * 64}}}),
+        ])
+        manager = self._manager(daemon.server_address)
+
+        assert manager.get_networks() == [
+            {'ID': 'a' * 12, 'Name': 'itfitness_default', 'Driver': 'bridge', 'Scope': 'local', 'Containers': ['itfitness-app-2']},
+            {'ID': 'b' * 12, 'Name': 'host', 'Driver': 'host', 'Scope': 'local', 'Containers': []},
+        ]
+        assert [request.split('?')[0] for request in daemon.requests] == ['/networks', '/containers/json']
+        manager.docker.assert_not_called()
+
+    def test_healthcheck_queries(self, daemon):
+        daemon.routes['/containers/itfitness-app-2/json'] = (200, {
+            'Config': {'Healthcheck': {'Test': ['CMD', 'true'], 'StartPeriod': 2000000000}},
+            'State': {'Health': {'Status': 'starting'}},
+        })
+        manager = self._manager(daemon.server_address)
+
+        assert manager.get_healthcheck_start_period('itfitness-app-2') == 2
+        assert manager.check_health('itfitness-app-2') == (False, 'starting')
+        manager.docker.assert_not_called()
+        assert daemon.connections == 1
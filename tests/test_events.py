@@ -0,0 +1,124 @@
+"""Tests for waiting on health status events instead of polling."""
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+from mantis.events import HealthEventStream
+from mantis.managers import BaseManager
+
+
+def _event(name, status):
+    return json.dumps({
+        'Type': 'container',
+        'Action': f'health_status: {status}',
+        'Actor': {'ID': 'abc', 'Attributes': {'name': name, 'image': 'acme/app'}},
+    })
+
+
+def _stream_command(*events, then='sleep 5'):
+    """Shell command printing given events like "docker events" does, then staying subscribed."""
+    lines = ''.join(f"echo '{event}'; " for event in events)
+    return f'{lines}{then}'
+
+
+def _manager(command, statuses=None):
+    manager = BaseManager.__new__(BaseManager)
+    manager.config = {'healthcheck': {'mode': 'events'}}
+    manager.dry_run = False
+    manager.commands = []
+
+    def build_docker_command(docker_command, use_connection=True):
+        manager.commands.append(docker_command)
+        return command
+
+    manager.build_docker_command = build_docker_command
+    manager.check_health = MagicMock(side_effect=lambda container: (statuses or {}).get(container, (False, 'starting')))
+    manager.get_healthcheck_config = lambda container: {'Test': ['CMD', 'true'], 'Interval': 100000000, 'Retries': 10}
+    return manager
+
+
+class TestHealthEventStream:
+    """Tests for reading the event stream."""
+
+    def test_parse(self):
+        assert HealthEventStream.parse(_event('web-1', 'healthy')) == ('web-1', 'healthy')
+        assert HealthEventStream.parse(_event('web-1', 'starting')) is None
+        assert HealthEventStream.parse('not json') is None
+        assert HealthEventStream.parse(json.dumps({'Action': 'start'})) is None
+
+    def test_ended_stream(self):
+        with HealthEventStream(_stream_command(_event('web-1', 'healthy'), then='true')) as events:
+            assert events.get(timeout=5) == ('web-1', 'healthy')
+            assert events.get(timeout=5) is None
+            assert events.finished
+
+
+class TestWaitForHealthEvents:
+    """The manager subscribes once and returns as soon as every container reported."""
+
+    def test_returns_on_reported_status(self):
+        manager = _manager(_stream_command(_event('web-2', 'unhealthy'), _event('web-1', 'healthy')))
+
+        start = time.monotonic()
+        results = manager.wait_for_health_events(['web-1', 'web-2'], timeout=30)
+
+        assert results == {'web-1': True, 'web-2': False}
+        # the stream stays subscribed for 5 seconds, the wait does not
+        assert time.monotonic() - start < 4
+
+    def test_single_subscription_for_all_containers(self):
+        manager = _manager(_stream_command(_event('web-1', 'healthy'), _event('web-2', 'healthy')))
+
+        manager.wait_for_health_events(['web-1', 'web-2'], timeout=30)
+
+        assert len(manager.commands) == 1
+        assert '--filter event=health_status' in manager.commands[0]
+        assert '--filter container=web-1 --filter container=web-2' in manager.commands[0]
+
+    def test_already_healthy_container(self):
+        """A container healthy before the subscription started reports no more events."""
+        manager = _manager(_stream_command(), statuses={'web-1': (True, 'healthy')})
+
+        assert manager.wait_for_health_events(['web-1'], timeout=30) == {'web-1': True}
+
+    def test_timeout(self):
+        manager = _manager(_stream_command(_event('other', 'healthy')))
+
+        assert manager.wait_for_health_events(['web-1'], timeout=0.5) == {'web-1': None}
+
+    def test_ignores_events_of_other_containers(self):
+        manager = _manager(_stream_command(_event('other', 'unhealthy'), _event('web-1', 'healthy')))
+
+        assert manager.wait_for_health_events(['web-1'], timeout=30) == {'web-1': True}
+
+    def test_polls_once_stream_ended(self):
+        """docker events failing does not leave the containers unreported."""
+        statuses = {'web-1': (False, 'starting')}
+        manager = _manager(_stream_command(then='true'), statuses=statuses)
+        threading.Timer(0.3, lambda: statuses.update({'web-1': (True, 'healthy')})).start()
+
+        assert manager.wait_for_health_events(['web-1'], timeout=30) == {'web-1': True}
+
+
+class TestHealthcheckContainersWithEvents:
+    """New containers of a zero-downtime deployment share a single subscription."""
+
+    def test_single_subscription(self):
+        manager = _manager(_stream_command(*[_event(f'web-{number}', 'healthy') for number in (1, 2, 3)]))
+
+        results = manager.healthcheck_containers(['web-1', 'web-2', 'web-3'])
+
+        assert results == {'web-1': True, 'web-2': True, 'web-3': True}
+        assert len(manager.commands) == 1
+        assert '--filter container=web-1 --filter container=web-2 --filter container=web-3' in manager.commands[0]
+
+    def test_unhealthy_container_fails_fast(self):
+        manager = _manager(_stream_command(_event('web-1', 'unhealthy')))
+
+        start = time.monotonic()
+        results = manager.healthcheck_containers(['web-1', 'web-2'])
+
+        assert results['web-1'] is False
+        assert not results['web-2']
+        assert time.monotonic() - start < 4
@@ -0,0 +1,123 @@
+"""Tests for running a command chain in many environments at once."""
+import sys
+
+import pytest
+
+from mantis.command_line import is_multi_environment
+from mantis.fanout import FanOut
+from mantis.managers import resolve_environments
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    for environment in ['client-a', 'client-b', 'internal']:
+        (tmp_path / 'environments' / environment).mkdir(parents=True)
+
+    return str(tmp_path / 'mantis.json')
+
+
+CONFIG = {
+    'environment': {'folder': '<MANTIS>/environments'},
+    'connections': {
+        'client-a': 'ssh://deploy@a.example.com',
+        'client-b': 'ssh://deploy@b.example.com',
+        'client-c': 'ssh://deploy@c.example.com',
+        'internal': 'ssh://deploy@internal.example.com',
+    },
+}
+
+
+class TestResolveEnvironments:
+    """-e accepts a comma separated list of environments, prefixes and globs."""
+
+    def test_is_multi_environment(self):
+        assert is_multi_environment('client-*')
+        assert is_multi_environment('client-a,internal')
+        assert not is_multi_environment('client-a')
+        assert not is_multi_environment(None)
+
+    def test_many_environments_are_not_forwarded_to_a_daemon(self, monkeypatch):
+        from mantis import command_line, daemon
+
+        chains = []
+        monkeypatch.setattr(daemon, 'forward', lambda *args: pytest.fail('forwarded to a daemon'))
+        monkeypatch.setattr(command_line, 'run_environments', lambda *args: chains.append(args))
+        monkeypatch.setattr(sys, 'argv', ['mantis', '-e', 'client-*', 'status'])
+
+        command_line.run()
+
+        assert chains == [(['-e', 'client-*'], [['status']])]
+
+    def test_glob(self, config_file):
+        assert resolve_environments('client-*', CONFIG, config_file, command='deploy') == ['client-a', 'client-b', 'client-c']
+
+    def test_list_keeps_order(self, config_file):
+        assert resolve_environments('internal,client-b', CONFIG, config_file, command='deploy') == ['internal', 'client-b']
+
+    def test_prefixes_and_duplicates(self, config_file):
+        assert resolve_environments('int,client-*,client-a', CONFIG, config_file, command='status') == ['internal', 'client-a', 'client-b', 'client-c']
+
+    def test_secrets_command_uses_folders(self, config_file):
+        assert resolve_environments('client-*', CONFIG, config_file, command='encrypt-env') == ['client-a', 'client-b']
+
+    def test_no_match(self, config_file):
+        with pytest.raises(SystemExit):
+            resolve_environments('staging-*', CONFIG, config_file, command='deploy')
+
+    def test_single_connection_mode(self, config_file):
+        with pytest.raises(SystemExit):
+            resolve_environments('client-*', {'connection': 'ssh://deploy@example.com'}, config_file)
+
+
+class ScriptedFanOut(FanOut):
+    """Runs a python snippet per environment instead of mantis, finishing commands until it fails."""
+
+    failing = {}
+
+    def build_command(self, environment):
+        commands = [group[0] for group in self.cmd_groups]
+        failing = self.failing.get(environment)
+        script = (
+            'import sys\n'
+            'from mantis.fanout import command_finished\n'
+            f'for command in {commands!r}:\n'
+            f'    print(command, "in", {environment!r})\n'
+            f'    if command == {failing!r}: sys.exit(3)\n'
+            '    command_finished(command)\n'
+        )
+        return [sys.executable, '-c', script]
+
+
+class TestFanOut:
+    """Each environment runs in its own process, reporting which commands of the chain finished."""
+
+    def test_build_command(self):
+        fan_out = FanOut(['client-a'], ['--dry-run'], [['build', 'web'], ['deploy']])
+
+        assert fan_out.build_command('client-a')[1:] == ['-m', 'mantis.command_line', '--dry-run', '-e', 'client-a', 'build', 'web', '+', 'deploy']
+
+    def test_trace_file_per_environment(self):
+        fan_out = FanOut(['client-a', 'client-b'], ['--trace', 'traces/deploy.json'], [['deploy']])
+
+        assert '--trace' in fan_out.build_command('client-a')
+        assert fan_out.build_command('client-a')[4] == 'traces/deploy.client-a.json'
+        assert fan_out.build_command('client-b')[4] == 'traces/deploy.client-b.json'
+
+    def test_results(self, capsys):
+        fan_out = ScriptedFanOut(['client-a', 'client-b', 'client-c'], [], [['build'], ['push'], ['deploy']], parallel=2)
+        fan_out.failing = {'client-b': 'push'}
+
+        results = fan_out.run()
+
+        assert list(results) == ['client-a', 'client-b', 'client-c']
+        assert results['client-a'].exit_code == 0
+        assert results['client-a'].finished_commands == ['build', 'push', 'deploy']
+        assert results['client-b'].exit_code == 3
+        assert results['client-b'].finished_commands == ['build']
+
+        output = capsys.readouterr().out
+        assert 'client-b | push in client-b' in output
+        assert 'client-a | deploy in client-a' in output
+
+        fan_out.print_matrix(results)
+        assert '2 of 3 environments succeeded, failed: client-b' in capsys.readouterr().out
@@ -0,0 +1,178 @@
+"""Tests for health-checking new containers at once and rolling them out in batches."""
+import threading
+import time
+
+import pytest
+
+from mantis.inventory import ContainerInfo, ContainerInventory
+from mantis.managers import BaseManager
+
+
+def _manager(health, retries=10):
+    """
+    A manager whose containers report statuses given by callables,
+    polled every 10 ms (an interval of 100 ms split by ten).
+    """
+    manager = BaseManager.__new__(BaseManager)
+    manager.config = {}
+    manager.dry_run = False
+    manager.removed = []
+    manager.get_healthcheck_config = lambda container: {'Test': ['CMD', 'true'], 'Interval': 100000000, 'Retries': retries}
+    manager.check_health = lambda container: health[container]()
+    manager.stop_container = lambda container: None
+    manager.remove_container = lambda container: manager.removed.append(container)
+    return manager
+
+
+class TestHealthcheckContainers:
+    """New containers start up in parallel, so they are waited for in parallel too."""
+
+    def test_containers_are_checked_concurrently(self):
+        # each check blocks until all three containers are being checked at the same time
+        barrier = threading.Barrier(3, timeout=5)
+
+        def healthy():
+            barrier.wait()
+            return True, 'healthy'
+
+        manager = _manager({'web-1': healthy, 'web-2': healthy, 'web-3': healthy})
+
+        assert manager.healthcheck_containers(['web-1', 'web-2', 'web-3']) == {'web-1': True, 'web-2': True, 'web-3': True}
+
+    def test_fails_fast(self):
+        """Once a container is unhealthy, the others are not waited for any longer."""
+        manager = _manager({
+            'web-1': lambda: (False, 'unhealthy'),
+            'web-2': lambda: (False, 'starting'),
+        })
+        manager.get_healthcheck_config = lambda container: {
+            'Test': ['CMD', 'true'],
+            'Interval': 100000000,
+            # web-2 would keep starting for 100 seconds
+            'Retries': 1 if container == 'web-1' else 1000,
+        }
+
+        start = time.monotonic()
+        results = manager.healthcheck_containers(['web-1', 'web-2'])
+
+        # web-2 was not checked to the end, so it is not blamed
+        assert results == {'web-1': False, 'web-2': None}
+        assert time.monotonic() - start < 5
+
+    def test_cancelled_containers_are_reported_apart(self, capsys):
+        manager = _manager({
+            'web-1': lambda: (False, 'unhealthy'),
+            'web-2': lambda: (False, 'starting'),
+            'web-3': lambda: (False, 'starting'),
+        })
+        manager.get_healthcheck_config = lambda container: {
+            'Test': ['CMD', 'true'],
+            'Interval': 100000000,
+            'Retries': 1 if container == 'web-1' else 1000,
+        }
+
+        results = manager.healthcheck_containers(['web-1', 'web-2', 'web-3'])
+
+        assert [container for container, is_healthy in results.items() if is_healthy is False] == ['web-1']
+        assert 'cancelled once another container failed: web-2, web-3' in capsys.readouterr().out.replace('\n', '')
+
+    def test_container_without_start_period(self):
+        """Every container lacking both a healthcheck and a start period is removed before exiting."""
+        manager = _manager({'web-1': lambda: (True, 'healthy')})
+        manager.get_healthcheck_config = lambda container: None
+
+        with pytest.raises(SystemExit):
+            manager.healthcheck_containers(['web-1', 'web-2'])
+
+        assert sorted(manager.removed) == ['web-1', 'web-2']
+
+    def test_start_period(self):
+        manager = _manager({})
+        manager.get_healthcheck_config = lambda container: {'Test': ['NONE'], 'StartPeriod': 10000000}
+
+        assert manager.healthcheck_containers(['web-1']) == {'web-1': None}
+
+
+class TestRollingUpdate:
+    """Rolling updates replace containers in batches without dropping below capacity."""
+
+    @staticmethod
+    def _manager(replicas):
+        manager = BaseManager.__new__(BaseManager)
+        manager.config = {}
+        manager.containers = [ContainerInfo(f'itfitness-app-{n}', 'running', '', 'itfitness', 'app', n) for n in range(1, replicas + 1)]
+        manager.scales = []
+        manager.reloads = 0
+        manager.capacity = []
+
+        def scale(service, scale):
+            manager.scales.append(scale)
+            number = max(c.number for c in manager.containers)
+
+            for n in range(number + 1, number + 1 + scale - len(manager.containers)):
+                manager.containers.append(ContainerInfo(f'itfitness-app-{n}', 'running', '', 'itfitness', 'app', n))
+
+        def remove_container(container, force=False):
+            manager.containers = [c for c in manager.containers if c.name != container]
+            manager.capacity.append(len(manager.containers))
+
+        def reload():
+            manager.reloads += 1
+
+        manager.get_container_name = lambda service: 'itfitness-app'
+        manager.get_project_inventory = lambda: ContainerInventory(manager.containers)
+        manager.scale = scale
+        manager.stop_container = lambda container: None
+        manager.remove_container = remove_container
+        manager.rename_container = lambda container, new_name: None
+        manager.remove_suffixes = lambda prefix='': None
+        manager.try_to_reload_webserver = reload
+        manager.healthcheck_containers = lambda containers: {container: True for container in containers}
+        return manager
+
+    def test_batches(self):
+        manager = self._manager(4)
+
+        assert manager.rolling_update('app', max_surge=2)
+
+        assert manager.scales == [6, 6]
+        # once per batch and once after renaming
+        assert manager.reloads == 3
+        assert min(manager.capacity) == 4
+        assert [c.number for c in manager.containers] == [5, 6, 7, 8]
+
+    def test_one_at_a_time_by_default(self):
+        manager = self._manager(2)
+
+        assert manager.rolling_update('app')
+
+        assert manager.scales == [3, 3]
+
+    def test_max_unavailable(self):
+        manager = self._manager(4)
+
+        assert manager.rolling_update('app', max_surge=1, max_unavailable=1)
+
+        assert manager.scales == [5, 5]
+        assert min(manager.capacity) == 3
+
+    def test_nothing_to_do_per_batch(self):
+        with pytest.raises(SystemExit):
+            self._manager(2).rolling_update('app', max_surge=0)
+
+    def test_no_new_containers_started(self):
+        manager = self._manager(2)
+        manager.scale = lambda service, scale: manager.scales.append(scale)
+
+        assert not manager.rolling_update('app', max_surge=1)
+
+        # the old containers were kept, none of them was taken for a new one
+        assert [c.number for c in manager.containers] == [1, 2]
+
+    def test_no_containers_left_after_max_unavailable(self):
+        manager = self._manager(1)
+        manager.scale = lambda service, scale: manager.scales.append(scale)
+
+        assert not manager.rolling_update('app', max_surge=0, max_unavailable=1)
+
+        assert manager.containers == []
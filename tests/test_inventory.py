@@ -0,0 +1,214 @@
+"""Tests for the container inventory read from a single docker call."""
+from unittest.mock import MagicMock
+
+from mantis.inventory import ContainerInventory, INVENTORY_FORMAT
+from mantis.managers import BaseManager
+
+
+def _line(name, state='running', status='Up 2 hours', project='itfitness', service='app', number='1'):
+    return '\t'.join([name, state, status, project, service, number])
+
+
+OUTPUT = '\n'.join([
+    _line('itfitness-app-2', number='2'),
+    _line('itfitness-app-1'),
+    _line('itfitness-db', state='exited', status='Exited (0) 1 hour ago', service='db'),
+    _line('portainer', project='', service='', number=''),
+    '',
+])
+
+
+class TestParse:
+    """Tests for parsing the tab separated docker output."""
+
+    def test_reads_compose_labels(self):
+        """Project, service and container number come from compose labels."""
+        container = ContainerInventory.parse(OUTPUT).get('itfitness-app-2')
+
+        assert container.project == 'itfitness'
+        assert container.service == 'app'
+        assert container.number == 2
+        assert container.status == 'Up 2 hours'
+
+    def test_missing_labels_are_none(self):
+        """A container started outside compose belongs to no project, not to an unnamed one."""
+        container = ContainerInventory.parse(OUTPUT).get('portainer')
+
+        assert container.project is None
+        assert container.service is None
+        assert container.number is None
+
+    def test_keeps_docker_order_and_skips_blank_lines(self):
+        inventory = ContainerInventory.parse(OUTPUT)
+
+        assert inventory.names() == ['itfitness-app-2', 'itfitness-app-1', 'itfitness-db', 'portainer']
+
+    def test_empty_output(self):
+        """Dry run returns no output at all."""
+        assert len(ContainerInventory.parse('')) == 0
+        assert len(ContainerInventory.parse(None)) == 0
+
+    def test_format_reads_labels_one_by_one(self):
+        """{{.Labels}} joins label values with commas, which compose values contain as well."""
+        assert '{{.Label "com.docker.compose.project"}}' in INVENTORY_FORMAT
+        assert '.Labels' not in INVENTORY_FORMAT
+
+
+class TestFilter:
+    """Tests for filtering the inventory."""
+
+    def test_only_running(self):
+        """Paused containers are listed by "container ls" without -a too."""
+        inventory = ContainerInventory.parse('\n'.join([
+            _line('a', state='running'),
+            _line('b', state='paused'),
+            _line('c', state='exited'),
+            _line('d', state='created'),
+        ]))
+
+        assert inventory.names(only_running=True) == ['a', 'b']
+
+    def test_projects_prefix_and_exclude(self):
+        inventory = ContainerInventory.parse(OUTPUT)
+
+        assert inventory.names(projects=['itfitness']) == ['itfitness-app-2', 'itfitness-app-1', 'itfitness-db']
+        assert inventory.names(projects=['itfitness'], prefix='itfitness-app') == ['itfitness-app-2', 'itfitness-app-1']
+        assert inventory.names(prefix='itfitness-app', exclude=['itfitness-app-2']) == ['itfitness-app-1']
+
+    def test_service(self):
+        assert ContainerInventory.parse(OUTPUT).names(service='db') == ['itfitness-db']
+
+    def test_newest_uses_container_number(self):
+        """"app-10" is newer than "app-9", although it sorts before it as a string."""
+        inventory = ContainerInventory.parse('\n'.join([
+            _line('itfitness-app-9', number='9'),
+            _line('itfitness-app-10', number='10'),
+        ]))
+
+        assert inventory.newest().name == 'itfitness-app-10'
+
+    def test_newest_of_nothing(self):
+        assert ContainerInventory().newest() is None
+
+
+class TestManagerInventory:
+    """The manager lists project containers without inspecting each of them."""
+
+    @staticmethod
+    def _manager(output):
+        manager = BaseManager.__new__(BaseManager)
+        manager.config = {}
+        manager.dry_run = False
+        manager.docker = MagicMock(return_value=output)
+        manager.project_services = lambda: {'itfitness': ['app', 'db']}
+        return manager
+
+    def test_get_containers_uses_a_single_docker_call(self):
+        manager = self._manager(OUTPUT)
+
+        assert manager.get_containers() == ['itfitness-app-2', 'itfitness-app-1', 'itfitness-db']
+        manager.docker.assert_called_once()
+        assert manager.docker.call_args[0][0].startswith('container ls -a --format')
+
+    def test_get_containers_filters(self):
+        manager = self._manager(OUTPUT)
+
+        assert manager.get_containers(prefix='itfitness-app', exclude=['itfitness-app-1']) == ['itfitness-app-2']
+        assert manager.get_containers(only_running=True) == ['itfitness-app-2', 'itfitness-app-1']
+
+    def test_get_container_project(self):
+        manager = self._manager(OUTPUT)
+
+        assert manager.get_container_project('itfitness-db') == 'itfitness'
+        assert manager.get_container_project('portainer') is None
+        assert manager.get_container_project('unknown') is None
+
+
+class TestInventoryCache:
+    """Containers are listed once per run and kept up to date by helpers changing them."""
+
+    @staticmethod
+    def _manager():
+        manager = BaseManager.__new__(BaseManager)
+        manager.config = {}
+        manager.dry_run = False
+        manager.listings = 0
+        manager.commands = []
+
+        def docker(command, return_output=False, **kwargs):
+            if command.startswith('container ls'):
+                manager.listings += 1
+                return OUTPUT
+
+            manager.commands.append(command)
+
+        manager.docker = docker
+        manager.docker_compose = lambda command, **kwargs: manager.commands.append(f'compose {command}')
+        manager.project_services = lambda: {'itfitness': ['app', 'db']}
+        return manager
+
+    def test_listed_once(self):
+        manager = self._manager()
+
+        manager.get_containers()
+        manager.get_containers(prefix='itfitness-app')
+        manager.get_containers(only_running=True)
+
+        assert manager.listings == 1
+
+    def test_refresh(self):
+        manager = self._manager()
+
+        manager.get_containers()
+        manager.get_container_inventory(refresh=True)
+
+        assert manager.listings == 2
+
+    def test_removed_container_is_forgotten(self):
+        manager = self._manager()
+        manager.get_containers()
+
+        manager.remove_container('itfitness-app-1')
+
+        assert manager.commands == ['container rm itfitness-app-1']
+        assert 'itfitness-app-1' not in manager.get_containers()
+        assert manager.listings == 1
+
+    def test_stopped_container_is_not_running(self):
+        manager = self._manager()
+        manager.get_containers()
+
+        manager.stop_container('itfitness-app-1')
+
+        assert manager.get_containers(only_running=True) == ['itfitness-app-2']
+        assert manager.listings == 1
+
+    def test_renamed_container(self):
+        manager = self._manager()
+        manager.get_containers()
+
+        manager.rename('itfitness-app-2', 'itfitness-app')
+
+        assert manager.commands == ['container rename itfitness-app-2 itfitness-app']
+        assert manager.get_containers(prefix='itfitness-app') == ['itfitness-app', 'itfitness-app-1']
+        assert manager.listings == 1
+
+    def test_compose_commands_invalidate(self):
+        """Compose decides which containers it creates or removes, so they are listed again."""
+        manager = self._manager()
+
+        for command in [lambda: manager.scale('app', 2), manager.up, manager.down, lambda: manager.run(['app'])]:
+            manager.get_containers()
+            command()
+            manager.get_containers()
+
+        assert manager.listings == 5
+
+    def test_service_containers_come_from_the_inventory(self):
+        manager = self._manager()
+        manager.get_project_by_service = lambda service: 'itfitness'
+
+        assert manager.get_service_containers('app') == ['itfitness-app-2', 'itfitness-app-1']
+        assert manager.get_number_of_containers('db') == 0
+        assert manager.listings == 1
+        assert manager.commands == []
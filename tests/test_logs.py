@@ -0,0 +1,380 @@
+"""Tests for multiplexing of container logs."""
+import asyncio
+import io
+import re
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+from mantis.logs import (
+    LogMerger, LogMultiplexer, LogSourceError, command_source, demultiplex_stream, engine_source, fallback,
+    log_time, split_command, split_lines, timestamp_key,
+)
+from mantis.engine import DockerEngine
+from mantis.managers import BaseManager
+
+
+async def iterate(items):
+    for item in items:
+        yield item
+
+
+def collect(lines):
+    async def main():
+        return [line async for line in lines]
+
+    return asyncio.run(main())
+
+
+def source(lines, delay=0.0):
+    async def generate():
+        for line in lines:
+            await asyncio.sleep(delay)
+            yield line
+
+    return generate
+
+
+def failing(message):
+    async def generate():
+        raise LogSourceError(message)
+        yield  # pragma: no cover
+
+    return generate
+
+
+class TestSplitLines:
+    def test_lines_spanning_chunks(self):
+        chunks = [b'first\nsec', b'ond', b'\nthird']
+
+        assert collect(split_lines(iterate(chunks))) == [b'first\n', b'second\n', b'third\n']
+
+
+class TestSplitCommand:
+    def test_environment_assignments(self):
+        args, env = split_command('DOCKER_HOST="ssh://user@host:22" docker logs web --tail 10')
+
+        assert args == ['docker', 'logs', 'web', '--tail', '10']
+        assert env['DOCKER_HOST'] == 'ssh://user@host:22'
+
+    def test_plain_command(self):
+        assert split_command('docker logs web -f')[0] == ['docker', 'logs', 'web', '-f']
+
+
+class TestLogTime:
+    def test_timestamp(self):
+        assert log_time('1700000000') == '1700000000'
+
+    @pytest.mark.parametrize('value, seconds', [('42m', 2520), ('1h30m', 5400), ('1.5s', 1.5), ('500ms', 0.5)])
+    def test_relative_duration(self, value, seconds):
+        assert float(log_time(value, now=1700000000)) == 1700000000 - seconds
+
+    def test_date_with_zone(self):
+        expected = datetime(2024, 1, 2, 13, 23, 37, tzinfo=timezone.utc).timestamp()
+
+        assert float(log_time('2024-01-02T13:23:37Z')) == expected
+        assert float(log_time('2024-01-02T14:23:37+01:00')) == expected
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            log_time('yesterday')
+
+
+class TestDemultiplexStream:
+    def test_frames_split_across_chunks(self, frame):
+        data = frame(1, b'out\n') + frame(2, b'err\n')
+        chunks = [data[:3], data[3:10], data[10:]]
+
+        assert b''.join(collect(demultiplex_stream(iterate(chunks), True))) == b'out\nerr\n'
+
+    def test_detects_frames_without_content_type(self, frame):
+        assert collect(demultiplex_stream(iterate([frame(1, b'out\n')]), None)) == [b'out\n']
+
+    def test_raw_stream(self):
+        assert collect(demultiplex_stream(iterate([b'tty output\n']), None)) == [b'tty output\n']
+
+
+class TestCommandSource:
+    def test_reads_process_output(self):
+        command = f'{sys.executable} -c "print(\'one\'); print(\'two\')"'
+
+        assert collect(command_source(command)()) == [b'one\n', b'two\n']
+
+    def test_missing_executable(self):
+        with pytest.raises(LogSourceError):
+            collect(command_source('mantis-missing-executable logs web')())
+
+
+class TestEngineSource:
+    def test_streams_demultiplexed_lines(self, daemon, frame):
+        daemon.routes['/containers/web/logs'] = (200, frame(1, b'out\nlong ') + frame(2, b'line\n'))
+
+        lines = collect(engine_source(daemon.server_address, 'web', tail=10, follow=0)())
+
+        assert lines == [b'out\n', b'long line\n']
+        assert daemon.requests[-1].endswith('stdout=1&stderr=1&tail=10&follow=0')
+
+    def test_error_response(self, daemon):
+        daemon.routes['/containers/web/logs'] = (404, b'{"message": "No such container: web"}')
+
+        with pytest.raises(LogSourceError, match='HTTP 404'):
+            collect(engine_source(daemon.server_address, 'web')())
+
+    def test_falls_back_when_daemon_is_unreachable(self, tmp_path):
+        primary = engine_source(str(tmp_path / 'missing.sock'), 'web')
+
+        assert collect(fallback(primary, source([b'cli\n']))()) == [b'cli\n']
+
+
+class TestLogMultiplexer:
+    def test_prefixes_lines_with_container(self):
+        output = io.StringIO()
+
+        LogMultiplexer({'web': source([b'a\n']), 'worker-1': source([b'b\n'])}, output=output).run()
+
+        assert sorted(output.getvalue().splitlines()) == ['web      | a', 'worker-1 | b']
+
+    def test_busy_container_does_not_starve_quiet_one(self):
+        output = io.StringIO()
+        sources = {
+            'busy': source([f'{index}\n'.encode() for index in range(5000)]),
+            'quiet': source([b'hello\n'], delay=0.01),
+        }
+
+        LogMultiplexer(sources, output=output, buffer_lines=10, batch_interval=0).run()
+
+        lines = output.getvalue().splitlines()
+        busy = [line.split(' | ')[1] for line in lines if line.startswith('busy')]
+        assert busy == [str(index) for index in range(5000)]
+        assert 'quiet | hello' in lines
+        assert lines.index('quiet | hello') < len(lines) - 1
+
+    def test_lines_are_written_in_batches(self):
+        writes = []
+        output = io.StringIO()
+        output.write = writes.append
+
+        sources = {f'web-{index}': source([b'line\n'] * 10) for index in range(10)}
+        LogMultiplexer(sources, output=output).run()
+
+        assert sum(chunk.count('\n') for chunk in writes) == 100
+        assert len(writes) < 10
+
+    def test_pattern_filters_lines(self):
+        output = io.StringIO()
+        sources = {
+            'web': source([b'GET / 200\n', b'GET /api 500\n']),
+            'db': source([b'ERROR: deadlock detected\n', b'checkpoint complete\n']),
+        }
+
+        LogMultiplexer(sources, output=output, pattern=re.compile(r'500|ERROR')).run()
+
+        assert sorted(output.getvalue().splitlines()) == ['db  | ERROR: deadlock detected', 'web | GET /api 500']
+
+    def test_failing_source_prints_error(self):
+        output = io.StringIO()
+
+        LogMultiplexer({'web': failing('unreachable'), 'db': source([b'ok\n'])}, output=output).run()
+
+        assert 'web | error: unreachable' in output.getvalue()
+        assert 'db  | ok' in output.getvalue()
+
+    @pytest.mark.parametrize('error', [asyncio.IncompleteReadError(b'', 10), RuntimeError('unexpected')])
+    def test_source_failing_mid_stream_ends(self, error):
+        output = io.StringIO()
+        sources = {'web': interrupted([b'started\n'], error), 'db': source([b'ok\n'])}
+
+        async def main():
+            await asyncio.wait_for(LogMultiplexer(sources, output=output).main(), timeout=5)
+
+        asyncio.run(main())
+
+        lines = output.getvalue().splitlines()
+        assert 'web | started' in lines
+        assert any(line.startswith('web | error: ') for line in lines)
+        assert 'db  | ok' in lines
+
+    def test_merger_ends_when_source_fails_mid_stream(self):
+        output = io.StringIO()
+        sources = {'web': interrupted(timestamped(1), asyncio.IncompleteReadError(b'', 10)), 'db': source(timestamped(2))}
+
+        async def main():
+            await asyncio.wait_for(LogMerger(sources, output=output).main(), timeout=5)
+
+        asyncio.run(main())
+
+        assert 'web | error: log stream ended prematurely' in output.getvalue()
+
+
+def interrupted(lines, error):
+    async def generate():
+        for line in lines:
+            yield line
+
+        raise error
+
+    return generate
+
+
+def timestamped(*seconds):
+    return [f'2024-01-02T13:00:{second:06.3f}Z line at {second}\n'.encode() for second in seconds]
+
+
+def endless(lines):
+    async def generate():
+        for line in lines:
+            yield line
+
+        await asyncio.sleep(3600)
+        yield b''  # pragma: no cover
+
+    return generate
+
+
+class TestTimestampKey:
+    def test_trimmed_fractions_sort_by_time(self):
+        keys = [timestamp_key(line) for line in [
+            b'2024-01-02T13:23:37.1Z a\n', b'2024-01-02T13:23:37.12Z b\n', b'2024-01-02T13:23:37Z c\n',
+        ]]
+
+        assert sorted(keys) == [keys[2], keys[0], keys[1]]
+
+    def test_zone_offset(self):
+        assert timestamp_key(b'2024-01-02T14:23:37.5+01:00 a\n') == timestamp_key(b'2024-01-02T13:23:37.5Z a\n')
+
+    def test_line_without_timestamp(self):
+        assert timestamp_key(b'error: unreachable\n') is None
+
+
+class TestLogMerger:
+    def merged(self, sources, **kwargs):
+        output = io.StringIO()
+        LogMerger(sources, output=output, **kwargs).run()
+        return [line.split(' | ')[0].strip() for line in output.getvalue().splitlines()]
+
+    def test_orders_lines_by_timestamp(self):
+        containers = self.merged({
+            'web-1': source(timestamped(1, 4, 5)),
+            'web-2': source(timestamped(2, 3, 6), delay=0.01),
+            'web-3': source(timestamped(0, 7)),
+        }, batch_interval=0)
+
+        assert containers == ['web-3', 'web-1', 'web-2', 'web-2', 'web-1', 'web-1', 'web-2', 'web-3']
+
+    def test_quiet_container_holds_others_back_only_for_window(self):
+        output = io.StringIO()
+        sources = {'web-1': source(timestamped(1, 2)), 'web-2': endless(timestamped(3))}
+
+        async def main():
+            merger = LogMerger(sources, output=output, window=0.1, batch_interval=0)
+            task = asyncio.ensure_future(merger.main())
+            await asyncio.sleep(0.5)
+            task.cancel()
+
+        asyncio.run(main())
+
+        assert [line.split(' | ')[0].strip() for line in output.getvalue().splitlines()] == ['web-1', 'web-1', 'web-2']
+
+    def test_pending_lines_are_bounded(self):
+        # the quiet container never sends a line, only lines over the limit are written
+        output = io.StringIO()
+
+        async def main():
+            merger = LogMerger({'busy': source(timestamped(*range(50))), 'quiet': endless([])},
+                               output=output, buffer_lines=10, window=3600, batch_interval=0)
+            task = asyncio.ensure_future(merger.main())
+            await asyncio.sleep(0.3)
+            task.cancel()
+
+        asyncio.run(main())
+
+        assert len(output.getvalue().splitlines()) == 40
+
+
+class TestLogSources:
+    def make_manager(self):
+        manager = BaseManager.__new__(BaseManager)
+        manager._engine_failed = True
+        manager.build_docker_command = lambda command: command
+        return manager
+
+    def test_docker_cli_commands(self, capsys):
+        sources = self.make_manager().log_sources(['web', 'db'], tail=10, follow=True)
+
+        assert list(sources) == ['web', 'db']
+        assert capsys.readouterr().out.splitlines() == ['docker logs web --tail 10 -f', 'docker logs db --tail 10 -f']
+
+    def test_engine_streams_with_time_window(self, daemon, frame):
+        daemon.routes['/containers/web/logs'] = (200, frame(1, b'ready\n'))
+        manager = self.make_manager()
+        manager._engine = DockerEngine(daemon.server_address)
+
+        sources = manager.log_sources(['web'], since='1700000000', until='2024-01-02T13:23:37Z')
+
+        assert collect(sources['web']()) == [b'ready\n']
+        assert 'since=1700000000&until=1704201817' in daemon.requests[-1]
+
+    def test_dry_run_prints_commands(self, capsys):
+        manager = self.make_manager()
+        manager.dry_run = True
+
+        manager.follow_logs(['web'])
+
+        assert 'docker logs web --tail 1000 -f' in capsys.readouterr().out
+
+
+class TestLogs:
+    @pytest.fixture
+    def manager(self, monkeypatch):
+        manager = BaseManager.__new__(BaseManager)
+        manager._engine_failed = True
+        manager.dry_run = False
+        manager.build_docker_command = lambda command: command
+        manager.get_containers = lambda: ['web-1', 'web-2', 'db']
+        manager.streamed = []
+        manager.stream_logs = lambda containers, **options: manager.streamed.append((containers, options))
+        return manager
+
+    def test_all_containers_are_read_at_once(self, manager):
+        manager.logs()
+
+        assert manager.streamed == [(['web-1', 'web-2', 'db'], {'tail': 10, 'since': None, 'until': None, 'pattern': None, 'merge': False})]
+
+    def test_window_and_pattern_read_whole_logs(self, manager):
+        manager.logs(since='1h', grep='ERROR')
+
+        containers, options = manager.streamed[0]
+        assert options['tail'] is None
+        assert options['since'] == '1h'
+        assert options['pattern'].pattern == 'ERROR'
+
+    def test_explicit_tail(self, manager):
+        manager.logs(tail=50, grep='ERROR')
+
+        assert manager.streamed[0][1]['tail'] == 50
+
+    def test_invalid_pattern(self, manager):
+        with pytest.raises(SystemExit):
+            manager.logs(grep='(')
+
+    def test_options_of_docker_cli(self, capsys):
+        manager = BaseManager.__new__(BaseManager)
+        manager._engine_failed = True
+        manager.dry_run = True
+        manager.build_docker_command = lambda command: command
+
+        manager.stream_logs(['web'], tail=None, since='2024-01-02 13:00', until='10m')
+
+        assert "docker logs web --since '2024-01-02 13:00' --until 10m" in capsys.readouterr().out
+
+    def test_merge_requests_timestamps(self, capsys):
+        manager = BaseManager.__new__(BaseManager)
+        manager._engine_failed = True
+        manager.dry_run = True
+        manager.build_docker_command = lambda command: command
+        manager.resolve_containers = lambda names: ['web-1', 'web-2']
+
+        manager.logs('web', merge=True)
+
+        assert 'docker logs web-1 --tail 1000 --timestamps -f' in capsys.readouterr().out
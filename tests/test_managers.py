@@ -397,7 +397,7 @@ class TestSecretsCommandsConstant:
 
     def test_contains_expected_commands(self):
         """Test that SECRETS_COMMANDS contains all expected commands."""
-        expected = {'show-env', 'encrypt-env', 'decrypt-env', 'check-env'}
+        expected = {'show-env', 'encrypt-env', 'decrypt-env', 'migrate-encryption', 'check-env'}
         assert SECRETS_COMMANDS == expected
 
     def test_matches_config_module(self):
@@ -547,3 +547,132 @@ class TestQuietProgress:
         manager.pull(['app'])
 
         assert manager.commands == ['push app', 'pull app']
+
+
+class TestStatus:
+    """Images, containers and stats are queried concurrently and merged."""
+
+    @staticmethod
+    def _manager(barrier=None):
+        def slow(result):
+            def query(*args):
+                if barrier:
+                    # breaks unless the other queries are running at the same time
+                    barrier.wait()
+                manager.calls.append(args)
+                return result
+            return query
+
+        manager = BaseManager.__new__(BaseManager)
+        manager._engine_failed = True
+        manager.calls = []
+        manager.get_images = slow([{'Repository': 'acme/web', 'Tag': 'latest', 'ID': 'abc', 'CreatedSince': '2 days ago', 'Size': '180MB'}])
+        manager.get_container_rows = slow([
+            {'Names': 'web-1', 'State': 'running', 'Status': 'Up 2 hours', 'Image': 'acme/web', 'Ports': '', 'Size': '1kB'},
+            {'Names': 'old', 'State': 'exited', 'Status': 'Exited (0)', 'Image': 'acme/web', 'Ports': '', 'Size': '1kB'},
+        ])
+        manager.get_container_stats = slow({'web-1': {'cpu': '0.15%', 'mem': '42MiB / 1.9GiB'}})
+        return manager
+
+    def test_queries_run_concurrently(self):
+        import threading
+
+        manager = self._manager(barrier=threading.Barrier(3, timeout=10))
+
+        manager.get_status()
+
+        # docker CLI samples all running containers, without waiting for the container listing
+        assert () in manager.calls
+
+    def test_engine_samples_all_containers_at_once(self):
+        import threading
+
+        containers = [f'web-{index}' for index in range(12)]
+        barrier = threading.Barrier(len(containers), timeout=10)
+
+        def engine_call(method, container):
+            barrier.wait()
+            return True, {'container': container}
+
+        manager = BaseManager.__new__(BaseManager)
+        manager._engine = MagicMock()
+        manager.engine_call = engine_call
+
+        with patch('mantis.managers.cpu_percent', return_value='1.00%'), patch('mantis.managers.memory_usage', return_value='1MiB / 1GiB'):
+            stats = manager.get_container_stats(containers)
+
+        assert list(stats) == containers
+
+    def test_stats_are_merged_into_containers(self):
+        status = self._manager().get_status()
+
+        assert status['images'][0]['Repository'] == 'acme/web'
+        assert status['containers'][0]['CPUPerc'] == '0.15%'
+        assert status['containers'][0]['MemUsage'] == '42MiB / 1.9GiB'
+        assert status['containers'][1]['CPUPerc'] is None
+
+    def test_json(self, capsys):
+        import json
+
+        self._manager().status(as_json=True)
+
+        status = json.loads(capsys.readouterr().out)
+        assert [container['Names'] for container in status['containers']] == ['web-1', 'old']
+
+    def test_table(self, capsys):
+        self._manager().status()
+
+        output = capsys.readouterr().out
+        assert 'web-1' in output
+        assert '0.15%' in output
+
+
+class TestNetworks:
+    """All networks are inspected with a single docker call."""
+
+    @staticmethod
+    def _manager():
+        import json
+
+        manager = BaseManager.__new__(BaseManager)
+        manager._engine_failed = True
+        manager.commands = []
+
+        def docker(command, return_output=False):
+            manager.commands.append(command)
+
+            if command.startswith('network ls'):
+                return 'a1\nb2\n'
+
+            return json.dumps([
+                {'Id': 'a1' * 32, 'Name': 'itfitness_default', 'Driver': 'bridge', 'Scope': 'local',
+                 'Containers': {'c1': {'Name': 'itfitness-web-1'}, 'c2': {'Name': 'itfitness-db'}}},
+                {'Id': 'b2' * 32, 'Name': 'host', 'Driver': 'host', 'Scope': 'local', 'Containers': {}},
+            ])
+
+        manager.docker = docker
+        return manager
+
+    def test_single_inspect(self):
+        manager = self._manager()
+
+        networks = manager.get_networks()
+
+        assert manager.commands == ['network ls -q --no-trunc', 'network inspect a1 b2']
+        assert networks[0]['ID'] == 'a1' * 6
+        assert networks[0]['Containers'] == ['itfitness-db', 'itfitness-web-1']
+        assert networks[1]['Containers'] == []
+
+    def test_json(self, capsys):
+        import json
+
+        self._manager().networks(as_json=True)
+
+        assert [network['Name'] for network in json.loads(capsys.readouterr().out)] == ['itfitness_default', 'host']
+
+    def test_table(self, capsys):
+        self._manager().networks()
+
+        output = capsys.readouterr().out
+        assert 'NETWORK ID' in output
+        assert 'itfitness-web-1' in output
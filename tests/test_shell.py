@@ -0,0 +1,91 @@
+"""Tests for the interactive mantis session."""
+import sys
+
+import pytest
+
+from mantis.app import state
+from mantis.inventory import ContainerInfo, ContainerInventory
+from mantis.shell import MantisShell
+
+
+class FakeManager(object):
+    environment_id = 'production'
+    single_connection_mode = False
+    connection = None
+    host = None
+    dry_run = False
+
+    def __init__(self):
+        self.calls = []
+
+    def get_project_inventory(self):
+        return ContainerInventory([
+            ContainerInfo('shop-web-1', 'running', '', 'shop', 'web', 1),
+            ContainerInfo('shop-web-2', 'running', '', 'shop', 'web', 2),
+            ContainerInfo('shop-db', 'running', '', 'shop', 'db', 1),
+        ])
+
+    def services(self):
+        return ['web', 'db']
+
+    def status(self, as_json=False):
+        self.calls.append('status')
+
+    def networks(self, as_json=False):
+        self.calls.append('networks')
+        sys.exit(3)
+
+
+@pytest.fixture
+def shell(monkeypatch):
+    manager = FakeManager()
+    monkeypatch.setattr(state, '_manager', manager)
+    monkeypatch.setattr(state, '_heading_printed', True)
+    return MantisShell(state)
+
+
+class TestCompletion:
+    """Commands complete at the start of each command of a chain, names in their arguments."""
+
+    def test_commands(self, shell):
+        assert shell.candidates('stat', 'stat') == ['status']
+        assert 'deploy' in shell.candidates('build + de', 'de')
+        assert 'shell-session' not in shell.candidates('', '')
+
+    def test_names(self, shell):
+        assert shell.candidates('logs shop-web', 'shop-web') == ['shop-web-1', 'shop-web-2']
+        assert shell.candidates('status + logs w', 'w') == ['web']
+
+    def test_prompt(self, shell):
+        assert shell.prompt == 'mantis (production)> '
+
+
+class TestExecute:
+    """Lines run like command line chains, a failing one does not end the session."""
+
+    def test_chain(self, shell):
+        assert shell.execute('status + status') == 0
+        assert state._manager.calls == ['status', 'status']
+
+    def test_exit_code(self, shell):
+        assert shell.execute('networks + status') == 3
+        assert state._manager.calls == ['networks']
+
+    def test_empty_line(self, shell):
+        assert shell.execute('') is None
+
+    def test_nested_session(self, shell):
+        assert shell.execute('shell-session') == 1
+
+    def test_global_options_ignored(self, shell):
+        assert shell.execute('-e stage status') == 0
+        assert state._manager.calls == ['status']
+
+    def test_run(self, shell, monkeypatch, tmp_path):
+        monkeypatch.setattr('mantis.shell.HISTORY_FILE', tmp_path / 'history')
+        lines = iter(['status', '', 'status + status', 'exit', 'status'])
+        monkeypatch.setattr('builtins.input', lambda prompt: next(lines))
+
+        shell.run()
+
+        assert state._manager.calls == ['status', 'status', 'status']
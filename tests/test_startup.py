@@ -0,0 +1,113 @@
+"""Tests keeping startup of the CLI fast: commands are loaded lazily from a manifest."""
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from mantis import commands
+from mantis.command_line import load_app
+
+# cumulative import time of mantis.command_line (what "mantis --version" imports), in milliseconds
+IMPORT_BUDGET_MS = int(os.environ.get('MANTIS_IMPORT_BUDGET_MS', 100))
+
+HEAVY_MODULES = {'typer', 'click', 'rich', 'pydantic', 'Crypto', 'yaml', 'asyncio'}
+
+
+def _python(code):
+    """Runs code in a fresh interpreter, returning what it printed as JSON."""
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def _loaded_modules(code):
+    return _python(
+        'import json, sys\n'
+        f'{code}\n'
+        'print(json.dumps(sorted(sys.modules)))'
+    )
+
+
+class TestManifest:
+    """The manifest has to match names of the @command decorators of the command modules."""
+
+    @pytest.fixture
+    def app(self):
+        return load_app()
+
+    def test_commands(self, app):
+        registered = {
+            info.name: info.callback.__module__.rsplit('.', 1)[-1]
+            for info in app.registered_commands
+            if info.rich_help_panel != 'Shortcuts'
+        }
+
+        assert registered == commands.COMMANDS
+
+    def test_shortcuts(self, app):
+        registered = {
+            info.name: re.search(r"'(.+)'", info.help).group(1)
+            for info in app.registered_commands
+            if info.rich_help_panel == 'Shortcuts'
+        }
+
+        assert registered == commands.SHORTCUTS
+
+    def test_command_module(self):
+        assert commands.command_module('status') == 'core'
+        assert commands.command_module('s') == 'core'
+        assert commands.command_module('unknown') is None
+
+
+class TestLazyLoading:
+    """Only modules of invoked commands are imported, heavy dependencies only once needed."""
+
+    def test_version(self):
+        modules = _loaded_modules(
+            "sys.argv = ['mantis', '--version']\n"
+            "from mantis.command_line import run\n"
+            "run()"
+        )
+
+        assert not HEAVY_MODULES & {module.split('.')[0] for module in modules}
+
+    def test_single_command(self):
+        modules = _loaded_modules(
+            "from mantis.command_line import load_app\n"
+            "load_app(['read-key'])"
+        )
+
+        assert 'mantis.commands.secrets' in modules
+        assert 'mantis.commands.django' not in modules
+        assert not {'pydantic', 'Crypto', 'yaml'} & {module.split('.')[0] for module in modules}
+
+    def test_shortcut(self):
+        modules = _loaded_modules(
+            "from mantis.command_line import load_app\n"
+            "load_app(['s'])"
+        )
+
+        assert 'mantis.commands.core' in modules
+        assert 'mantis.commands.images' not in modules
+
+    def test_unknown_command_loads_all(self):
+        modules = _loaded_modules(
+            "from mantis.command_line import load_app\n"
+            "load_app(['unknown'])"
+        )
+
+        assert {f'mantis.commands.{module}' for module in commands.MODULES} <= set(modules)
+
+    def test_import_budget(self):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import mantis.command_line'],
+            capture_output=True, text=True, check=True,
+        )
+        cumulative = {
+            line.split('|')[2].strip(): int(line.split('|')[1])
+            for line in result.stderr.splitlines() if line.startswith('import time:') and line.count('|') == 2 and line.split('|')[1].strip().isdigit()
+        }
+
+        assert cumulative['mantis.command_line'] / 1000 < IMPORT_BUDGET_MS
@@ -0,0 +1,89 @@
+"""Tests for timing of steps exported as a Chrome trace."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from mantis import tracing
+from mantis.managers import BaseManager
+from mantis.tracing import Tracer, step_name
+
+
+@pytest.fixture
+def tracer():
+    """Turns tracing on for a single test."""
+    tracer = Tracer()
+
+    with patch.object(tracing, 'tracer', tracer):
+        yield tracer
+
+
+class TestTracer:
+    """Tests for collecting and exporting spans."""
+
+    def test_chrome_trace(self, tracer, tmp_path):
+        with tracer.span('deploy', 'mantis'):
+            with tracer.span('docker compose pull', 'cmd', command='docker compose pull') as span:
+                span['exit_code'] = 0
+
+        tracer.write(str(tmp_path / 'trace.json'))
+        events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+
+        assert [event['name'] for event in events] == ['deploy', 'docker compose pull']
+        assert all(event['ph'] == 'X' for event in events)
+        assert events[1]['args'] == {'command': 'docker compose pull', 'exit_code': 0}
+        # nested span lies within its parent
+        assert events[0]['ts'] <= events[1]['ts']
+        assert events[1]['ts'] + events[1]['dur'] <= events[0]['ts'] + events[0]['dur']
+
+    def test_failed_step_is_recorded(self, tracer):
+        with pytest.raises(SystemExit):
+            with tracer.span('docker compose up', 'cmd'):
+                raise SystemExit(1)
+
+        assert tracer.spans[0].args == {'error': 'SystemExit'}
+
+    def test_slowest_leaves_out_mantis_commands(self, tracer):
+        with tracer.span('deploy', 'mantis'):
+            with tracer.span('fast', 'docker'):
+                pass
+            with tracer.span('slow', 'docker'):
+                tracer.origin -= 1  # pretend a second passed
+
+        assert [span.name for span in tracer.slowest()] == ['slow', 'fast']
+
+    def test_step_name(self):
+        assert step_name('DOCKER_HOST="unix:///tmp/mantis-x/docker.sock" docker container ls -a') == 'docker container ls -a'
+        assert len(step_name('docker ' + 'x' * 200)) == 100
+
+
+class TestManagerSpans:
+    """Commands run by the manager are timed once tracing is on."""
+
+    def test_docker_output(self, tracer):
+        manager = BaseManager.__new__(BaseManager)
+        manager.dry_run = False
+        manager.build_docker_command = lambda command, use_connection=True: command
+
+        with patch('mantis.managers.subprocess.run', return_value=MagicMock(returncode=0, stdout='web\n')):
+            manager.docker('container ls', return_output=True)
+
+        span = tracer.spans[0]
+        assert (span.name, span.category) == ('docker container ls', 'docker')
+        assert span.args['exit_code'] == 0
+        assert span.args['output_bytes'] == 4
+
+    def test_failed_command(self, tracer):
+        manager = BaseManager.__new__(BaseManager)
+        manager.dry_run = False
+
+        with patch('mantis.managers.subprocess.run', return_value=MagicMock(returncode=3)), pytest.raises(SystemExit):
+            manager.cmd('docker compose up')
+
+        assert tracer.spans[0].args['exit_code'] == 3
+
+    def test_off_by_default(self):
+        assert tracing.tracer is None
+
+        with tracing.trace('step', 'cmd', command='true') as span:
+            span['exit_code'] = 0